@@ -58,7 +58,8 @@ usage: build_model.py [-h] [-o OUTPUT_PATH] [--cpu CPU]
   -h, --help            show this help message and exit
   -o OUTPUT_PATH, --output_path OUTPUT_PATH
                         Path to output the heart disease model to.
-  --cpu CPU             Number of processes to use for training models.
+  --cpu CPU             Number of processes to use for training and scoring
+                        models.
   --log_level {critical,error,warning,info,debug}
                         Log level to configure logging with.
 
@@ -74,18 +75,29 @@ name as the model, with '.dat' replaced by '_validation.csv' (by default,
 
 """
 
+import os
 import random
 import time
+import functools
+import collections
 import sys
 import datetime
+import logging
+import tempfile
 
 import numpy as np
 import pandas as pd
+from scipy import stats
 import sklearn
 from sklearn.pipeline import Pipeline
+import joblib
+from joblib import Parallel, delayed
 
 import util
 import scoring
+import hyperparameter_search
+import search_checkpoint
+import warm_start_search
 
 # URL for the repository on Github.
 import outliers
@@ -107,8 +119,13 @@ def main(argv):
     random.seed(command_line_arguments.random_state)
     np.random.seed(command_line_arguments.random_state)
     print('Loading datasets...')
+    memmap_path = None
+    if command_line_arguments.memmap:
+        memmap_path = command_line_arguments.target.with_suffix('.datasets')
+
     datasets = util.load_datasets(command_line_arguments.training,
-                                  command_line_arguments.validation)
+                                  command_line_arguments.validation,
+                                  memmap_path=memmap_path)
 
     print(f'Training dataset:      {command_line_arguments.training}')
     print(f'Validation dataset:    {command_line_arguments.validation}')
@@ -118,18 +135,25 @@ def main(argv):
     print(f'Preprocessing methods: {command_line_arguments.preprocessing}')
     print(f'Training samples:      {len(datasets.training.inputs)}')
     print(f'Validation samples:    {len(datasets.validation.inputs)}')
-    score_function = scoring.scoring_methods()[command_line_arguments.scoring]
     print('Generating model...')
     preprocessing_methods = [util.PREPROCESSING_METHODS[i] for i in command_line_arguments.preprocessing]
     model = train_model(util.SUPPORTED_ALGORITHMS[command_line_arguments.model].class_,
                         datasets.training.inputs,
                         datasets.training.targets,
-                        score_function,
+                        scoring.multi_metric_scorer,
                         preprocessing_methods=preprocessing_methods,
                         cpus=command_line_arguments.cpu,
-                        parameter_grid=command_line_arguments.parameter_grid)
+                        parameter_grid=command_line_arguments.parameter_grid,
+                        refit=command_line_arguments.scoring,
+                        search=command_line_arguments.search,
+                        halving_factor=command_line_arguments.halving_factor,
+                        n_iter=command_line_arguments.n_iter,
+                        random_state=command_line_arguments.random_state,
+                        pipeline_cache=command_line_arguments.pipeline_cache,
+                        pipeline_cache_size=command_line_arguments.pipeline_cache_size,
+                        checkpoint=command_line_arguments.checkpoint,
+                        warm_start=command_line_arguments.warm_start)
 
-    model.validation = dict()
     print('Scoring model...')
     model_scores = scoring.score_model(model,
                                        datasets.validation.inputs,
@@ -142,10 +166,35 @@ def main(argv):
             print(msg)
 
     model.validation['scores'] = model_scores
+    predictions = model.predict(datasets.validation.inputs)
+    if command_line_arguments.bootstrap:
+        lower_scores, upper_scores = scoring.bootstrap_scores(datasets.validation.targets,
+                                                              predictions,
+                                                              command_line_arguments.bootstrap,
+                                                              random_state=command_line_arguments.random_state)
+
+        print(f'\n95% confidence intervals from {command_line_arguments.bootstrap} bootstrap resamples:')
+        for metric, lower_score, upper_score in zip(lower_scores, lower_scores.values(), upper_scores.values()):
+            if model_scores[metric]:
+                msg = '{metric:13} [{lower:.4}, {upper:.4}]'.format(metric=metric + ':',
+                                                                   lower=lower_score,
+                                                                   upper=upper_score)
+
+                print(msg)
+
+        model.validation['bootstrap_lower'] = lower_scores
+        model.validation['bootstrap_upper'] = upper_scores
+
     if command_line_arguments.cross_validate:
         mean_scores, std_scores = cross_validate(model,
                                                  datasets,
-                                                 command_line_arguments.cross_validate)
+                                                 command_line_arguments.cross_validate,
+                                                 cpus=command_line_arguments.cpu,
+                                                 n_repeats=command_line_arguments.cv_repeats,
+                                                 stratified=command_line_arguments.cv_stratified,
+                                                 random_state=command_line_arguments.random_state,
+                                                 tolerance=command_line_arguments.cv_tolerance,
+                                                 target_metric=command_line_arguments.scoring)
 
         print(f'\n{command_line_arguments.cross_validate}-fold cross-validation scores:')
         for metric, mean_score, std_score in zip(std_scores, mean_scores.values(), std_scores.values()):
@@ -162,9 +211,55 @@ def main(argv):
         model.validation['cross_validation_mean'] = mean_scores
         model.validation['cross_validation_std'] = std_scores
 
+    if command_line_arguments.nested_cv:
+        outer_splits, inner_splits = command_line_arguments.nested_cv
+        mean_scores, std_scores, selected_parameters = nested_cross_validate(
+            util.SUPPORTED_ALGORITHMS[command_line_arguments.model].class_,
+            datasets,
+            outer_splits,
+            inner_splits,
+            scoring.multi_metric_scorer,
+            cpus=command_line_arguments.cpu,
+            stratified=command_line_arguments.cv_stratified,
+            random_state=command_line_arguments.random_state,
+            preprocessing_methods=preprocessing_methods,
+            parameter_grid=command_line_arguments.parameter_grid,
+            refit=command_line_arguments.scoring,
+            search=command_line_arguments.search,
+            halving_factor=command_line_arguments.halving_factor,
+            n_iter=command_line_arguments.n_iter,
+            pipeline_cache=command_line_arguments.pipeline_cache,
+            pipeline_cache_size=command_line_arguments.pipeline_cache_size,
+            checkpoint=command_line_arguments.checkpoint,
+            warm_start=command_line_arguments.warm_start,
+        )
+
+        print(f'\n{outer_splits}x{inner_splits}-fold nested cross-validation scores:')
+        for metric, mean_score, std_score in zip(std_scores, mean_scores.values(), std_scores.values()):
+            if mean_score:
+                mean_msg = '{metric:20} {score:.4}'.format(metric='mean ' + metric + ':',
+                                                           score=mean_score)
+
+                std_msg = '{metric:20} {score:.4}'.format(metric='std ' + metric + ':',
+                                                          score=std_score)
+
+                print(mean_msg)
+                print(std_msg)
+
+        parameter_counts = selected_parameter_counts(selected_parameters)
+        if parameter_counts:
+            print('\nSelected hyperparameters (value: outer folds):')
+            for name, counts in parameter_counts.items():
+                print(f'{name}: ' + ', '.join(f'{value!r}: {count}' for value, count in counts))
+
+        model.validation['nested_cross_validation_mean'] = mean_scores
+        model.validation['nested_cross_validation_std'] = std_scores
+        model.validation['nested_cross_validation_parameters'] = selected_parameters
+
     if command_line_arguments.outlier_scores:
         outlier_scores = outliers.score(model, datasets,
-                                        random_state=command_line_arguments.random_state)
+                                        random_state=command_line_arguments.random_state,
+                                        n_jobs=command_line_arguments.cpu)
 
         print('\nOutlier scores:')
         for metric, score in outlier_scores.items():
@@ -177,7 +272,6 @@ def main(argv):
     if command_line_arguments.print_hyperparameters:
         print(f'Model hyperparameters:\n{model.get_params()}\n')
 
-    predictions = model.predict(datasets.validation.inputs)
     validation_dataset = create_validation_dataset(datasets.validation.inputs,
                                                    datasets.validation.targets,
                                                    predictions,
@@ -188,6 +282,13 @@ def main(argv):
     model.repository = GITHUB_URL
     model.created = datetime.datetime.today().isoformat()
     util.save_validation(validation_dataset, command_line_arguments.target)
+    if command_line_arguments.outlier_detector:
+        outlier_detector = outliers.OutlierDetector(random_state=command_line_arguments.random_state,
+                                                    n_jobs=command_line_arguments.cpu)
+
+        outlier_detector.fit(datasets.training.inputs)
+        util.save_outlier_detector(outlier_detector, command_line_arguments.target)
+
     util.save_model(model, command_line_arguments.target)
     print(f'Saved model to {command_line_arguments.target}')
     runtime = f'Runtime: {time.time() - start_time:.2} seconds'
@@ -234,7 +335,17 @@ def train_model(model_class,
                 score_function,
                 preprocessing_methods=None,
                 cpus=1,
-                parameter_grid=None):
+                parameter_grid=None,
+                refit=None,
+                search='grid',
+                halving_factor=3,
+                n_iter=10,
+                random_state=None,
+                pipeline_cache=None,
+                pipeline_cache_size='1G',
+                checkpoint=None,
+                warm_start=False,
+                cv=None):
 
     """
     Train a machine learning model on the given data.
@@ -250,7 +361,8 @@ def train_model(model_class,
       score_function: A function that takes three parameters - an
                       estimator, an array of input data, and an array
                       of target data, and returns a score as a float,
-                      where higher numbers are better.
+                      where higher numbers are better, or a dict of
+                      scores such as scoring.multi_metric_scorer.
       preprocessing_methods: Methods to use to preprocess the data before feeding
                              it to the model. Must be a member of
                              'PREPROCESSING_METHODS'. (Default=None)
@@ -258,9 +370,51 @@ def train_model(model_class,
       parameter_grid: A sequence of dicts with possible hyperparameter values.
                       Used for tuning the hyperparameters. When present, grid
                       search will be used to train the model. (Default=None)
+      refit: Name of the metric to select the best candidate by when
+             score_function returns a dict of scores. Metrics in
+             scoring.LOWER_IS_BETTER are minimized. (Default=None)
+      search: Method to search parameter_grid with. Must be a member of
+              'util.SEARCH_METHODS'. A halving search can only rank
+              candidates by one metric, so when refit is given, it scores
+              candidates with scoring.scoring_methods()[refit] instead of
+              score_function. (Default='grid')
+      halving_factor: Factor to grow the budget and shrink the number of
+                      candidates by at each round of a halving search.
+                      (Default=3)
+      n_iter: Number of candidates to evaluate in a random or bayesian
+              search. These searches may use the distributions described in
+              hyperparameter_search.py in parameter_grid. (Default=10)
+      random_state: Seed for subsampling the data in a halving search, and
+                    for sampling candidates in a random or bayesian search.
+                    (Default=None)
+      pipeline_cache: Directory to cache fitted preprocessing steps in, or
+                      None to disable caching. Steps are keyed by their
+                      parameters and a hash of their input data, so
+                      candidates that differ only in model parameters fit
+                      each preprocessing step once per fold. (Default=None)
+      pipeline_cache_size: Maximum size of pipeline_cache in bytes, or a
+                           string such as '1G'. The least recently used
+                           steps are evicted after every fold of a search
+                           is scored, and once training is done.
+                           (Default='1G')
+      checkpoint: Path to an SQLite database to save the score of every
+                  candidate and fold of a search to, or None to disable
+                  checkpointing. Candidates and folds that are already in
+                  the database are not fit again, so an interrupted search
+                  can be resumed. Candidates that fail to fit are saved
+                  with NaN scores. See search_checkpoint.py. (Default=None)
+      warm_start: Whether to fit the candidates of a grid search that differ
+                  only in a hyperparameter such as n_estimators, max_iter or
+                  C with warm starts, instead of fitting each one from
+                  scratch. See warm_start_search.py. (Default=False)
+      cv: Number of folds, or a scikit-learn cross-validation splitter, to
+          score the candidates of a search with. None uses 5-fold
+          cross-validation. (Default=None)
 
     Returns
-      A trained scikit-learn estimator object.
+      A trained scikit-learn estimator object. Its validation attribute is a
+      dict, and when grid search is used, validation['grid_search'] holds the
+      scores of every candidate.
 
     """
 
@@ -271,32 +425,303 @@ def train_model(model_class,
         pipeline_steps.append((f'preprocessing{count+1}', preprocessor))
 
     pipeline_steps.append(('model', model_class()))
-    pipeline = Pipeline(steps=pipeline_steps)
+    memory = joblib.Memory(pipeline_cache, verbose=0, bytes_limit=pipeline_cache_size) if pipeline_cache else None
+    pipeline = Pipeline(steps=pipeline_steps, memory=memory)
     if parameter_grid:
-        grid_estimator = sklearn.model_selection.GridSearchCV(pipeline,
-                                                              parameter_grid,
-                                                              scoring=score_function,
-                                                              n_jobs=cpus)
+        if search == 'halving' and refit:
+            score_function = scoring.scoring_methods()[refit]
+
+        path_parameter = None
+        if warm_start and search == 'grid':
+            path_parameter = warm_start_search.path_parameter(pipeline, parameter_grid)
+
+        temp_dir = None
+        if path_parameter and not checkpoint:
+            temp_dir = tempfile.TemporaryDirectory()
+            checkpoint = os.path.join(temp_dir.name, 'warm_start.db')
+
+        estimator = pipeline
+        if checkpoint:
+            estimator = search_checkpoint.CheckpointedEstimator(pipeline, seed=random_state)
+            score_function = search_checkpoint.CheckpointedScorer(score_function, checkpoint)
+
+        search_score_function = score_function
+        if memory:
+            search_score_function = functools.partial(bounded_cache_scorer,
+                                                      score_function=score_function,
+                                                      memory=memory)
+
+        if search == 'halving':
+            grid_estimator = halving_search(estimator,
+                                            parameter_grid,
+                                            search_score_function,
+                                            cpus=cpus,
+                                            factor=halving_factor,
+                                            random_state=random_state,
+                                            cv=cv)
+
+        elif search == 'grid':
+            if path_parameter:
+                warm_start_search.fit_paths(estimator,
+                                            parameter_grid,
+                                            path_parameter,
+                                            score_function,
+                                            input_data,
+                                            target_data,
+                                            cv=cv,
+                                            cpus=cpus)
+
+                if memory:
+                    memory.reduce_size()
+
+            grid_estimator = sklearn.model_selection.GridSearchCV(
+                estimator,
+                parameter_grid,
+                scoring=search_score_function,
+                n_jobs=cpus,
+                refit=functools.partial(best_candidate, metric=refit) if refit else True,
+                cv=cv,
+            )
+
+        elif search == 'random':
+            grid_estimator = sklearn.model_selection.RandomizedSearchCV(
+                estimator,
+                hyperparameter_search.parse_distributions(parameter_grid),
+                n_iter=n_iter,
+                scoring=search_score_function,
+                n_jobs=cpus,
+                refit=functools.partial(best_candidate, metric=refit) if refit else True,
+                cv=cv,
+                random_state=random_state,
+            )
+
+        elif search == 'bayesian':
+            grid_estimator = hyperparameter_search.BayesianSearchCV(
+                estimator,
+                hyperparameter_search.parse_distributions(parameter_grid),
+                n_iter=n_iter,
+                scoring=search_score_function,
+                n_jobs=cpus,
+                refit=functools.partial(best_candidate, metric=refit) if refit else True,
+                cv=cv,
+                random_state=random_state,
+                metric=refit or 'score',
+                greater_is_better=refit not in scoring.LOWER_IS_BETTER,
+            )
+
+        else:
+            raise ValueError(f'Unknown search method: {search}')
 
         grid_estimator.fit(input_data, target_data)
         model = grid_estimator.best_estimator_
+        if checkpoint:
+            model = model.fitted_estimator()
+
+        model.validation = dict(grid_search=candidate_scores(grid_estimator.cv_results_))
+        if temp_dir:
+            temp_dir.cleanup()
 
     else:
         model = pipeline
         model.fit(input_data, target_data)
+        model.validation = dict()
+
+    if memory:
+        memory.reduce_size()
+        model.set_params(memory=None)
 
     return model
 
 
-def cross_validate(model, datasets, n_splits):
+def bounded_cache_scorer(estimator, inputs, targets, score_function, memory):
+    """
+    Score an estimator, then evict the least recently used steps from a
+    pipeline cache until it is under its size limit. Used to keep the cache
+    bounded while a search is running.
+
+    Args:
+      estimator: The estimator to score.
+      inputs: An array of input data.
+      targets: An array of target data.
+      score_function: A function that takes three parameters - an
+                      estimator, an array of input data, and an array of
+                      target data, and returns a score or a dict of scores.
+      memory: The instance of joblib.Memory that caches the pipeline's
+              steps.
+
+    Returns:
+      The score or dict of scores returned by score_function.
+
+    """
+
+    scores = score_function(estimator, inputs, targets)
+    memory.reduce_size()
+
+    return scores
+
+
+def halving_search(estimator,
+                   parameter_grid,
+                   score_function,
+                   cpus=1,
+                   factor=3,
+                   random_state=None,
+                   cv=None,
+                   error_score=np.nan):
+    """
+    Create a successive halving search over a parameter grid. Every
+    candidate is first scored with a small budget, and only the best
+    1 / factor of the candidates go on to the next round, where the budget
+    is multiplied by factor. The budget is the number of estimators for
+    ensemble models that have an n_estimators parameter that is not in the
+    grid, and the number of training samples otherwise.
+
+    Args:
+      estimator: An instance of sklearn.pipeline.Pipeline with a final step
+                 named 'model', or a wrapper of one that exposes its
+                 parameters.
+      parameter_grid: A sequence of dicts with possible hyperparameter values.
+      score_function: A function that takes three parameters - an estimator,
+                      an array of input data, and an array of target data, and
+                      returns a score as a float, where higher numbers are
+                      better.
+      cpus: Number of processes to use for the search. (Default=1)
+      factor: Factor to grow the budget and shrink the number of candidates
+              by at each round. (Default=3)
+      random_state: Seed for subsampling the data. (Default=None)
+      cv: Number of folds, or a scikit-learn cross-validation splitter.
+          None uses 5-fold cross-validation. (Default=None)
+      error_score: Score to give a candidate that fails to fit or score, or
+                   'raise' to raise the error. (Default=np.nan)
+
+    Returns:
+      An unfitted instance of sklearn.model_selection.HalvingGridSearchCV.
+
+    """
+
+    # HalvingGridSearchCV is experimental, and only exists in scikit-learn
+    # 0.24 and later, so it is only enabled when a halving search is used.
+    from sklearn.experimental import enable_halving_search_cv  # pylint: disable=W0611,C0415
+
+    model_parameters = estimator.get_params()['model'].get_params()
+    searched_parameters = {name for grid in parameter_grid for name in grid}
+    if 'n_estimators' in model_parameters and 'model__n_estimators' not in searched_parameters:
+        resource = 'model__n_estimators'
+        max_resources = model_parameters['n_estimators']
+
+    else:
+        resource = 'n_samples'
+        max_resources = 'auto'
+
+    return sklearn.model_selection.HalvingGridSearchCV(estimator,
+                                                       parameter_grid,
+                                                       factor=factor,
+                                                       resource=resource,
+                                                       max_resources=max_resources,
+                                                       scoring=score_function,
+                                                       n_jobs=cpus,
+                                                       random_state=random_state,
+                                                       cv=5 if cv is None else cv,
+                                                       error_score=error_score)
+
+
+def best_candidate(cv_results, metric):
+    """
+    Select the best candidate of a grid search by one of several metrics.
+    Used as the refit parameter of sklearn.model_selection.GridSearchCV.
+
+    Args:
+      cv_results: The cv_results_ attribute of a grid search.
+      metric: Name of the metric to select the candidate by. Metrics in
+              scoring.LOWER_IS_BETTER are minimized.
+
+    Returns:
+      The index of the candidate with the best mean score. Candidates with an
+      undefined score are never selected.
+
+    """
+
+    mean_scores = np.asarray(cv_results[f'mean_test_{metric}'], dtype=float)
+    if np.all(np.isnan(mean_scores)):
+        raise ValueError(f'{metric} is undefined for every candidate.')
+
+    if metric in scoring.LOWER_IS_BETTER:
+        return int(np.nanargmin(mean_scores))
+
+    return int(np.nanargmax(mean_scores))
+
+
+def candidate_scores(cv_results):
+    """
+    Extract the scores of every candidate from the results of a grid search.
+
+    Args:
+      cv_results: The cv_results_ attribute of a grid search.
+
+    Returns:
+      A list with a dict for each candidate, with keys 'parameters',
+      'mean_scores', and 'std_scores'. The scores are dicts keyed by metric.
+      For a halving search, there is a dict for each candidate in each
+      round, with the additional keys 'iteration' and 'n_resources'.
+
+    """
+
+    metrics = [key[len('mean_test_'):] for key in cv_results if key.startswith('mean_test_')]
+    candidates = []
+    for index, parameters in enumerate(cv_results['params']):
+        candidate = dict(
+            parameters=parameters,
+            mean_scores={metric: float(cv_results[f'mean_test_{metric}'][index])
+                         for metric in metrics},
+            std_scores={metric: float(cv_results[f'std_test_{metric}'][index])
+                        for metric in metrics},
+        )
+
+        if 'iter' in cv_results:
+            candidate['iteration'] = int(cv_results['iter'][index])
+            candidate['n_resources'] = int(cv_results['n_resources'][index])
+
+        candidates.append(candidate)
+
+    return candidates
+
+
+def cross_validate(model,
+                   datasets,
+                   n_splits,
+                   cpus=1,
+                   n_repeats=1,
+                   stratified=False,
+                   random_state=None,
+                   tolerance=None,
+                   target_metric='accuracy'):
     """
     Cross-validate a model by splitting the dataset into training/validation
     sets numerous times and calculating summary statistics for the model scores.
+    Folds are fit and scored in parallel, and the inputs and targets are
+    shared with the worker processes as memory-mapped arrays. The scores are
+    gathered in fold order, so they do not depend on cpus.
+
+    When tolerance is given, repeats are run one at a time, and no more
+    repeats are run once the standard error of the mean of target_metric
+    across repeats falls below tolerance.
 
     Args:
       model: A trained instance of a scikit-learn estimator.
       datasets: An instance of Datasets.
       n_splits: Number of splits (or folds) to use in cross-validation.
+      cpus: Number of processes to use for cross-validation. (Default=1)
+      n_repeats: Number of times to repeat cross-validation with a different
+                 shuffle of the data, or the maximum number of repeats when
+                 tolerance is given. (Default=1)
+      stratified: Preserve the proportion of each class in every fold.
+                  (Default=False)
+      random_state: Seed for shuffling the data. The data is only shuffled
+                    when n_repeats > 1 or stratified is True. (Default=None)
+      tolerance: Standard error of target_metric to stop repeating at, or
+                 None to run all n_repeats repeats. (Default=None)
+      target_metric: Metric to compute the standard error of.
+                     (Default='accuracy')
 
     Returns:
      A 2-tuple of Scores objects, where the first element is the mean of all
@@ -313,17 +738,158 @@ def cross_validate(model, datasets, n_splits):
                               datasets.validation.targets))
 
     assert len(targets) == len(datasets.training.targets) + len(datasets.validation.targets)
-    kfold = sklearn.model_selection.KFold(n_splits=n_splits)
+    repeats = cross_validation_splits(targets, n_splits, n_repeats, stratified, random_state)
+    if tolerance is None:
+        repeats = [[split for splits in repeats for split in splits]]
+
+    # max_nbytes=0 memory-maps inputs and targets for every worker process
+    # instead of pickling them once per fold.
+    fold_scores = []
+    repeat_means = []
+    with Parallel(n_jobs=cpus, max_nbytes=0) as parallel:
+        for splits in repeats:
+            repeat_scores = parallel(delayed(score_fold)(model, inputs, targets, training_index, testing_index)
+                                     for training_index, testing_index in splits)
+
+            fold_scores.extend(repeat_scores)
+            if tolerance is not None:
+                repeat_means.append(np.nanmean([scores.get(target_metric, np.nan)
+                                                for scores in repeat_scores]))
+
+                if len(repeat_means) > 1 and stats.sem(repeat_means) < tolerance:
+                    break
+
+    if tolerance is not None:
+        logger = logging.getLogger(__name__)
+        logger.info('Cross-validation stopped after %d repeats.', len(repeat_means))
+
+    assert len(fold_scores) <= n_splits * n_repeats
+
+    return summarize_scores(fold_scores)
+
+
+def nested_cross_validate(model_class,
+                          datasets,
+                          outer_splits,
+                          inner_splits,
+                          score_function,
+                          cpus=1,
+                          stratified=False,
+                          random_state=None,
+                          **kwargs):
+
+    """
+    Estimate the performance of a hyperparameter search with nested
+    cross-validation. In each outer fold, train_model() searches for the
+    best hyperparameters with inner_splits-fold cross-validation on the
+    training part of the fold, and the selected model is scored on the
+    testing part, which the search never saw.
+
+    Outer folds run in parallel on up to cpus processes, and the search in
+    each outer fold gets an equal share of them, so no more than cpus
+    processes are used in total.
+
+    Args:
+      model_class: A scikit-learn estimator class e.g. 'sklearn.svm.SVC'.
+      datasets: An instance of Datasets. The training and validation
+                datasets are combined.
+      outer_splits: Number of outer folds to score the search on.
+      inner_splits: Number of inner folds to search with.
+      score_function: The score_function parameter of train_model().
+      cpus: Number of processes to use in total. (Default=1)
+      stratified: Preserve the proportion of each class in every outer
+                  fold. (Default=False)
+      random_state: Seed for shuffling the data into outer folds, and the
+                    random_state parameter of train_model(). (Default=None)
+      kwargs: Additional keyword arguments for train_model(), such as
+              preprocessing_methods, parameter_grid, refit, and search.
+
+    Returns:
+      A 3-tuple of the mean and standard deviation of the outer fold scores
+      (as in cross_validate()), and a list with the hyperparameters that
+      were selected in each outer fold. Only hyperparameters in
+      parameter_grid are included.
+
+    """
+
+    inputs = np.concatenate((datasets.training.inputs,
+                             datasets.validation.inputs))
+
+    targets = np.concatenate((datasets.training.targets,
+                              datasets.validation.targets))
+
+    splits = next(cross_validation_splits(targets,
+                                          outer_splits,
+                                          stratified=stratified,
+                                          random_state=random_state))
+
+    outer_cpus = min(cpus, outer_splits)
+    inner_cpus = max(1, cpus // outer_cpus)
+    fold_results = Parallel(n_jobs=outer_cpus, max_nbytes=0)(
+        delayed(nested_fold)(model_class,
+                             inputs,
+                             targets,
+                             training_index,
+                             testing_index,
+                             score_function,
+                             cpus=inner_cpus,
+                             cv=inner_splits,
+                             random_state=random_state,
+                             **kwargs)
+        for training_index, testing_index in splits
+    )
+
+    mean_scores, std_scores = summarize_scores([scores for scores, _ in fold_results])
+
+    return mean_scores, std_scores, [parameters for _, parameters in fold_results]
+
+
+def selected_parameter_counts(selected_parameters):
+    """
+    Count how many times each value of each hyperparameter was selected.
+
+    Args:
+      selected_parameters: A list of dicts of hyperparameters returned by
+                           nested_cross_validate().
+
+    Returns:
+      A dict keyed by hyperparameter name of lists of (value, count) tuples,
+      most common first. Values that are not hashable are replaced by their
+      repr.
+
+    """
+
+    counts = dict()
+    for parameters in selected_parameters:
+        for name, value in parameters.items():
+            try:
+                hash(value)
+
+            except TypeError:
+                value = repr(value)
+
+            counts.setdefault(name, collections.Counter())[value] += 1
+
+    return {name: counter.most_common() for name, counter in counts.items()}
+
+
+def summarize_scores(fold_scores):
+    """
+    Compute the mean and standard deviation of each metric over a number
+    of folds. Undefined scores are ignored.
+
+    Args:
+      fold_scores: A list of the scores of each fold returned by
+                   scoring.score_model().
+
+    Returns:
+      A 2-tuple of dicts of the mean and the standard deviation of each
+      metric.
+
+    """
+
     scores_lists = dict()
-    for training_index, testing_index in kfold.split(inputs):
-        training_inputs = inputs[training_index]
-        training_targets = targets[training_index]
-        testing_inputs = inputs[testing_index]
-        testing_targets = targets[testing_index]
-
-        new_model = sklearn.clone(model)
-        new_model.fit(training_inputs, training_targets)
-        scores = scoring.score_model(new_model, testing_inputs, testing_targets)
+    for scores in fold_scores:
         for metric, score in scores.items():
             if score is None or np.isnan(score):
                 continue
@@ -337,12 +903,113 @@ def cross_validate(model, datasets, n_splits):
     mean_scores = dict()
     std_scores = dict()
     for metric, score_list in scores_lists.items():
-        assert len(score_list) <= n_splits
         mean_scores[metric] = np.mean(score_list)
         std_scores[metric] = np.std(score_list)
 
     return mean_scores, std_scores
 
 
+def cross_validation_splits(targets, n_splits, n_repeats=1, stratified=False, random_state=None):
+    """
+    Split a dataset into cross-validation folds.
+
+    Args:
+      targets: A 1D numpy array of the targets of every sample.
+      n_splits: Number of splits (or folds) in each repeat.
+      n_repeats: Number of repeats. (Default=1)
+      stratified: Preserve the proportion of each class in every fold.
+                  (Default=False)
+      random_state: Seed for shuffling the data. The data is only shuffled
+                    when n_repeats > 1 or stratified is True. (Default=None)
+
+    Returns:
+      A generator of lists of (training_index, testing_index) tuples, with
+      one list for each repeat. The splits are the same as
+      sklearn.model_selection.RepeatedStratifiedKFold (or RepeatedKFold when
+      not stratified) with the same random_state.
+
+    """
+
+    fold_class = sklearn.model_selection.StratifiedKFold if stratified else sklearn.model_selection.KFold
+    if n_repeats == 1 and not stratified:
+        yield list(fold_class(n_splits=n_splits).split(targets, targets))
+        return
+
+    generator = np.random.RandomState(random_state)
+    for _ in range(n_repeats):
+        folds = fold_class(n_splits=n_splits, shuffle=True, random_state=generator)
+        yield list(folds.split(targets, targets))
+
+
+def score_fold(model, inputs, targets, training_index, testing_index):
+    """
+    Fit a clone of a model on one cross-validation fold and score it on the
+    rest of the data.
+
+    Args:
+      model: An instance of a scikit-learn estimator.
+      inputs: A 2D numpy array of inputs for every fold.
+      targets: A 1D numpy array of targets for every fold.
+      training_index: Indices of the training samples in inputs and targets.
+      testing_index: Indices of the testing samples in inputs and targets.
+
+    Returns:
+      The scores returned by scoring.score_model().
+
+    """
+
+    new_model = sklearn.clone(model)
+    new_model.fit(inputs[training_index], targets[training_index])
+
+    return scoring.score_model(new_model, inputs[testing_index], targets[testing_index])
+
+
+def nested_fold(model_class,
+                inputs,
+                targets,
+                training_index,
+                testing_index,
+                score_function,
+                **kwargs):
+
+    """
+    Search for the best hyperparameters on the training part of one outer
+    fold of nested cross-validation, and score the selected model on the
+    testing part.
+
+    Args:
+      model_class: A scikit-learn estimator class e.g. 'sklearn.svm.SVC'.
+      inputs: A 2D numpy array of inputs for every fold.
+      targets: A 1D numpy array of targets for every fold.
+      training_index: Indices of the training samples in inputs and targets.
+      testing_index: Indices of the testing samples in inputs and targets.
+      score_function: The score_function parameter of train_model().
+      kwargs: Additional keyword arguments for train_model().
+
+    Returns:
+      A 2-tuple of the scores returned by scoring.score_model(), and a dict
+      of the selected hyperparameters that are in the parameter grid.
+
+    """
+
+    model = train_model(model_class,
+                        inputs[training_index],
+                        targets[training_index],
+                        score_function,
+                        **kwargs)
+
+    parameter_grid = kwargs.get('parameter_grid') or []
+    if isinstance(parameter_grid, dict):
+        parameter_grid = [parameter_grid]
+
+    model_parameters = model.get_params()
+    selected_parameters = {name: model_parameters[name]
+                           for grid in parameter_grid for name in grid}
+
+    scores = scoring.score_model(model, inputs[testing_index], targets[testing_index])
+
+    return scores, selected_parameters
+
+
 if __name__ == '__main__':  # pragma: no cover
     sys.exit(main(sys.argv[1:]))
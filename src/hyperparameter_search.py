@@ -0,0 +1,312 @@
+"""
+Hyperparameter search strategies that sample from distributions instead of
+enumerating a grid.
+
+A parameter grid may give each hyperparameter either as a list of possible
+values, or as a dict with a single key naming a distribution and a 2-element
+list of its bounds:
+
+  {"model__C": {"loguniform": [0.001, 1000]},
+   "model__gamma": {"uniform": [0, 1]},
+   "model__n_neighbors": {"randint": [1, 50]},
+   "model__kernel": ["linear", "rbf"]}
+
+Both bounds are inclusive. parse_distributions() converts a grid in this
+format to scipy.stats distributions, which may be used with
+sklearn.model_selection.RandomizedSearchCV or BayesianSearchCV.
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+References:
+  https://doi.org/10.1023/A:1008306431147
+  https://arxiv.org/abs/1206.2944
+
+"""
+
+import warnings
+
+import numpy as np
+from scipy import stats
+from joblib import effective_n_jobs
+from sklearn.model_selection import ParameterSampler
+from sklearn.model_selection._search import BaseSearchCV
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import ConstantKernel, Matern, WhiteKernel
+from sklearn.exceptions import ConvergenceWarning
+
+# Distributions that may be used in a parameter grid, keyed by name. Each
+# function takes the inclusive lower and upper bounds of the distribution.
+DISTRIBUTIONS = {
+    'uniform': lambda low, high: stats.uniform(low, high - low),
+    'loguniform': stats.loguniform,
+    'randint': lambda low, high: stats.randint(low, high + 1),
+}
+
+# Number of random candidates to choose the next candidate from, by
+# maximizing expected improvement.
+N_PROPOSALS = 1000
+
+
+def parse_distributions(parameter_grid):  # pylint: disable=C0103
+    """
+    Convert the distributions in a parameter grid to scipy.stats
+    distributions.
+
+    Args:
+      parameter_grid: A dict or a sequence of dicts of hyperparameter values
+                      in the format described in the module docstring.
+
+    Returns:
+      A list of dicts, where each hyperparameter is a list of possible
+      values or a scipy.stats distribution.
+
+    """
+
+    if isinstance(parameter_grid, dict):
+        parameter_grid = [parameter_grid]
+
+    parsed_grid = []
+    for grid in parameter_grid:
+        parsed = dict()
+        for name, values in grid.items():
+            if isinstance(values, dict):
+                if len(values) != 1 or next(iter(values)) not in DISTRIBUTIONS:
+                    raise ValueError(f'{name} must name one of {sorted(DISTRIBUTIONS)}.')
+
+                distribution, bounds = next(iter(values.items()))
+                if len(bounds) != 2 or bounds[0] > bounds[1]:
+                    raise ValueError(f'The bounds of {name} must be a list of [low, high].')
+
+                parsed[name] = DISTRIBUTIONS[distribution](*bounds)
+
+            else:
+                parsed[name] = values
+
+        parsed_grid.append(parsed)
+
+    return parsed_grid
+
+
+class BayesianSearchCV(BaseSearchCV):
+    """
+    Sequential model-based hyperparameter search. After n_initial_points
+    random candidates, a Gaussian process is fit to the mean score of every
+    candidate so far, and the candidate that maximizes its expected
+    improvement is evaluated next. Candidates are proposed in batches of
+    n_jobs that are evaluated in parallel, using the Gaussian process's
+    prediction as a stand-in for the score of each candidate already in the
+    batch.
+
+    Args:
+      estimator: A scikit-learn estimator.
+      param_distributions: A dict or a sequence of dicts, where each
+                           hyperparameter is a list of possible values or a
+                           scipy.stats distribution.
+      n_iter: Number of candidates to evaluate. (Default=10)
+      metric: The key in the dict returned by scoring to optimize, or
+              'score' when scoring returns a single score. (Default='score')
+      greater_is_better: True if higher scores are better. (Default=True)
+      n_initial_points: Number of random candidates to evaluate before
+                        fitting the Gaussian process. (Default=10)
+
+      The remaining arguments are the same as
+      sklearn.model_selection.RandomizedSearchCV.
+
+    """
+
+    def __init__(self,
+                 estimator,
+                 param_distributions,
+                 *,
+                 n_iter=10,
+                 scoring=None,
+                 n_jobs=None,
+                 refit=True,
+                 cv=None,
+                 verbose=0,
+                 pre_dispatch='2*n_jobs',
+                 random_state=None,
+                 error_score=np.nan,
+                 return_train_score=False,
+                 metric='score',
+                 greater_is_better=True,
+                 n_initial_points=10):
+
+        super().__init__(estimator=estimator,
+                         scoring=scoring,
+                         n_jobs=n_jobs,
+                         refit=refit,
+                         cv=cv,
+                         verbose=verbose,
+                         pre_dispatch=pre_dispatch,
+                         error_score=error_score,
+                         return_train_score=return_train_score)
+
+        self.param_distributions = param_distributions
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.metric = metric
+        self.greater_is_better = greater_is_better
+        self.n_initial_points = n_initial_points
+
+    def _run_search(self, evaluate_candidates):
+        generator = np.random.RandomState(self.random_state)
+        grids = self.param_distributions
+        if isinstance(grids, dict):
+            grids = [grids]
+
+        batch_size = max(1, effective_n_jobs(self.n_jobs))
+        results = evaluate_candidates(_sample(grids, min(self.n_initial_points, self.n_iter), generator))
+        while len(results['params']) < self.n_iter:
+            batch = self._propose(grids,
+                                  results,
+                                  min(batch_size, self.n_iter - len(results['params'])),
+                                  generator)
+
+            if not batch:
+                break
+
+            results = evaluate_candidates(batch)
+
+    def _propose(self, grids, results, batch_size, generator):
+        """
+        Propose the next batch of candidates.
+
+        """
+
+        scores = np.asarray(results[f'mean_test_{self.metric}'], dtype=float)
+        if not self.greater_is_better:
+            scores = -scores
+
+        defined = np.isfinite(scores)
+        evaluated = np.array([_encode(grids, parameters) for parameters in results['params']])[defined]
+        scores = scores[defined]
+        proposals = []
+        keys = {_key(parameters) for parameters in results['params']}
+        for parameters in _sample(grids, N_PROPOSALS, generator):
+            if _key(parameters) not in keys:
+                keys.add(_key(parameters))
+                proposals.append(parameters)
+
+        encoded = np.array([_encode(grids, parameters) for parameters in proposals])
+        batch = []
+        while len(batch) < batch_size and proposals:
+            index = 0
+            if len(scores) >= 2:
+                gaussian_process = _fit_gaussian_process(evaluated, scores, generator)
+                index = int(np.argmax(_expected_improvement(gaussian_process, np.max(scores), encoded)))
+
+                # Believe the Gaussian process's prediction for the candidate,
+                # so the next candidate in the batch is chosen elsewhere.
+                evaluated = np.vstack([evaluated, encoded[index]])
+                scores = np.append(scores, gaussian_process.predict(encoded[[index]]))
+
+            batch.append(proposals.pop(index))
+            encoded = np.delete(encoded, index, axis=0)
+
+        return batch
+
+
+def _sample(grids, n_candidates, generator):  # pylint: disable=C0103
+    """
+    Sample candidates from a parameter grid, without replacement if every
+    hyperparameter is a list of values.
+
+    """
+
+    with warnings.catch_warnings():
+        # ParameterSampler warns when a grid of lists has fewer than
+        # n_candidates candidates.
+        warnings.simplefilter('ignore', UserWarning)
+        return list(ParameterSampler(grids, n_candidates, random_state=generator))
+
+
+def _key(parameters):  # pylint: disable=C0103
+    """
+    Make a hashable key for a candidate.
+
+    """
+
+    return repr(sorted(parameters.items()))
+
+
+def _encode(grids, parameters):  # pylint: disable=C0103
+    """
+    Encode a candidate as a vector with every element between 0 and 1.
+    When there is more than one grid, there is an element for each grid
+    that is 1 if the candidate belongs to it. Hyperparameters with a
+    distribution are scaled to [0, 1], on a log scale for log-uniform
+    distributions, and hyperparameters with a list of values are one-hot
+    encoded. Hyperparameters that the candidate does not have are 0.
+
+    """
+
+    vector = []
+    if len(grids) > 1:
+        vector.extend(set(grid) == set(parameters) for grid in grids)
+
+    for name in sorted({name for grid in grids for name in grid}):
+        options = [grid[name] for grid in grids if name in grid]
+        distributions = [option for option in options if hasattr(option, 'rvs')]
+        if distributions:
+            vector.append(_scale(distributions[0], parameters[name]) if name in parameters else 0)
+
+        else:
+            values = [value for option in options for value in option]
+            vector.extend(name in parameters and value == parameters[name] for value in values)
+
+    return np.array(vector, dtype=float)
+
+
+def _scale(distribution, value):  # pylint: disable=C0103
+    """
+    Scale a value sampled from a distribution to [0, 1].
+
+    """
+
+    low, high = distribution.support()
+    transform = np.log if distribution.dist.name in ('loguniform', 'reciprocal') else float
+    if high == low:
+        return 0.0
+
+    return (transform(value) - transform(low)) / (transform(high) - transform(low))
+
+
+def _fit_gaussian_process(x, y, generator):  # pylint: disable=C0103
+    """
+    Fit a Gaussian process to the scores y of the encoded candidates x.
+
+    """
+
+    kernel = (ConstantKernel() * Matern(length_scale=np.ones(x.shape[1]), nu=2.5)
+              + WhiteKernel(noise_level=1e-3))
+
+    gaussian_process = GaussianProcessRegressor(kernel=kernel,
+                                                normalize_y=True,
+                                                n_restarts_optimizer=2,
+                                                random_state=generator)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        gaussian_process.fit(x, y)
+
+    return gaussian_process
+
+
+def _expected_improvement(gaussian_process, best_score, proposals):  # pylint: disable=C0103
+    """
+    Compute the expected improvement of each proposal over best_score.
+
+    """
+
+    mean, std = gaussian_process.predict(proposals, return_std=True)
+    improvement = mean - best_score
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = improvement / std
+        expected_improvement = improvement * stats.norm.cdf(z) + std * stats.norm.pdf(z)
+
+    return np.where(std > 0, expected_improvement, np.maximum(improvement, 0))
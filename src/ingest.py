@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+"""
+Ingest many raw heart disease datasets in parallel.
+
+Each source is ingested by the ingester for its file suffix (see
+INGESTERS), with the same arguments as when the ingester is run on its own,
+and is written to its own CSV file in the target directory. Sources may be
+dataset files, directories, in which case every dataset in the directory
+with a known suffix is ingested, or glob patterns. Datasets are ingested in
+a pool of worker processes, so Python and pandas only start up once per
+worker instead of once per dataset.
+
+Usage: ingest.py [-h] [--cpu CPU] target source [source ...]
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import sys
+import glob
+from pathlib import Path
+
+from joblib import Parallel, delayed
+
+import ingest_raw_uci_data
+import ingest_cleveland_data
+from ingester_clparser import parse_command_line
+
+# Ingesters keyed by the file suffix of the datasets they ingest.
+INGESTERS = {
+    '.data': ingest_raw_uci_data,
+    '.csv': ingest_cleveland_data,
+}
+
+
+def main(argv):
+    """
+    Program's 'main' function. Main execution starts here.
+
+    """
+
+    command_line_arguments = parse_command_line(argv, multiple_sources=True)
+    sources = find_sources(command_line_arguments.source)
+    exit_codes = ingest(command_line_arguments.target,
+                        sources,
+                        cpus=command_line_arguments.cpu)
+
+    return max(exit_codes, default=0)
+
+
+def find_sources(paths):
+    """
+    Find the datasets to ingest.
+
+    Args:
+      paths: A sequence of paths to datasets, directories of datasets or glob
+             patterns.
+
+    Returns:
+      A list of paths to datasets, in the order they were given, with the
+      datasets in directories and matching glob patterns sorted by name.
+      Each dataset is only given once.
+
+    Raises:
+      ValueError if a path does not exist or has no ingester, or if two
+      datasets would be written to the same output file.
+
+    """
+
+    sources = []
+    for path in paths:
+        if path.is_dir():
+            sources.extend(sorted(source for source in path.iterdir()
+                                  if source.suffix in INGESTERS))
+
+        elif path.exists():
+            sources.append(path)
+
+        elif glob.has_magic(str(path)):
+            sources.extend(sorted(Path(source) for source in glob.glob(str(path))))
+
+        else:
+            raise ValueError(f'Source dataset not found: {path}')
+
+    sources = list(dict.fromkeys(sources))
+    outputs = set()
+    for source in sources:
+        if source.suffix not in INGESTERS:
+            raise ValueError(f'No ingester for {source}')
+
+        if source.stem in outputs:
+            raise ValueError(f'More than one source dataset named {source.stem}')
+
+        outputs.add(source.stem)
+
+    return sources
+
+
+def ingest(target, sources, cpus=1):
+    """
+    Ingest datasets in parallel.
+
+    Args:
+      target: Directory to write the ingested CSV files to.
+      sources: A sequence of paths to datasets with suffixes in INGESTERS.
+      cpus: Number of datasets to ingest in parallel. (Default=1)
+
+    Returns:
+      A list of the exit codes of the ingesters, in the same order as
+      sources.
+
+    """
+
+    return Parallel(n_jobs=min(cpus, max(len(sources), 1)))(
+        delayed(ingest_dataset)(target, source) for source in sources
+    )
+
+
+def ingest_dataset(target, source):
+    """
+    Ingest one dataset with the ingester for its file suffix.
+
+    Args:
+      target: Directory to write the ingested CSV file to.
+      source: Path to the dataset.
+
+    Returns:
+      The exit code of the ingester.
+
+    """
+
+    return INGESTERS[source.suffix].main([str(target), str(source)])
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main(sys.argv[1:]))
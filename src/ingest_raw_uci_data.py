@@ -9,7 +9,9 @@ Inputs to this script are three individual datasets containing heart
 disease data - switzerland.data, hungarian.data, and long_beach.data.
 
 Steps performed by this script include:
-- Convert each dataset from a one-dimensional list to a dataframe.
+- Convert each dataset from a one-dimensional list to a dataframe. The
+  dataset is read and converted in chunks of CHUNK_SIZE bytes, so memory use
+  does not grow with the size of the dataset.
 - Create a subset of only the columns we are interested in
   (see SUBSET_COLUMNS).
 - Rename num to target.
@@ -22,11 +24,11 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 """
 
-import re
 import sys
 import subprocess
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 from ingester_clparser import parse_command_line
@@ -111,6 +113,16 @@ COLUMN_NAMES = ('id',
                 'junk',
                 'name')
 
+# Columns that contain strings. All other columns are numeric.
+STRING_COLUMNS = ('name',)
+
+# Value that represents missing data in numeric columns. It is written
+# as either -9 or -9. in the datasets.
+MISSING_VALUE = -9
+
+# Number of bytes to read from a dataset at a time.
+CHUNK_SIZE = 2 ** 20
+
 GIT_ROOT = subprocess.check_output(['git', 'rev-parse', '--show-toplevel'])
 GIT_ROOT = Path(GIT_ROOT.decode('utf-8').strip())
 DATA = GIT_ROOT / 'data'
@@ -123,12 +135,15 @@ def main(argv):
     """
 
     command_line_arguments = parse_command_line(argv)
-    dataset = load_dataset(command_line_arguments.source)
-
-    # Rename num to target.
-    dataset.rename(mapper=dict(num='target'), axis=1, inplace=True)
     output_path = (command_line_arguments.target / command_line_arguments.source.name).with_suffix('.csv')
-    dataset.to_csv(output_path, index=False)
+    with output_path.open('w', newline='') as output_fp:
+        # Rename num to target.
+        columns = [('target' if column == 'num' else column) for column in COLUMN_NAMES]
+        pd.DataFrame(columns=columns).to_csv(output_fp, index=False)
+        for dataset in iter_dataset(command_line_arguments.source, CHUNK_SIZE):
+            # Write whole numbers without a decimal point, as they appear in
+            # the source dataset.
+            dataset.to_csv(output_fp, index=False, header=False, float_format='%.15g')
 
     return 0
 
@@ -138,25 +153,85 @@ def load_dataset(path):
     Load a dataset from a file containing whitespace-separated values
     and return a pandas dataframe.
 
+    The values are split into a numpy array in bulk and reshaped to one row
+    per sample. Numeric columns are converted to floats, with MISSING_VALUE
+    replaced by NaN, and STRING_COLUMNS are kept as strings. An incomplete
+    sample at the end of the file is ignored.
+
     """
 
-    with path.open() as dataset_fp:
-        raw_data = dataset_fp.read()
+    return create_dataset(path.read_bytes().split())
 
-    samples = []
-    current_sample = []
-    for count, data_point in enumerate(re.split(r'\s+', raw_data)):
-        if count != 0 and count % len(COLUMN_NAMES) == 0:
-            samples.append(current_sample)
-            current_sample = []
 
-        if data_point == '-9':
-            data_point = None
+def iter_dataset(path, chunk_size=CHUNK_SIZE):
+    """
+    Load a dataset from a file containing whitespace-separated values one
+    chunk at a time.
+
+    Samples do not line up with lines or chunks, so the values of an
+    incomplete sample, and an incomplete value, at the end of each chunk are
+    carried over to the next one.
+
+    Args:
+      path: Path to the dataset.
+      chunk_size: Number of bytes to read at a time. (Default=CHUNK_SIZE)
+
+    Returns:
+      A generator of pandas dataframes returned by create_dataset(), with
+      the complete samples in each chunk.
+
+    """
 
-        current_sample.append(data_point)
+    carried_tokens = []
+    carried_value = b''
+    with path.open('rb') as dataset_fp:
+        for chunk in iter(lambda: dataset_fp.read(chunk_size), b''):
+            chunk = carried_value + chunk
+            tokens = chunk.split()
+            carried_value = b''
+            if tokens and not chunk[-1:].isspace():
+                carried_value = tokens.pop()
+
+            tokens = carried_tokens + tokens
+            n_values = len(tokens) - len(tokens) % len(COLUMN_NAMES)
+            carried_tokens = tokens[n_values:]
+            if n_values:
+                yield create_dataset(tokens[:n_values])
+
+    # The last value of the dataset is only complete at the end of the file.
+    if carried_value:
+        carried_tokens.append(carried_value)
+
+    if len(carried_tokens) == len(COLUMN_NAMES):
+        yield create_dataset(carried_tokens)
+
+
+def create_dataset(tokens):
+    """
+    Convert a list of values to a dataframe.
+
+    Args:
+      tokens: A list of values as bytes, in the order that they appear in
+              the dataset. An incomplete sample at the end is ignored.
+
+    Returns:
+      A pandas dataframe with the columns in COLUMN_NAMES. Numeric columns
+      are floats with MISSING_VALUE replaced by NaN, and STRING_COLUMNS are
+      strings.
+
+    """
 
-    dataset = pd.DataFrame(data=samples, columns=COLUMN_NAMES)
-    return dataset
+    n_samples = len(tokens) // len(COLUMN_NAMES)
+    samples = np.array(tokens[:n_samples * len(COLUMN_NAMES)], dtype=object)
+    samples = samples.reshape(n_samples, len(COLUMN_NAMES))
+    numeric_columns = [column for column in COLUMN_NAMES if column not in STRING_COLUMNS]
+    numeric_data = samples[:, [COLUMN_NAMES.index(column) for column in numeric_columns]].astype(float)
+    numeric_data[numeric_data == MISSING_VALUE] = np.nan
+    dataset = pd.DataFrame(data=numeric_data, columns=numeric_columns)
+    for column in STRING_COLUMNS:
+        dataset[column] = [value.decode('utf-8') for value in samples[:, COLUMN_NAMES.index(column)]]
+
+    return dataset[list(COLUMN_NAMES)]
 
 
 if __name__ == '__main__':  # pragma: no cover
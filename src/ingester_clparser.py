@@ -9,16 +9,19 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 """
 
+import os
 import argparse
 from pathlib import Path
 
 
-def parse_command_line(argv):
+def parse_command_line(argv, multiple_sources=False):
     """
     Parse the command line using argparse.
 
     Args
       argv: A list of command line arguments, excluding the program name.
+      multiple_sources: Accept one or more sources and a --cpu option
+                        instead of a single source. (Default=False)
 
     Returns
       The output of parse_args().
@@ -30,8 +33,20 @@ def parse_command_line(argv):
                         type=Path,
                         help='Path to write the ingested CSV data file.')
 
-    parser.add_argument('source',
-                        type=Path,
-                        help='Raw input dataset to ingest.')
+    if multiple_sources:
+        parser.add_argument('source',
+                            type=Path,
+                            nargs='+',
+                            help='Raw input datasets, directories or glob patterns to ingest.')
+
+        parser.add_argument('--cpu',
+                            type=int,
+                            default=os.cpu_count(),
+                            help='Number of datasets to ingest in parallel.')
+
+    else:
+        parser.add_argument('source',
+                            type=Path,
+                            help='Raw input dataset to ingest.')
 
     return parser.parse_args(argv)
@@ -0,0 +1,181 @@
+"""
+An O(n log² n) time, O(n) memory implementation of the medcouple robust
+measure of skew.
+
+The medcouple is the median of the kernel h(u, l) = (u + l) / (u - l) over
+every pair of values u >= median and l <= median in a sample. The naive
+algorithm computes all n² / 4 kernel values. Instead, this module uses the
+fact that the kernel matrix is sorted along both of its axes to select its
+median without storing it, with the weighted median pivoting scheme of
+Johnson and Mizoguchi. Their algorithm counts the kernel values below each
+pivot with a linear walk along the staircase that the pivot traces through
+the matrix, for O(n log n) time overall. Here each row is binary searched
+instead, which adds a factor of log n but lets every count run as a few
+vectorized NumPy operations over all rows rather than a Python loop. The
+result is the same as statsmodels.stats.stattools.medcouple up to floating
+point rounding, including the handling of values tied with the median.
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+References:
+  https://doi.org/10.1198/106186004X12632
+  https://doi.org/10.1137/0213035
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# The medcouple kernel matrix of a sample centred on its median, with one row
+# for each value in upper and one column for each value in lower. Both are
+# sorted in ascending order, so the matrix is sorted in ascending order along
+# both rows and columns. ties is the number of values equal to the median.
+Kernel = namedtuple('Kernel', ('upper', 'lower', 'ties'))
+
+
+def medcouple(y, axis=0):  # pylint: disable=C0103
+    """
+    Calculate the medcouple robust measure of skew.
+
+    Args:
+      y: Array of data to compute the medcouple of.
+      axis: Axis along which to compute the medcouple, or None to use the
+            entire array. (Default=0)
+
+    Returns:
+      An array with the same shape as y with axis removed, or a float when
+      axis is None. The medcouple of an empty array, or of one that contains
+      NaN, is NaN, like statsmodels.stats.stattools.medcouple.
+
+    """
+
+    y = np.asarray(y, dtype=float)
+    if axis is None:
+        return _medcouple_1d(y.ravel())
+
+    return np.apply_along_axis(_medcouple_1d, axis, y)
+
+
+def _medcouple_1d(y):  # pylint: disable=C0103
+    """
+    Calculate the medcouple of a 1D array.
+
+    """
+
+    if y.shape[0] == 0 or np.any(np.isnan(y)):
+        return np.nan
+
+    y = np.sort(y)
+    n = y.shape[0]
+    if n % 2 == 0:
+        median = (y[n // 2 - 1] + y[n // 2]) / 2
+
+    else:
+        median = y[(n - 1) // 2]
+
+    z = y - median
+    lower = z[z <= 0.0]
+    kernel = Kernel(upper=z[z >= 0.0], lower=lower, ties=np.sum(lower == 0.0))
+    size = len(kernel.upper) * len(kernel.lower)
+    if size % 2 == 1:
+        return _select(kernel, size // 2)
+
+    return np.mean([_select(kernel, size // 2 - 1), _select(kernel, size // 2)])
+
+
+def _kernel(kernel, rows, columns):  # pylint: disable=C0103
+    """
+    Compute the kernel at the given rows and columns.
+
+    """
+
+    upper = kernel.upper[rows]
+    lower = kernel.lower[columns]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = (upper + lower) / (upper - lower)
+
+    # Pairs of values that are both tied with the median are given -1, 0 or 1
+    # depending on which side of the anti-diagonal of the block of ties they
+    # are on.
+    tie_column = columns - (len(kernel.lower) - kernel.ties)
+    tied = (rows < kernel.ties) & (tie_column >= 0)
+    values[tied] = np.sign(rows[tied] + tie_column[tied] - (kernel.ties - 1))
+
+    return values
+
+
+def _count_less(kernel, value, left, right, strict):  # pylint: disable=C0103
+    """
+    Count the elements in each row of kernel that are less than value (or
+    less than or equal to value if not strict) with a binary search of each
+    row. Only columns in [left, right) are searched, and the others are
+    assumed to be on the correct side of value.
+
+    """
+
+    rows = np.arange(len(kernel.upper))
+    left = left.copy()
+    right = right.copy()
+    active = rows[left < right]
+    while len(active) > 0:
+        middle = (left[active] + right[active]) // 2
+        values = _kernel(kernel, active, middle)
+        below = values < value if strict else values <= value
+        left[active[below]] = middle[below] + 1
+        right[active[~below]] = middle[~below]
+        active = rows[left < right]
+
+    return left
+
+
+def _select(kernel, k):  # pylint: disable=C0103
+    """
+    Select the k-th smallest element (counting from 0) of kernel.
+
+    Each iteration pivots on the weighted median of the middle elements of
+    the candidate columns in every row, which eliminates at least a quarter of
+    the candidates.
+
+    """
+
+    n_rows = len(kernel.upper)
+    rows = np.arange(n_rows)
+    left = np.zeros(n_rows, dtype=int)
+    right = np.full(n_rows, len(kernel.lower))
+    while np.sum(right - left) > n_rows:
+        candidates = left < right
+        weights = (right - left)[candidates]
+        middle_values = _kernel(kernel,
+                                rows[candidates],
+                                ((left + right - 1) // 2)[candidates])
+
+        order = np.argsort(middle_values, kind='stable')
+        cumulative_weights = np.cumsum(weights[order])
+        pivot = middle_values[order][np.searchsorted(cumulative_weights,
+                                                     cumulative_weights[-1] / 2)]
+
+        less = np.clip(_count_less(kernel, pivot, left, right, strict=True), left, right)
+        less_equal = np.clip(_count_less(kernel, pivot, left, right, strict=False), left, right)
+        if k < np.sum(less):
+            right = less
+
+        elif k >= np.sum(less_equal):
+            left = less_equal
+
+        else:
+            return pivot
+
+    counts = right - left
+    candidate_rows = np.repeat(rows, counts)
+    candidate_columns = (np.arange(np.sum(counts))
+                         - np.repeat(np.cumsum(counts) - counts, counts)
+                         + np.repeat(left, counts))
+
+    values = np.sort(_kernel(kernel, candidate_rows, candidate_columns))
+
+    return values[k - np.sum(left)]
@@ -10,22 +10,214 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 """
 
+import hashlib
 import logging
 
 import numpy as np
 from scipy import stats
 import pandas as pd
 import rrcf
-from statsmodels.stats.stattools import medcouple
 
 import scoring
+import random_cut_forest
+import quantile_sketch
+from medcouple import medcouple
 
 
 # Default tree_size to use for random_cut().
 DEFAULT_TREE_SIZE = 256
 
+# Engines that can be used to build and score the forest in random_cut().
+RANDOM_CUT_ENGINES = ('numpy', 'batch', 'rrcf')
 
-def score(model, datasets, random_state=0):  # pylint: disable=C0103
+# Maximum number of datasets to cache the results of is_numeric() for.
+IS_NUMERIC_CACHE_SIZE = 16
+
+# Results of is_numeric() keyed by a digest of the dataset and frac.
+_is_numeric_cache = dict()
+
+
+class OutlierDetector:
+    """
+    Locate outlier rows with the same methods as locate(), but fit the
+    adjusted boxplot fences and random cut forest once so that they can be
+    saved and reused to test new rows for outliers.
+
+    Like locate(), only numeric columns are tested against the fences, and
+    whether a column is numeric is decided by is_numeric() on the fitted rows
+    and the tested rows together. The distinct values of the columns that are
+    not known to be numeric are kept for this. Unlike
+    locate_dataset_outliers(), the detector is fit to the inputs only,
+    without the targets, so that rows can be tested before they are
+    classified.
+
+    Like random_cut(), the forest is built with a random number generator
+    for each tree seeded from random_state, so the results are the same for
+    any value of n_jobs. By default, rows are scored by their
+    expected codisp, so each row is given the same score no matter which
+    other rows it is scored with.
+
+    Args:
+      n_trees: Number of trees in the forest. (Default=100)
+      tree_size: Number of samples to include in a single tree, or None to
+                 use min(DEFAULT_TREE_SIZE, len(x1) // 2) like locate().
+                 (Default=None)
+      k: Value of k to use for Tukey's fences. (Default=1.5)
+      random_state: An integer to initialize the random number generators.
+                    Default is 0.
+      engine: Engine to score rows with. Either 'numpy' or 'batch'.
+              See random_cut(). The 'numpy' engine draws the insertion cuts
+              for each tree from one generator, one row after another, so
+              the score of a row depends on the rows scored before it in
+              the same call. (Default='batch')
+      n_jobs: Number of processes to build and score the forest with, or -1
+              to use all CPUs. (Default=None)
+
+    """
+
+    def __init__(self,
+                 n_trees=100,
+                 tree_size=None,
+                 k=1.5,
+                 random_state=0,
+                 engine='batch',
+                 n_jobs=None):
+
+        if engine not in RANDOM_CUT_ENGINES or engine == 'rrcf':
+            raise ValueError("engine must be 'numpy' or 'batch'.")
+
+        self.n_trees = n_trees
+        self.tree_size = tree_size
+        self.k = k  # pylint: disable=C0103
+        self.random_state = random_state
+        self.engine = engine
+        self.n_jobs = n_jobs
+        self.n_rows = None
+        self.real_columns = None
+        self.column_values = None
+        self.lower_fence = None
+        self.upper_fence = None
+        self.forest = None
+        self.codisp_fence = None
+
+    def fit(self, x1):  # pylint: disable=C0103
+        """
+        Fit the outlier detector to the rows of x1.
+
+        Args:
+          x1: n x m array to use as the basis for identifying outlier rows.
+
+        Returns:
+          self
+
+        """
+
+        x1 = np.array(x1, dtype=float)
+        if x1.ndim != 2:
+            raise ValueError('x1.ndim must equal 2.')
+
+        tree_size = self.tree_size
+        if tree_size is None:
+            tree_size = min(DEFAULT_TREE_SIZE, x1.shape[0] // 2)
+
+        if tree_size < 1 or tree_size > x1.shape[0]:
+            raise ValueError('tree_size must be between 1 and len(x1).')
+
+        self.n_rows = x1.shape[0]
+        self.real_columns = _has_real_numbers(x1)
+        self.column_values = [None if real else np.unique(column)
+                              for real, column in zip(self.real_columns, x1.T)]
+
+        self.lower_fence, self.upper_fence = adjusted_boxplot_fences(x1)
+        self.forest = random_cut_forest.build(x1, self.n_trees, tree_size,
+                                              random_state=self.random_state,
+                                              n_jobs=self.n_jobs)
+
+        x1_mean_codisp = random_cut_forest.mean_leaf_codisp(self.forest, x1.shape[0])
+        self.codisp_fence = _codisp_fence(x1_mean_codisp, self.k)
+
+        return self
+
+    def score_samples(self, x2):  # pylint: disable=C0103
+        """
+        Compute the mean codisp of each row in x2 over the trees of the
+        fitted forest. Rows with greater scores are more anomalous.
+
+        Args:
+          x2: k x m array of rows to score.
+
+        Returns:
+          k x 1 array of mean codisps.
+
+        """
+
+        x2 = self._check_rows(x2)
+        return _mean_insert_codisp(self.forest, x2,
+                                   self.engine,
+                                   self.random_state,
+                                   self.n_jobs)
+
+    def predict(self, x2):  # pylint: disable=C0103
+        """
+        Test the rows of x2 for outliers.
+
+        Args:
+          x2: k x m array to test for outlier rows.
+
+        Returns:
+          k x 1 boolean array where True elements indicate outlier rows in x2.
+
+        """
+
+        x2 = self._check_rows(x2)
+        univariate_outliers = (x2 < self.lower_fence) + (x2 > self.upper_fence)
+        outliers = np.any(univariate_outliers[:, self.numeric_columns(x2)], axis=1)
+        outliers += self.score_samples(x2) > self.codisp_fence
+        assert outliers.shape[0] == x2.shape[0]
+
+        return outliers
+
+    def numeric_columns(self, x2):  # pylint: disable=C0103
+        """
+        Test which columns are numeric, with the same result as is_numeric()
+        on the fitted rows and the rows of x2 together.
+
+        Args:
+          x2: k x m array of rows to test.
+
+        Returns:
+          m x 1 boolean array where True elements indicate numeric columns.
+
+        """
+
+        x2 = self._check_rows(x2)
+        numeric_columns = self.real_columns | _has_real_numbers(x2)
+        # Use the default frac of is_numeric(), like locate() does.
+        max_categories = (self.n_rows + x2.shape[0]) * .05
+        for column in np.flatnonzero(~numeric_columns):
+            values = np.unique(np.concatenate([self.column_values[column], x2[:, column]]))
+            numeric_columns[column] = len(values) > max_categories
+
+        return numeric_columns
+
+    def _check_rows(self, x2):  # pylint: disable=C0103
+        """
+        Check that the detector has been fitted and that x2 has the same
+        number of columns as the rows it was fitted to.
+
+        """
+
+        if self.forest is None:
+            raise ValueError('OutlierDetector must be fitted before it is used.')
+
+        x2 = np.array(x2, dtype=float)
+        if x2.ndim != 2 or x2.shape[1] != len(self.real_columns):
+            raise ValueError('x2 must have the same number of columns as x1.')
+
+        return x2
+
+
+def score(model, datasets, random_state=0, n_jobs=None, outlier_rows=None):  # pylint: disable=C0103
     """
     Score model on only the outliers in a dataset.
 
@@ -34,28 +226,29 @@ def score(model, datasets, random_state=0):  # pylint: disable=C0103
       datasets: An instance of Datasets.
       random_state: An integer to initialize the random number generators.
                     Default is 0.
+      n_jobs: Number of processes to use for random_cut(). (Default=None)
+      outlier_rows: The output of `locate_dataset_outliers` for datasets,
+                    or None to locate the outliers. Used to score
+                    several models on the same datasets without locating
+                    the outliers each time. (Default=None)
 
     Returns:
       A scores dict returned by `score_model`.
 
     """
 
-    train = np.column_stack([datasets.training.inputs, datasets.training.targets])
-    assert train.shape[0] == datasets.training.inputs.shape[0]
-    assert train.shape[1] == datasets.training.inputs.shape[1] + 1
-    test = np.column_stack([datasets.validation.inputs, datasets.validation.targets])
-    assert test.shape[0] == datasets.validation.inputs.shape[0]
-    assert test.shape[1] == datasets.validation.inputs.shape[1] + 1
-    outliers = locate(train, test, random_state=random_state)
-    outlier_count = np.sum(outliers)
+    if outlier_rows is None:
+        outlier_rows = locate_dataset_outliers(datasets, random_state=random_state, n_jobs=n_jobs)
+
+    outlier_count = np.sum(outlier_rows)
     if outlier_count == 0:
         logger = logging.getLogger(__name__)
         logger.warning('No outliers found.')
         return dict()
 
     scores = scoring.score_model(model,
-                                 datasets.validation.inputs[outliers],
-                                 datasets.validation.targets[outliers])
+                                 datasets.validation.inputs[outlier_rows],
+                                 datasets.validation.targets[outlier_rows])
 
     # All values in `scores` need to be a float so that the string formatter in
     # gen_model.bind_model_metadata() can handle them correctly.
@@ -64,7 +257,33 @@ def score(model, datasets, random_state=0):  # pylint: disable=C0103
     return scores
 
 
-def locate(x1, x2, random_state=0):  # pylint: disable=C0103
+def locate_dataset_outliers(datasets, random_state=0, n_jobs=None):  # pylint: disable=C0103
+    """
+    Locate outlier rows in the validation dataset with respect to the
+    training dataset, including the targets of both.
+
+    Args:
+      datasets: An instance of Datasets.
+      random_state: An integer to initialize the random number generators.
+                    Default is 0.
+      n_jobs: Number of processes to use for random_cut(). (Default=None)
+
+    Returns:
+      A boolean array returned by `locate`.
+
+    """
+
+    train = np.column_stack([datasets.training.inputs, datasets.training.targets])
+    assert train.shape[0] == datasets.training.inputs.shape[0]
+    assert train.shape[1] == datasets.training.inputs.shape[1] + 1
+    test = np.column_stack([datasets.validation.inputs, datasets.validation.targets])
+    assert test.shape[0] == datasets.validation.inputs.shape[0]
+    assert test.shape[1] == datasets.validation.inputs.shape[1] + 1
+
+    return locate(train, test, random_state=random_state, n_jobs=n_jobs)
+
+
+def locate(x1, x2, random_state=0, n_jobs=None):  # pylint: disable=C0103
     """
     Locate outlier rows in array x2 with respect to array x1 using univariate
     and multivariate methods for outlier detection.
@@ -74,6 +293,7 @@ def locate(x1, x2, random_state=0):  # pylint: disable=C0103
       x2: k x m array to test for outlier rows.
       random_state: An integer to initialize the random number generators.
                     Default is 0.
+      n_jobs: Number of processes to use for random_cut(). (Default=None)
 
     Returns:
       k x 1 boolean array where True elements indicate outlier rows in x2.
@@ -96,7 +316,10 @@ def locate(x1, x2, random_state=0):  # pylint: disable=C0103
     assert len(outliers.shape) == 1
     assert outliers.shape[0] == x2.shape[0]
     tree_size = min(DEFAULT_TREE_SIZE, x1.shape[0] // 2)
-    outliers += random_cut(x1, x2, tree_size=tree_size, random_state=random_state)
+    outliers += random_cut(x1, x2,
+                           tree_size=tree_size,
+                           random_state=random_state,
+                           n_jobs=n_jobs)
     assert len(outliers.shape) == 1
     assert outliers.shape[0] == x2.shape[0]
 
@@ -117,6 +340,9 @@ def is_numeric(x, frac=.05):  # pylint: disable=C0103
     Returns:
       k x 1 boolean array where True elements indicate numeric columns.
 
+    The results for the last IS_NUMERIC_CACHE_SIZE datasets are cached, so
+    testing the same dataset again only costs a hash of its contents.
+
     """
 
     if not 0 <= frac <= 1:
@@ -129,21 +355,113 @@ def is_numeric(x, frac=.05):  # pylint: disable=C0103
     if x.ndim != 2:
         raise ValueError('is_numeric must be called with a 2D array.')
 
-    # For each column, test if the column contains real numbers.
-    numeric_columns = np.any(x.T != x.T.astype(np.int), axis=1)
+    key = (x.shape, x.dtype.str, frac, hashlib.blake2b(np.ascontiguousarray(x)).digest())
+    if key not in _is_numeric_cache:
+        if len(_is_numeric_cache) >= IS_NUMERIC_CACHE_SIZE:
+            del _is_numeric_cache[next(iter(_is_numeric_cache))]
+
+        _is_numeric_cache[key] = _is_numeric(x, frac)
+
+    return _is_numeric_cache[key].copy()
+
+
+def is_numeric_chunks(chunks, frac=.05, n_rows=None):  # pylint: disable=C0103
+    """
+    Test if the columns in a dataset that is read in chunks of rows are
+    numeric, with the same heuristic as is_numeric().
+
+    The distinct values of each column are kept until the column is found to
+    contain real numbers. If n_rows is given, a column is also known to be
+    numeric as soon as it has more than n_rows * frac distinct values, and
+    its distinct values are no longer kept.
+
+    Args:
+      chunks: Iterable of k x m arrays of rows.
+      frac: Value to use for frac in the numeric test. (Default=.05)
+      n_rows: Total number of rows in all chunks, if known. (Default=None)
+
+    Returns:
+      m x 1 boolean array where True elements indicate numeric columns.
+
+    """
+
+    if not 0 <= frac <= 1:
+        raise ValueError('frac is not a real number between 0 and 1.')
+
+    numeric_columns = None
+    total_rows = 0
+    for chunk in chunks:
+        chunk = np.array(chunk)
+        if chunk.ndim != 2:
+            raise ValueError('is_numeric_chunks must be called with 2D chunks.')
+
+        if numeric_columns is None:
+            numeric_columns = np.zeros(chunk.shape[1], dtype=bool)
+            distinct_values = [np.zeros(0, dtype=chunk.dtype)] * chunk.shape[1]
+
+        total_rows += chunk.shape[0]
+        numeric_columns |= _has_real_numbers(chunk)
+        for column in np.flatnonzero(~numeric_columns):
+            distinct_values[column] = np.unique(np.concatenate([distinct_values[column],
+                                                                chunk[:, column]]))
+
+            if n_rows is not None and len(distinct_values[column]) > n_rows * frac:
+                numeric_columns[column] = True
+
+        for column in np.flatnonzero(numeric_columns):
+            distinct_values[column] = None
+
+    if total_rows == 0:
+        raise ValueError('is_numeric_chunks called with no rows.')
+
+    for column in np.flatnonzero(~numeric_columns):
+        numeric_columns[column] = len(distinct_values[column]) > total_rows * frac
+
+    return numeric_columns
+
+
+def _is_numeric(x, frac):  # pylint: disable=C0103
+    """
+    Compute is_numeric() with a single sort of every column.
+
+    """
+
+    numeric_columns = _has_real_numbers(x)
     assert len(numeric_columns.shape) == 1
     assert numeric_columns.shape[0] == x.shape[1]
 
-    # For each column, test if the column has more unique values than
-    # len(col) * frac.
+    # For each column that does not contain real numbers, test if the column
+    # has more unique values than len(col) * frac. In a sorted column, each
+    # unique value after the first starts where a value differs from the
+    # previous value. NaNs are sorted to the end and count as one unique
+    # value, like np.unique. Columns are sorted as contiguous rows of the
+    # transpose, which is much faster than sorting along axis 0.
+    candidates = np.flatnonzero(~numeric_columns)
+    columns = np.sort(np.ascontiguousarray(x.T[candidates]), axis=1)
+    different = columns[:, 1:] != columns[:, :-1]
+    if np.issubdtype(columns.dtype, np.floating):
+        different &= ~np.isnan(columns[:, 1:])
+
     max_categories = x.shape[0] * frac
-    numeric_columns += np.array([len(np.unique(x)) > max_categories for x in x.T])
+    numeric_columns[candidates] = 1 + np.sum(different, axis=1) > max_categories
     assert len(numeric_columns.shape) == 1
     assert numeric_columns.shape[0] == x.shape[1]
 
     return numeric_columns
 
 
+def _has_real_numbers(x):  # pylint: disable=C0103
+    """
+    Test if each column of x contains real numbers that are not integers.
+
+    """
+
+    if not np.issubdtype(x.dtype, np.floating):
+        return np.zeros(x.shape[1], dtype=bool)
+
+    return np.any(x != np.trunc(x), axis=0) | ~np.all(np.isfinite(x), axis=0)
+
+
 def adjusted_boxplot(x1, x2):  # pylint: disable=C0103
     """
     Locate outliers in a univariate system using the adjusted boxplot method.
@@ -179,10 +497,82 @@ def adjusted_boxplot(x1, x2):  # pylint: disable=C0103
     if x1.ndim == 2 and x1.shape[1] != x2.shape[1]:
         raise ValueError('x1 and x2 must have same number of columns.')
 
+    lower_fence, upper_fence = adjusted_boxplot_fences(x1)
+    outliers = (x2 < lower_fence) + (x2 > upper_fence)
+    assert outliers.shape == x2.shape
+
+    return outliers
+
+
+def adjusted_boxplot_fences(x1):  # pylint: disable=C0103
+    """
+    Compute the lower and upper fences of the adjusted boxplot for each
+    column of x1. Values outside of the fences are outliers.
+
+    Args:
+      x1: n x m array to compute the fences from.
+
+    Returns:
+      A 2-tuple of m x 1 arrays of the lower fences and the upper fences.
+
+    """
+
+    x1 = np.array(x1)
     q1 = np.quantile(x1, .25, axis=0)
     q3 = np.quantile(x1, .75, axis=0)
-    iqr = q3 - q1
     mc = medcouple(x1, axis=0)
+
+    return _boxplot_fences(q1, q3, mc)
+
+
+def streaming_adjusted_boxplot_fences(chunks, epsilon=0.01):  # pylint: disable=C0103
+    """
+    Compute the adjusted boxplot fences of each column of a dataset that is
+    read in chunks of rows, such as from pd.read_csv(..., chunksize=...),
+    without holding the whole dataset in memory.
+
+    The quartiles are estimated from a quantile_sketch.QuantileSketch, with a
+    rank error of at most epsilon * n, and the medcouple is computed from
+    values at evenly spaced ranks of the sketch. If the dataset is small
+    enough to fit in the sketch, the fences are the same as
+    adjusted_boxplot_fences().
+
+    Args:
+      chunks: Iterable of n x m arrays of rows.
+      epsilon: Maximum rank error of the quartiles as a fraction of the
+               number of rows. (Default=0.01)
+
+    Returns:
+      A 2-tuple of m x 1 arrays of the lower fences and the upper fences.
+
+    """
+
+    sketch = None
+    for chunk in chunks:
+        chunk = np.array(chunk, dtype=float)
+        if sketch is None:
+            sketch = quantile_sketch.create(chunk.shape[1], epsilon=epsilon)
+
+        sketch = quantile_sketch.update(sketch, chunk)
+
+    if sketch is None or sketch.n_rows == 0:
+        raise ValueError('streaming_adjusted_boxplot_fences called with no rows.')
+
+    q1 = quantile_sketch.quantile(sketch, .25)
+    q3 = quantile_sketch.quantile(sketch, .75)
+    mc = medcouple(quantile_sketch.sample(sketch, sketch.capacity), axis=0)
+
+    return _boxplot_fences(q1, q3, mc)
+
+
+def _boxplot_fences(q1, q3, mc):  # pylint: disable=C0103
+    """
+    Compute the adjusted boxplot fences from the first and third quartiles
+    and the medcouple of each column.
+
+    """
+
+    iqr = q3 - q1
     lower_fence = np.zeros(mc.shape)
     upper_fence = np.zeros(mc.shape)
     np.copyto(lower_fence,
@@ -201,25 +591,23 @@ def adjusted_boxplot(x1, x2):  # pylint: disable=C0103
               q3 + 1.5 * np.exp(3.5 * mc) * iqr,
               where=mc < 0)
 
-    outliers = (x2 < lower_fence) + (x2 > upper_fence)
-    assert outliers.shape == x2.shape
-
-    return outliers
+    return lower_fence, upper_fence
 
 
 def random_cut(x1, x2,
                n_trees=100,
                tree_size=DEFAULT_TREE_SIZE,
                k=1.5,
-               random_state=0):  # pylint: disable=C0103
+               random_state=0,
+               engine='numpy',
+               n_jobs=None):  # pylint: disable=C0103
     """
     Find outliers in a multivariate system using Robust Random Cut Forest.
 
     This method, like adjusted_boxplot, is robust with respect to outliers and
     the data distribution. Although it is parametric, it is not very sensitive
     to the values of the parameters, and the default values should work in most
-    cases. However, it is not very efficient, and will likely be too slow to be
-    practical for large datasets.
+    cases.
 
     Unlike adjusted_boxplot, it tests rows as a whole to see if they are
     outliers, not individual columns.
@@ -231,8 +619,27 @@ def random_cut(x1, x2,
       tree_size: Number of samples to include in a single tree.
                  (Default=DEFAULT_TREE_SIZE)
       k: Value of k to use for Tukey's fences. (Default=1.5)
-      random_state: An integer to initialize the random number generators.
-                    Default is 0.
+      random_state: An integer to initialize the random number generators,
+                    or None to draw from numpy's global random number
+                    generator without seeding it. The 'numpy' and 'batch'
+                    engines also accept an instance of
+                    numpy.random.RandomState to draw from in the same order
+                    as rrcf. (Default=0)
+      engine: Implementation to build and score the forest with. 'numpy' uses
+              the vectorized implementation in random_cut_forest, and 'rrcf'
+              uses the rrcf package. 'numpy' is much faster. 'batch' builds
+              the same forest as 'numpy', but scores x2 by the expected codisp
+              of each row, which is faster still for large x2 and does not
+              depend on random_state. When random_state is an integer, each
+              tree of the 'numpy' and 'batch' engines draws from its own
+              generator seeded from random_state, so the results are the
+              same for any value of n_jobs, but not the same as the results
+              of the 'rrcf' engine. When it is None, they draw from numpy's
+              global random number generator in the same order as rrcf, and
+              give the same results as the 'rrcf' engine. (Default='numpy')
+      n_jobs: Number of processes to build and score the forest with, or -1
+              to use all CPUs. Requires an integer random_state, and is not
+              supported by the 'rrcf' engine. (Default=None)
 
     Returns:
       k x 1 boolean array where True elements correspond to outliers in x2.
@@ -243,7 +650,6 @@ def random_cut(x1, x2,
 
     """
 
-    np.random.seed(random_state)
     if n_trees < 1 or int(n_trees) != n_trees:
         raise ValueError('n_trees must be an int greater than 0.')
 
@@ -253,6 +659,15 @@ def random_cut(x1, x2,
     if k <= 0:
         raise ValueError('k must be greater than 0.')
 
+    if engine not in RANDOM_CUT_ENGINES:
+        raise ValueError(f'engine must be one of {RANDOM_CUT_ENGINES}.')
+
+    if engine == 'rrcf' and n_jobs is not None:
+        raise ValueError("n_jobs is not supported by the 'rrcf' engine.")
+
+    if engine == 'rrcf' and isinstance(random_state, np.random.RandomState):
+        raise ValueError("The 'rrcf' engine requires an integer random_state or None.")
+
     x1 = np.array(x1)
     x2 = np.array(x2)
     if x1.ndim != 2 or x2.ndim != 2:
@@ -264,6 +679,74 @@ def random_cut(x1, x2,
     if tree_size > x1.shape[0]:
         raise ValueError('tree_size must be less than len(x1)')
 
+    if engine == 'rrcf':
+        if random_state is not None:
+            np.random.seed(random_state)
+
+        x1_mean_codisp, x2_mean_codisp = _rrcf_codisp(x1, x2, n_trees, tree_size)
+
+    else:
+        forest = random_cut_forest.build(x1, n_trees, tree_size,
+                                         random_state=random_state,
+                                         n_jobs=n_jobs)
+
+        x1_mean_codisp = random_cut_forest.mean_leaf_codisp(forest, x1.shape[0])
+        x2_mean_codisp = _mean_insert_codisp(forest, x2, engine, random_state, n_jobs)
+
+    assert len(x1_mean_codisp) == x1.shape[0]
+    assert x2_mean_codisp.shape[0] == x2.shape[0]
+    outliers = x2_mean_codisp > _codisp_fence(x1_mean_codisp, k)
+    assert outliers.shape[0] == x2.shape[0]
+
+    return outliers
+
+
+def _codisp_fence(x1_mean_codisp, k):  # pylint: disable=C0103
+    """
+    Compute the upper fence of the mean codisps of the rows in x1. Rows with
+    mean codisp greater than the 75th percentile of mean x1 codisps + IQR * k
+    are considered to be outliers.
+
+    """
+
+    iqr = stats.iqr(x1_mean_codisp)
+    return np.quantile(x1_mean_codisp, 0.75) + k * iqr
+
+
+def _mean_insert_codisp(forest, x2, engine, random_state, n_jobs):  # pylint: disable=C0103
+    """
+    Compute the mean codisp of each row in x2 over the trees of a
+    RandomCutForest for random_cut().
+
+    """
+
+    if engine == 'batch':
+        x2_codisp = random_cut_forest.batch_codisp(forest, x2, n_jobs=n_jobs)
+
+    else:
+        x2_codisp = random_cut_forest.insert_codisp(forest, x2,
+                                                    random_state=random_state,
+                                                    n_jobs=n_jobs)
+
+    x2_mean_codisp = np.zeros(x2.shape[0])
+    for tree_codisp in x2_codisp.T:
+        x2_mean_codisp += tree_codisp
+
+    x2_mean_codisp /= x2_codisp.shape[1]
+
+    return x2_mean_codisp
+
+
+def _rrcf_codisp(x1, x2, n_trees, tree_size):  # pylint: disable=C0103
+    """
+    Compute the mean codisp of each row in x1 and x2 for random_cut() using
+    the rrcf package.
+
+    Returns:
+      A 2-tuple of the mean codisps for x1 and the mean codisps for x2.
+
+    """
+
     # Construct a forest of random cut trees from x1 and calculate the mean
     # codisp for each row in x1 for each tree that it is in.
     forest = []
@@ -283,8 +766,6 @@ def random_cut(x1, x2,
         np.add.at(index, codisp.index.values, 1)
 
     x1_mean_codisp /= index
-    assert len(x1_mean_codisp) == x1.shape[0]
-
     # Insert each row from x2 into each tree one by one and calculate
     # the mean codisp for each row.
     x2_mean_codisp = np.zeros(x2.shape[0])
@@ -298,12 +779,4 @@ def random_cut(x1, x2,
         sample_mean_codisp /= len(forest)
         x2_mean_codisp[sample_index] = sample_mean_codisp
 
-    assert x2_mean_codisp.shape[0] == x2.shape[0]
-
-    # Rows with codisp greater than the 75th percentile of
-    # mean x1 codisps + IQR * 1.5 are considered to be outliers.
-    iqr = stats.iqr(x1_mean_codisp)
-    outliers = x2_mean_codisp > np.quantile(x1_mean_codisp, 0.75) + k * iqr
-    assert outliers.shape[0] == x2.shape[0]
-
-    return outliers
+    return x1_mean_codisp, x2_mean_codisp
@@ -0,0 +1,238 @@
+"""
+A mergeable sketch of the quantiles of every column of a dataset that is too
+large to hold in memory.
+
+Rows are added to the sketch in chunks. The sketch stores a bounded number of
+values per column in levels, where each value in level h stands for 2**h rows.
+When a level holds more than `capacity` values, its values are sorted and
+every other value is promoted to the next level. Each promotion at level h
+changes the rank of any value by at most 2**h, so the rank error of a
+quantile is at most n * (number of levels) / capacity. Sketches built from
+different chunks of the same dataset can be merged, level by level.
+
+Until the first promotion, the sketch holds every row and its quantiles are
+exact.
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+References:
+  https://doi.org/10.1145/276305.276342
+  https://arxiv.org/abs/1603.05346
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# Largest number of rows for which the error bound of a sketch is guaranteed.
+# Only used to size the levels, since the number of levels grows with the
+# logarithm of the number of rows.
+MAX_ROWS = 2 ** 40
+
+# levels is a list of k x m arrays of values, where the values in levels[h]
+# each stand for 2**h rows. Each column of the arrays holds the values of one
+# column of the dataset. n_rows is the number of rows added to the sketch.
+QuantileSketch = namedtuple('QuantileSketch', ('levels', 'n_rows', 'capacity'))
+
+
+def create(n_columns, epsilon=0.01):  # pylint: disable=C0103
+    """
+    Create an empty sketch.
+
+    Args:
+      n_columns: Number of columns in the dataset.
+      epsilon: Maximum rank error of a quantile as a fraction of the number of
+               rows in the sketch. (Default=0.01)
+
+    Returns:
+      An instance of QuantileSketch.
+
+    """
+
+    if not 0 < epsilon < 1:
+        raise ValueError('epsilon must be between 0 and 1.')
+
+    capacity = int(np.ceil(np.log2(MAX_ROWS) / epsilon))
+    return QuantileSketch(levels=[np.zeros((0, n_columns))],
+                          n_rows=0,
+                          capacity=capacity)
+
+
+def update(sketch, chunk):  # pylint: disable=C0103
+    """
+    Add a chunk of rows to a sketch.
+
+    Args:
+      sketch: An instance of QuantileSketch.
+      chunk: k x m array of rows.
+
+    Returns:
+      A new instance of QuantileSketch.
+
+    """
+
+    chunk = np.array(chunk, dtype=float)
+    if chunk.ndim != 2 or chunk.shape[1] != sketch.levels[0].shape[1]:
+        raise ValueError('chunk must be a 2D array with the same number of columns as the sketch.')
+
+    levels = list(sketch.levels)
+    levels[0] = np.concatenate([levels[0], chunk])
+
+    return _compact(QuantileSketch(levels, sketch.n_rows + len(chunk), sketch.capacity))
+
+
+def merge(sketch1, sketch2):  # pylint: disable=C0103
+    """
+    Merge two sketches of the same columns.
+
+    Returns:
+      A new instance of QuantileSketch of the rows in both sketches.
+
+    """
+
+    if sketch1.levels[0].shape[1] != sketch2.levels[0].shape[1]:
+        raise ValueError('sketch1 and sketch2 must have the same number of columns.')
+
+    n_levels = max(len(sketch1.levels), len(sketch2.levels))
+    n_columns = sketch1.levels[0].shape[1]
+    levels = []
+    for level in range(n_levels):
+        levels.append(np.concatenate([
+            sketch.levels[level] if level < len(sketch.levels) else np.zeros((0, n_columns))
+            for sketch in (sketch1, sketch2)
+        ]))
+
+    return _compact(QuantileSketch(levels,
+                                   sketch1.n_rows + sketch2.n_rows,
+                                   min(sketch1.capacity, sketch2.capacity)))
+
+
+def quantile(sketch, q):  # pylint: disable=C0103
+    """
+    Estimate the q-th quantile of each column, interpolating linearly between
+    ranks like np.quantile.
+
+    Args:
+      sketch: An instance of QuantileSketch.
+      q: Quantile to compute, between 0 and 1.
+
+    Returns:
+      m x 1 array of quantiles.
+
+    """
+
+    if sketch.n_rows == 0:
+        raise ValueError('quantile called with an empty sketch.')
+
+    values, cumulative_weights = _sorted_values(sketch)
+    rank = q * (sketch.n_rows - 1)
+    lower, upper = _values_at_ranks(values,
+                                    cumulative_weights,
+                                    np.array([np.floor(rank), np.ceil(rank)]))
+
+    # Interpolate the same way as np.quantile.
+    fraction = rank - np.floor(rank)
+    difference = upper - lower
+    if fraction >= 0.5:
+        return upper - difference * (1 - fraction)
+
+    return lower + difference * fraction
+
+
+def sample(sketch, size):  # pylint: disable=C0103
+    """
+    Summarize each column with `size` values at evenly spaced ranks, or with
+    every row if the sketch is still exact and has no more than `size` rows.
+
+    Args:
+      sketch: An instance of QuantileSketch.
+      size: Number of values to return per column.
+
+    Returns:
+      size x m array of values.
+
+    """
+
+    if len(sketch.levels) == 1 and sketch.n_rows <= size:
+        return np.sort(sketch.levels[0], axis=0)
+
+    values, cumulative_weights = _sorted_values(sketch)
+    ranks = np.floor((np.arange(size) + 0.5) * sketch.n_rows / size)
+
+    return _values_at_ranks(values, cumulative_weights, ranks)
+
+
+def _compact(sketch):  # pylint: disable=C0103
+    """
+    Promote every other value of each level that holds more than
+    sketch.capacity values to the next level, until no level is over
+    capacity.
+
+    """
+
+    levels = list(sketch.levels)
+    level = 0
+    while level < len(levels):
+        if len(levels[level]) > sketch.capacity:
+            values = np.sort(levels[level], axis=0)
+
+            # With an odd number of values, the largest value stays on this
+            # level. Alternate between keeping the even and odd values, based
+            # on the number of rows seen so far, so the promoted values are
+            # not always biased in the same direction.
+            n_promoted = len(values) // 2 * 2
+            offset = (sketch.n_rows >> level) % 2
+            if level + 1 == len(levels):
+                levels.append(np.zeros((0, values.shape[1])))
+
+            levels[level + 1] = np.concatenate([levels[level + 1],
+                                                values[offset:n_promoted:2]])
+
+            levels[level] = values[n_promoted:]
+
+        level += 1
+
+    return QuantileSketch(levels, sketch.n_rows, sketch.capacity)
+
+
+def _sorted_values(sketch):  # pylint: disable=C0103
+    """
+    Sort the values of each column in a sketch.
+
+    Returns:
+      A 2-tuple of the sorted values and the cumulative weights of the
+      sorted values in each column.
+
+    """
+
+    values = np.concatenate(sketch.levels)
+    weights = np.concatenate([np.full(len(level_values), 2 ** level)
+                              for level, level_values in enumerate(sketch.levels)])
+
+    order = np.argsort(values, axis=0, kind='stable')
+    values = np.take_along_axis(values, order, axis=0)
+    cumulative_weights = np.cumsum(weights[order], axis=0)
+
+    return values, cumulative_weights
+
+
+def _values_at_ranks(values, cumulative_weights, ranks):  # pylint: disable=C0103
+    """
+    Find the values with the given ranks (counting from 0) in each column.
+
+    Returns:
+      len(ranks) x m array of values.
+
+    """
+
+    index = np.column_stack([np.searchsorted(column_weights, ranks, side='right')
+                             for column_weights in cumulative_weights.T])
+
+    index = np.minimum(index, len(values) - 1)
+
+    return np.take_along_axis(values, index, axis=0)
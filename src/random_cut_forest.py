@@ -0,0 +1,714 @@
+"""
+A NumPy implementation of Robust Random Cut Forest. Trees are stored as flat
+arrays of nodes rather than as linked Python objects, cuts are sampled for
+every node in a level at once, and collusive displacement (CoDisp) is computed
+for all leaves of the forest in a single batched pass.
+
+The random number generators are consumed in exactly the same order as in
+the rrcf package, so for a given seed this module builds the same trees and
+computes the same CoDisp values as rrcf. Query points can also be scored in
+batches by their expected CoDisp, which does not depend on any random numbers
+and is computed for every point and tree at once.
+
+Forests can also be built and scored with an independent random number
+generator for each tree, seeded from a single random_state. The work can
+then be split between processes, and the results are the same for any number
+of processes, but they are not the same as the results of rrcf.
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+
+
+# Number of decimals that points are rounded to before building a tree.
+# This matches the default precision of rrcf.RCTree.
+PRECISION = 9
+
+# Number of query points to process together when scoring query points.
+CHUNK_SIZE = 64
+
+# Keys used to derive independent seeds from a random_state for building
+# trees, for inserting points into trees, and for sampling the rows of each
+# batch of trees.
+BUILD_SEED_KEY = 0
+INSERT_SEED_KEY = 1
+SAMPLE_SEED_KEY = 2
+
+# A forest of random cut trees stored as flat node arrays. Node ids index into
+# every node array. Leaves have a dimension, left, and right of -1, and roots
+# have a parent of -1.
+# - samples: n_trees x tree_size array of the row indices in each tree.
+# - leaves: n_trees x tree_size array of the leaf node id for each sample.
+# - roots: Root node id of each tree.
+# - dimension: Cut dimension of each branch.
+# - value: Cut value of each branch.
+# - left, right, parent: Node ids of the children and parent of each node.
+# - count: Number of points under each node (including duplicates).
+# - lower, upper: n_nodes x m arrays with the bounding box of each node.
+RandomCutForest = namedtuple('RandomCutForest',
+                             ('samples',
+                              'leaves',
+                              'roots',
+                              'dimension',
+                              'value',
+                              'left',
+                              'right',
+                              'parent',
+                              'count',
+                              'lower',
+                              'upper'))
+
+
+def build(x, n_trees, tree_size, random_state=None, n_jobs=None):  # pylint: disable=C0103
+    """
+    Build a forest of random cut trees from the rows of x.
+
+    Trees are built in batches of len(x) // tree_size trees. Each batch
+    partitions a random permutation of the rows of x between its trees,
+    and batches are added until the forest has at least n_trees trees.
+    All trees in a batch are grown together, one level at a time.
+
+    Args:
+      x: n x m array of points to build the forest from.
+      n_trees: Minimum number of trees in the forest.
+      tree_size: Number of samples to include in a single tree.
+      random_state: An integer to derive a seed for each tree from, an
+                    instance of numpy.random.RandomState to build every
+                    batch from like rrcf does, or None to use numpy's global
+                    random number generator. With an integer, each tree
+                    draws its cuts from its own seed, and each batch
+                    partitions the rows between its trees with a seed of its
+                    own. (Default=None)
+      n_jobs: Number of processes to build batches of trees in, or -1 to use
+              all CPUs. Requires an integer random_state. (Default=None)
+
+    Returns:
+      An instance of RandomCutForest.
+
+    """
+
+    x = np.array(x, dtype=float)
+    batch_size = x.shape[0] // tree_size
+    generator = _generator(random_state, n_jobs)
+    if generator is not None:
+        batches = []
+        while len(batches) * batch_size < n_trees:
+            batches.append(_build_random_batch(x, batch_size, tree_size, generator))
+
+    else:
+        n_batches = -(-n_trees // batch_size)
+        sample_seeds = _seeds(random_state, SAMPLE_SEED_KEY, n_batches)
+        tree_seeds = _seeds(random_state, BUILD_SEED_KEY, n_batches * batch_size)
+        batches = Parallel(n_jobs=n_jobs)(
+            delayed(_build_seeded_batch)(x, tree_size, sample_seed, seeds)
+            for sample_seed, seeds in zip(sample_seeds, np.split(tree_seeds, n_batches))
+        )
+
+    return _concatenate(batches)
+
+
+def leaf_codisp(forest):
+    """
+    Compute the collusive displacement of every sample in every tree.
+
+    Args:
+      forest: An instance of RandomCutForest.
+
+    Returns:
+      n_trees x tree_size array with the CoDisp of each sample in
+      forest.samples.
+
+    """
+
+    nodes = np.unique(forest.leaves)
+    codisp = _path_codisp(forest, nodes, np.zeros(len(nodes)), 0)
+    codisp_by_node = np.zeros(len(forest.count))
+    codisp_by_node[nodes] = codisp
+
+    return codisp_by_node[forest.leaves]
+
+
+def mean_leaf_codisp(forest, n_points):
+    """
+    Compute the mean collusive displacement of each point used to build the
+    forest over all the trees that it appears in.
+
+    Args:
+      forest: An instance of RandomCutForest.
+      n_points: Number of rows in the array the forest was built from.
+
+    Returns:
+      n_points x 1 array of mean CoDisp values. Points that do not appear in
+      any tree are given a value of NaN.
+
+    """
+
+    codisp = leaf_codisp(forest)
+    total = np.zeros(n_points)
+    appearances = np.zeros(n_points)
+    # Sum the trees in order so that the result does not depend on
+    # the summation algorithm.
+    for tree_samples, tree_codisp in zip(forest.samples, codisp):
+        total[tree_samples] += tree_codisp
+        appearances[tree_samples] += 1
+
+    with np.errstate(invalid='ignore'):
+        return total / appearances
+
+
+def insert_codisp(forest, x, random_state=None, n_jobs=None):  # pylint: disable=C0103
+    """
+    Compute the collusive displacement that each row of x would have if it
+    were inserted into each tree of the forest. The trees are not modified.
+
+    When random_state is None or an instance of numpy.random.RandomState,
+    insertion cuts are drawn from it in the same order as
+    rrcf.RCTree.insert_point() would draw them when inserting every row into
+    every tree, one row at a time. Otherwise, each tree draws its cuts from
+    its own generator.
+
+    Args:
+      forest: An instance of RandomCutForest.
+      x: k x m array of points to score.
+      random_state: An integer to derive a seed for each tree from, an
+                    instance of numpy.random.RandomState to draw from, or
+                    None to use numpy's global random number generator.
+                    (Default=None)
+      n_jobs: Number of processes to split the trees between, or -1 to use
+              all CPUs. Requires an integer random_state. (Default=None)
+
+    Returns:
+      k x n_trees array of CoDisp values.
+
+    """
+
+    x = np.array(x, dtype=float)
+    trees = np.arange(len(forest.roots))
+    generator = _generator(random_state, n_jobs)
+    if generator is not None:
+        return _insert_codisp_trees(forest, trees, x, generator=generator)
+
+    seeds = _seeds(random_state, INSERT_SEED_KEY, len(trees))
+    shards = _shards(trees, n_jobs)
+    codisp = Parallel(n_jobs=n_jobs)(
+        delayed(_insert_codisp_trees)(forest, shard, x, seeds=seeds[shard])
+        for shard in shards
+    )
+
+    return np.hstack(codisp)
+
+
+def batch_codisp(forest, x, n_jobs=None):  # pylint: disable=C0103
+    """
+    Compute the expected collusive displacement that each row of x would
+    have if it were inserted into each tree of the forest. The trees are not
+    modified, and no random numbers are drawn.
+
+    When a point is inserted into a tree, it is separated from the rest of
+    the tree by a random cut at one of the nodes on its path from the root,
+    and the chance that the cut falls at a node is proportional to how far
+    the point extends the node's bounding box. This function averages the
+    CoDisp of the point over every node that the cut could fall at, weighted
+    by the probability that it does, which makes it a lower-variance version
+    of insert_codisp() that can be computed for every point and tree at once.
+
+    Args:
+      forest: An instance of RandomCutForest.
+      x: k x m array of points to score.
+      n_jobs: Number of processes to split the trees between, or -1 to use
+              all CPUs. (Default=None)
+
+    Returns:
+      k x n_trees array of expected CoDisp values.
+
+    """
+
+    x = np.array(x, dtype=float)
+    shards = _shards(np.arange(len(forest.roots)), n_jobs)
+    codisp = Parallel(n_jobs=n_jobs)(
+        delayed(_batch_codisp_trees)(forest, shard, x) for shard in shards
+    )
+
+    return np.hstack(codisp)
+
+
+def _generator(random_state, n_jobs):
+    """
+    Find the random number generator to draw from in the same order as rrcf
+    for random_state, or return None when random_state is an integer to
+    derive a seed for each tree from.
+
+    """
+
+    if random_state is None:
+        generator = np.random
+
+    elif isinstance(random_state, np.random.RandomState):
+        generator = random_state
+
+    else:
+        return None
+
+    if n_jobs is not None:
+        raise ValueError('n_jobs requires an integer random_state.')
+
+    return generator
+
+
+def _seeds(random_state, key, n_seeds):
+    """
+    Derive n_seeds independent seeds from random_state.
+
+    """
+
+    seed_sequence = np.random.SeedSequence(random_state, spawn_key=(key,))
+    return np.array([child.generate_state(4) for child in seed_sequence.spawn(n_seeds)])
+
+
+def _shards(trees, n_jobs):
+    """
+    Split an array of tree indices into one contiguous shard per process.
+
+    """
+
+    n_shards = min(effective_n_jobs(n_jobs), len(trees))
+    return np.array_split(trees, n_shards)
+
+
+def _build_random_batch(x, batch_size, tree_size, generator):  # pylint: disable=C0103
+    """
+    Draw the samples for a batch of trees from generator and build them.
+
+    """
+
+    samples = generator.choice(x.shape[0], size=(batch_size, tree_size), replace=False)
+    return _build_batch(x, samples, [generator] * batch_size)
+
+
+def _build_seeded_batch(x, tree_size, sample_seed, seeds):  # pylint: disable=C0103
+    """
+    Build a batch of trees with a new random number generator for each tree.
+    The samples are drawn from a generator seeded with sample_seed, and each
+    tree draws its cuts from a generator seeded with its row of seeds.
+
+    """
+
+    samples = np.random.RandomState(sample_seed).choice(x.shape[0],
+                                                         size=(len(seeds), tree_size),
+                                                         replace=False)
+
+    return _build_batch(x, samples, [np.random.RandomState(seed) for seed in seeds])
+
+
+def _insert_codisp_trees(forest, trees, x, generator=None, seeds=None):  # pylint: disable=C0103
+    """
+    Compute insert_codisp() for the given trees. When seeds is None, draw
+    from generator in the same order as rrcf. Otherwise, create a generator
+    for each tree from its seed.
+
+    """
+
+    generators = None
+    if seeds is not None:
+        generators = [np.random.RandomState(seed) for seed in seeds]
+
+    codisp = np.zeros((x.shape[0], len(trees)))
+    for start in range(0, x.shape[0], CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        codisp[start:stop] = _insert_codisp_chunk(forest, trees, x[start:stop],
+                                                  generator, generators)
+
+    return codisp
+
+
+def _batch_codisp_trees(forest, trees, x):  # pylint: disable=C0103
+    """
+    Compute batch_codisp() for the given trees.
+
+    """
+
+    node_range = np.sum(forest.upper - forest.lower, axis=1)
+    codisp = np.zeros((x.shape[0], len(trees)))
+    for start in range(0, x.shape[0], CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        codisp[start:stop] = _batch_codisp_chunk(forest, trees, node_range, x[start:stop])
+
+    return codisp
+
+
+def _build_batch(x, samples, generators):  # pylint: disable=C0103,R0914,R0915
+    """
+    Build one random cut tree for every row of samples. Each tree draws its
+    random numbers from its generator in generators, and trees that share a
+    generator draw from it in order.
+
+    """
+
+    # Deduplicate the points in each tree like rrcf.RCTree does.
+    points = []
+    counts = []
+    inverses = []
+    for tree_samples in samples:
+        unique, inverse, count = np.unique(np.around(x[tree_samples],
+                                                     decimals=PRECISION),
+                                           return_inverse=True,
+                                           return_counts=True,
+                                           axis=0)
+
+        points.append(unique)
+        counts.append(count)
+        inverses.append(inverse.reshape(-1))
+
+    n_unique = np.array([len(c) for c in counts])
+    point_offsets = np.concatenate([[0], np.cumsum(n_unique)[:-1]])
+    points = np.concatenate(points)
+    counts = np.concatenate(counts)
+
+    # Each cut consumes two random numbers: one to choose the cut dimension and
+    # one to choose the cut value. rrcf makes cuts in depth-first order, so
+    # the draws for a cut are located by the cut's pre-order index.
+    n_cuts = n_unique - 1
+    draw_offsets = np.concatenate([[0], np.cumsum(2 * n_cuts)[:-1]])
+    draws = np.concatenate([[]] + [generator.random_sample(2 * tree_cuts)
+                                   for generator, tree_cuts in zip(generators, n_cuts)])
+
+    n_nodes = 2 * len(points) - len(samples)
+    dimension = np.full(n_nodes, -1)
+    value = np.zeros(n_nodes)
+    left = np.full(n_nodes, -1)
+    right = np.full(n_nodes, -1)
+    parent = np.full(n_nodes, -1)
+    count = np.zeros(n_nodes, dtype=int)
+    lower = np.zeros((n_nodes, points.shape[1]))
+    upper = np.zeros((n_nodes, points.shape[1]))
+    point_leaf = np.zeros(len(points), dtype=int)
+
+    # Root nodes get the first ids. Trees with a single unique point
+    # consist of a root leaf.
+    roots = np.arange(len(samples))
+    next_node = len(samples)
+    single = n_unique == 1
+    point_leaf[point_offsets[single]] = roots[single]
+    count[roots[single]] = counts[point_offsets[single]]
+    lower[roots[single]] = points[point_offsets[single]]
+    upper[roots[single]] = points[point_offsets[single]]
+
+    # Active segments are contiguous runs in `order` of the points that lie
+    # under a branch which has not been cut yet.
+    order = np.flatnonzero(np.repeat(~single, n_unique))
+
+    segment_size = n_unique[~single]
+    segment_node = roots[~single]
+    segment_cut = draw_offsets[~single] // 2
+    while len(segment_size):
+        starts = np.concatenate([[0], np.cumsum(segment_size)[:-1]])
+        block = points[order]
+        segment_min = np.minimum.reduceat(block, starts, axis=0)
+        segment_max = np.maximum.reduceat(block, starts, axis=0)
+
+        # Choose cut dimensions exactly like numpy.random.choice(m, p=span).
+        span = segment_max - segment_min
+        span /= span.sum(axis=1, keepdims=True)
+        cdf = np.cumsum(span, axis=1)
+        cdf /= cdf[:, -1:]
+        cut_dimension = np.sum(cdf <= draws[2 * segment_cut][:, np.newaxis], axis=1)
+
+        # Choose cut values exactly like numpy.random.uniform(low, high).
+        rows = np.arange(len(segment_size))
+        low = segment_min[rows, cut_dimension]
+        high = segment_max[rows, cut_dimension]
+        cut_value = low + (high - low) * draws[2 * segment_cut + 1]
+
+        dimension[segment_node] = cut_dimension
+        value[segment_node] = cut_value
+        count[segment_node] = np.add.reduceat(counts[order], starts)
+        lower[segment_node] = segment_min
+        upper[segment_node] = segment_max
+
+        # Partition each segment into points left and right of the cut.
+        segment_id = np.repeat(rows, segment_size)
+        goes_left = block[np.arange(len(block)), cut_dimension[segment_id]] <= cut_value[segment_id]
+        order = order[np.argsort(2 * segment_id + ~goes_left, kind='stable')]
+        left_size = np.add.reduceat(goes_left.astype(int), starts)
+        child_size = np.column_stack([left_size, segment_size - left_size]).reshape(-1)
+        child_node = np.arange(next_node, next_node + len(child_size))
+        next_node += len(child_size)
+        left[segment_node] = child_node[0::2]
+        right[segment_node] = child_node[1::2]
+        parent[child_node] = np.repeat(segment_node, 2)
+
+        # The left child's subtree is cut first, then the right child's.
+        child_cut = np.column_stack([segment_cut + 1,
+                                     segment_cut + left_size]).reshape(-1)
+
+        # Children with a single point become leaves.
+        child_starts = np.concatenate([[0], np.cumsum(child_size)[:-1]])
+        is_leaf = child_size == 1
+        leaf_points = order[child_starts[is_leaf]]
+        leaf_nodes = child_node[is_leaf]
+        point_leaf[leaf_points] = leaf_nodes
+        count[leaf_nodes] = counts[leaf_points]
+        lower[leaf_nodes] = points[leaf_points]
+        upper[leaf_nodes] = points[leaf_points]
+
+        # Children with more than one point are cut at the next level.
+        order = order[np.repeat(~is_leaf, child_size)]
+        segment_size = child_size[~is_leaf]
+        segment_node = child_node[~is_leaf]
+        segment_cut = child_cut[~is_leaf]
+
+    assert next_node == n_nodes
+    leaves = np.array([point_leaf[offset + inverse]
+                       for offset, inverse in zip(point_offsets, inverses)])
+
+    return RandomCutForest(samples=samples,
+                           leaves=leaves,
+                           roots=roots,
+                           dimension=dimension,
+                           value=value,
+                           left=left,
+                           right=right,
+                           parent=parent,
+                           count=count,
+                           lower=lower,
+                           upper=upper)
+
+
+def _concatenate(forests):
+    """
+    Combine several forests into one forest, renumbering the nodes.
+
+    """
+
+    offsets = np.concatenate([[0], np.cumsum([len(f.count) for f in forests])[:-1]])
+
+    def shift(field):
+        return np.concatenate([np.where(getattr(f, field) >= 0,
+                                        getattr(f, field) + offset,
+                                        -1)
+                               for f, offset in zip(forests, offsets)])
+
+    return RandomCutForest(samples=np.concatenate([f.samples for f in forests]),
+                           leaves=np.concatenate([f.leaves + o for f, o in zip(forests, offsets)]),
+                           roots=np.concatenate([f.roots + o for f, o in zip(forests, offsets)]),
+                           dimension=np.concatenate([f.dimension for f in forests]),
+                           value=np.concatenate([f.value for f in forests]),
+                           left=shift('left'),
+                           right=shift('right'),
+                           parent=shift('parent'),
+                           count=np.concatenate([f.count for f in forests]),
+                           lower=np.concatenate([f.lower for f in forests]),
+                           upper=np.concatenate([f.upper for f in forests]))
+
+
+def _path_codisp(forest, nodes, codisp, extra):
+    """
+    Walk from each node in `nodes` up to the root of its tree and take the
+    maximum of codisp and the displacement ratios along the way. `extra`
+    points are added to the count of every node on the path, which is how
+    an inserted point changes the counts above it.
+
+    """
+
+    nodes = np.array(nodes)
+    codisp = np.array(codisp, dtype=float)
+    parents = forest.parent[nodes]
+    active = parents >= 0
+    while np.any(active):
+        node = nodes[active]
+        parent = parents[active]
+        sibling = forest.left[parent] + forest.right[parent] - node
+        ratio = forest.count[sibling] / (forest.count[node] + extra)
+        codisp[active] = np.maximum(codisp[active], ratio)
+        nodes[active] = parent
+        parents[active] = forest.parent[parent]
+        active = parents >= 0
+
+    return codisp
+
+
+def _descend(forest, trees, x):  # pylint: disable=C0103
+    """
+    Find the path that each row of x takes from the root of each of the
+    given trees to a leaf.
+
+    Returns:
+      k x len(trees) x depth array of node ids, padded with -1.
+
+    """
+
+    nodes = np.tile(forest.roots[trees], (x.shape[0], 1))
+    rows = np.arange(x.shape[0])[:, np.newaxis]
+    paths = [nodes]
+    while True:
+        dimension = forest.dimension[nodes]
+        is_branch = dimension >= 0
+        if not np.any(is_branch):
+            break
+
+        goes_left = x[rows, np.maximum(dimension, 0)] <= forest.value[nodes]
+        children = np.where(goes_left, forest.left[nodes], forest.right[nodes])
+        paths.append(np.where(is_branch, children, -1))
+        nodes = np.where(is_branch, children, nodes)
+
+    return np.stack(paths, axis=2)
+
+
+def _insert_codisp_chunk(forest, trees, x, generator, generators):  # pylint: disable=C0103,R0914
+    """
+    Compute insert_codisp() for a chunk of query points and the given trees.
+
+    """
+
+    paths = _descend(forest, trees, x)
+    depth = np.sum(paths >= 0, axis=2)
+    leaf = np.take_along_axis(paths, depth[:, :, np.newaxis] - 1, axis=2)[:, :, 0]
+    duplicate = np.all(forest.lower[leaf] == x[:, np.newaxis, :], axis=2)
+
+    # For every node on every path, compute the bounding box that the node
+    # would have if the query point were added to it, like
+    # rrcf.RCTree._insert_point_cut() does.
+    path_nodes = np.maximum(paths, 0)
+    node_lower = forest.lower[path_nodes]
+    node_upper = forest.upper[path_nodes]
+    point = x[:, np.newaxis, np.newaxis, :]
+    hat_lower = np.minimum(node_lower, point)
+    span = np.maximum(node_upper, point) - hat_lower
+    span_sum = np.cumsum(span, axis=3)
+    span_range = np.sum(span, axis=3)
+
+    def separation_level(row, column, draws):
+        levels = np.arange(depth[row, column])
+        r = span_range[row, column, levels] * draws[levels]
+        cut_sums = span_sum[row, column, levels]
+        cut_dimension = np.sum(cut_sums < r[:, np.newaxis], axis=1)
+        cut = (hat_lower[row, column, levels, cut_dimension]
+               + cut_sums[levels, cut_dimension] - r)
+
+        separated = ((cut <= node_lower[row, column, levels, cut_dimension])
+                     | (cut >= node_upper[row, column, levels, cut_dimension]))
+
+        return np.argmax(separated)
+
+    # Decide where each point is inserted with one random number per level
+    # visited until the point is separated from the rest of the tree. With
+    # a single generator, random numbers are consumed in the same order as
+    # rrcf: every tree for the first point, then every tree for the second
+    # point, and so on. Otherwise, each tree consumes random numbers from its
+    # own generator, one point at a time.
+    stop = np.zeros(depth.shape, dtype=int)
+    if generators is None:
+        pairs = np.nonzero(~duplicate)
+        stop[pairs] = _consume(generator, depth[pairs], separation_level, *pairs)
+
+    else:
+        for column, tree_generator in enumerate(generators):
+            rows = np.flatnonzero(~duplicate[:, column])
+            columns = np.full(len(rows), column)
+            stop[rows, column] = _consume(tree_generator, depth[rows, column],
+                                          separation_level, rows, columns)
+
+    # A duplicate point joins the leaf that it duplicates.
+    codisp = np.zeros(depth.shape)
+    codisp[duplicate] = _path_codisp(forest,
+                                     leaf[duplicate],
+                                     np.zeros(np.sum(duplicate)),
+                                     1)
+
+    # Otherwise, the point becomes the sibling of the node where it was
+    # separated from the rest of the tree.
+    separated_node = np.take_along_axis(paths, stop[:, :, np.newaxis], axis=2)[:, :, 0]
+    separated_node = separated_node[~duplicate]
+    codisp[~duplicate] = _path_codisp(forest,
+                                      separated_node,
+                                      forest.count[separated_node],
+                                      1)
+
+    return codisp
+
+
+def _consume(generator, max_draws, separation_level, rows, columns):
+    """
+    Find the level at which each point is separated from a tree, drawing
+    random numbers from generator for one row and column at a time.
+
+    At most `max_draws` numbers are needed for each row and column, so draw
+    that many up front and then reset the generator to just past the numbers
+    that were used.
+
+    """
+
+    state = generator.get_state()
+    draws = generator.random_sample(np.sum(max_draws))
+    used = 0
+    stops = np.zeros(len(rows), dtype=int)
+    for index, (row, column) in enumerate(zip(rows, columns)):
+        stops[index] = separation_level(row, column, draws[used:used + max_draws[index]])
+        used += stops[index] + 1
+
+    generator.set_state(state)
+    generator.random_sample(used)
+
+    return stops
+
+
+def _batch_codisp_chunk(forest, trees, node_range, x):  # pylint: disable=C0103,R0914
+    """
+    Compute batch_codisp() for a chunk of query points and the given trees.
+
+    """
+
+    paths = _descend(forest, trees, x)
+    valid = paths >= 0
+    depth = np.sum(valid, axis=2)
+    leaf = np.take_along_axis(paths, depth[:, :, np.newaxis] - 1, axis=2)[:, :, 0]
+    duplicate = np.all(forest.lower[leaf] == x[:, np.newaxis, :], axis=2)
+
+    # Probability that the insertion cut separates the point from each node
+    # on its path, given that it was not separated higher up. This is the
+    # fraction of the node's bounding box, expanded to include the point,
+    # that lies outside of the original bounding box.
+    nodes = paths[valid]
+    rows = np.nonzero(valid)[0]
+    extension = np.sum(np.maximum(forest.lower[nodes] - x[rows], 0)
+                       + np.maximum(x[rows] - forest.upper[nodes], 0),
+                       axis=1)
+
+    separation = np.zeros(paths.shape)
+    with np.errstate(invalid='ignore'):
+        separation[valid] = extension / (node_range[nodes] + extension)
+
+    # Probability that the point is separated at each node.
+    not_separated = np.cumprod(1 - separation, axis=2)
+    reached = np.concatenate([np.ones(depth.shape + (1,)), not_separated[:, :, :-1]],
+                             axis=2)
+
+    probability = reached * separation
+
+    # CoDisp of the point if it is separated at each node: the point becomes
+    # the sibling of the node, and the count of every node above it
+    # increases by one.
+    path_nodes = np.maximum(paths, 0)
+    count = forest.count[path_nodes]
+    parents = forest.parent[path_nodes]
+    siblings = forest.left[parents] + forest.right[parents] - path_nodes
+    ratio = np.where(valid & (parents >= 0), forest.count[siblings] / (count + 1), 0)
+    codisp = np.maximum(count, np.maximum.accumulate(ratio, axis=2))
+    expected_codisp = np.sum(probability * codisp, axis=2)
+
+    # A duplicate point joins the leaf that it duplicates.
+    expected_codisp[duplicate] = _path_codisp(forest,
+                                              leaf[duplicate],
+                                              np.zeros(np.sum(duplicate)),
+                                              1)
+
+    return expected_codisp
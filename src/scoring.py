@@ -13,9 +13,19 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 import logging
 import functools
+from collections import namedtuple
 
 import numpy as np
 import sklearn
+from scipy import special
+
+# A confusion matrix with a row for each true class and a column for each
+# predicted class. classes holds the sorted union of the true and predicted
+# classes, in the order of the rows and columns.
+ConfusionMatrix = namedtuple('ConfusionMatrix', ('classes', 'matrix'))
+
+# Metrics in scoring_methods() where a lower score is better.
+LOWER_IS_BETTER = frozenset(['lr_minus'])
 
 
 @functools.lru_cache(maxsize=1)
@@ -43,6 +53,31 @@ def scoring_methods():
     )
 
 
+def multi_metric_scorer(estimator, input_data, target_data):
+    """
+    Score an estimator on every metric in scoring_methods() from a single
+    call to predict. May be passed as the scoring parameter of
+    sklearn.model_selection.GridSearchCV, which then records every metric for
+    every candidate. Unlike the scorers in scoring_methods(), scores are not
+    negated when a lower score is better (see LOWER_IS_BETTER).
+
+    Args:
+      estimator: A trained instance of a scikit-learn estimator.
+      input_data: A 2D numpy array of inputs to the estimator.
+      target_data: A 1D numpy array of expected estimator outputs.
+
+    Returns:
+      A dict with a key for every metric in scoring_methods(). Metrics that
+      are undefined for the data, such as sensitivity for multiclass
+      targets, are NaN.
+
+    """
+
+    scores = score_model(estimator, input_data, target_data)
+
+    return {metric: scores.get(metric, np.nan) for metric in scoring_methods()}
+
+
 def score_model(model, input_data, target_data):
     """
     Score the given model on a set of data. The scoring metrics used are
@@ -76,24 +111,42 @@ def score_model(model, input_data, target_data):
     assert len(predictions) == len(target_data)
     assert np.ndim(predictions) == 1
 
+    return score_predictions(target_data, predictions)
+
+
+def score_predictions(y_true, y_pred):
+    """
+    Score a set of predictions with the same metrics as score_model(). The
+    confusion matrix is computed once and every metric that can be is
+    derived from it.
+
+    Args:
+      y_true: Ground truth (correct) target values.
+      y_pred: Estimated targets as returned by a classifier.
+
+    Returns:
+      A dict with keys for all the scoring metrics that were performed. See
+      score_model().
+
+    """
+
+    confusion = confusion_matrix(y_true, y_pred)
     scores = dict()
-    scores['accuracy'] = sklearn.metrics.accuracy_score(target_data, predictions)
-    scores['informedness'] = informedness(target_data, predictions)
-    scores['mcc'] = sklearn.metrics.matthews_corrcoef(target_data, predictions)
-    scores['precision'] = precision(target_data, predictions)
-    scores['recall'] = recall(target_data, predictions)
-    scores['f1_score'] = f1_score(target_data, predictions)
-    scores['ami'] = sklearn.metrics.adjusted_mutual_info_score(target_data, predictions)
-
-    classes = np.unique(np.concatenate([target_data, predictions]))
-    if len(classes) == 2:
-        scores['sensitivity'] = sensitivity(target_data, predictions)
-        scores['specificity'] = specificity(target_data, predictions)
-        scores['dor'] = diagnostic_odds_ratio(target_data, predictions)
-        scores['lr_plus'] = positive_likelihood_ratio(target_data, predictions)
-        scores['lr_minus'] = negative_likelihood_ratio(target_data, predictions)
+    scores['accuracy'] = _accuracy(confusion)
+    scores['informedness'] = _informedness(confusion)
+    scores['mcc'] = _mcc(confusion)
+    scores['precision'] = _precision(confusion)
+    scores['recall'] = _recall(confusion)
+    scores['f1_score'] = _f1_score(confusion)
+    scores['ami'] = sklearn.metrics.adjusted_mutual_info_score(y_true, y_pred)
+    if len(confusion.classes) == 2:
+        scores['sensitivity'] = _sensitivity(confusion)
+        scores['specificity'] = _specificity(confusion)
+        scores['dor'] = _diagnostic_odds_ratio(confusion)
+        scores['lr_plus'] = _positive_likelihood_ratio(confusion)
+        scores['lr_minus'] = _negative_likelihood_ratio(confusion)
         try:
-            scores['roc_auc'] = sklearn.metrics.roc_auc_score(target_data, predictions)
+            scores['roc_auc'] = sklearn.metrics.roc_auc_score(y_true, y_pred)
 
         except ValueError as value_error:
             logger = logging.getLogger(__name__)
@@ -102,6 +155,334 @@ def score_model(model, input_data, target_data):
     return scores
 
 
+def confusion_matrix(y_true, y_pred):
+    """
+    Compute the confusion matrix of a set of predictions in a single pass.
+
+    Args:
+      y_true: Ground truth (correct) target values.
+      y_pred: Estimated targets as returned by a classifier.
+
+    Returns:
+      An instance of ConfusionMatrix.
+
+    """
+
+    y_true = np.asarray(y_true)
+    classes, labels = np.unique(np.concatenate([y_true, np.asarray(y_pred)]),
+                                return_inverse=True)
+
+    n_classes = len(classes)
+    cells = labels[:len(y_true)] * n_classes + labels[len(y_true):]
+    matrix = np.bincount(cells, minlength=n_classes ** 2).reshape(n_classes, n_classes)
+
+    return ConfusionMatrix(classes, matrix)
+
+
+def score_predictions_batch(y_true, y_pred, classes=None):
+    """
+    Score many sets of predictions at once, such as the predictions of many
+    models, folds or resamples, with the same metrics as score_predictions().
+    Every metric is computed for all rows at once from a stack of confusion
+    matrices. ami is computed with the same formula as
+    sklearn.metrics.adjusted_mutual_info_score, but may differ from it by
+    floating point rounding.
+
+    The classes are the union of the classes in every row unless given, so
+    a row's scores are the same as score_predictions() whenever the row
+    contains all of the classes. Metrics that are undefined for a row are
+    NaN, or inf where score_predictions() would return inf, and no warnings
+    are logged.
+
+    Args:
+      y_true: Ground truth (correct) target values, either as a 1D array
+              shared by every row of y_pred or as a 2D array with the same
+              shape as y_pred.
+      y_pred: 2D array of estimated targets with one row per set of
+              predictions.
+      classes: Sorted array of every class in y_true and y_pred, or None to
+               use the classes in y_true and y_pred. (Default=None)
+
+    Returns:
+      A dict with the same keys as score_predictions() for the classes,
+      where each value is a 1D array with one score per row of y_pred.
+
+    """
+
+    y_pred = np.asarray(y_pred)
+    if y_pred.ndim != 2:
+        raise ValueError('y_pred must have dimensions M x N.')
+
+    y_true = np.asarray(y_true)
+    if y_true.shape not in (y_pred.shape, y_pred.shape[1:]):
+        raise ValueError('y_true must have dimensions N x 1 or the same dimensions as y_pred.')
+
+    y_true = np.broadcast_to(y_true, y_pred.shape)
+    confusion = confusion_matrices(y_true, y_pred, classes=classes)
+    scores = dict()
+    scores['accuracy'] = _accuracy(confusion)
+    scores['informedness'] = _informedness(confusion)
+    scores['mcc'] = _mcc(confusion)
+    scores['precision'] = _precision(confusion)
+    scores['recall'] = _recall(confusion)
+    scores['f1_score'] = _f1_score(confusion)
+    scores['ami'] = _adjusted_mutual_info(confusion)
+
+    if len(confusion.classes) == 2:
+        sensitivity_scores = _sensitivity(confusion)
+        specificity_scores = _specificity(confusion)
+        tp = confusion.matrix[:, 0, 0]
+        fp = confusion.matrix[:, 0, 1]
+        fn = confusion.matrix[:, 1, 0]
+        tn = confusion.matrix[:, 1, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dor = tp * tn / (fp * fn)
+            lr_plus = sensitivity_scores / (1 - specificity_scores)
+            lr_minus = (1 - sensitivity_scores) / specificity_scores
+
+        scores['sensitivity'] = sensitivity_scores
+        scores['specificity'] = specificity_scores
+        scores['dor'] = np.where((fp == 0) & (fn == 0),
+                                 np.inf,
+                                 np.where((fp == 0) | (fn == 0), np.nan, dor))
+
+        scores['lr_plus'] = np.where(specificity_scores == 1, np.inf, lr_plus)
+        scores['lr_minus'] = np.where(specificity_scores == 0, np.inf, lr_minus)
+
+        # The ROC curve of a binary classifier's predictions runs from (0, 0)
+        # through (fpr, tpr) to (1, 1). Integrate it the same way as
+        # sklearn.metrics.roc_auc_score. It is undefined when y_true only
+        # contains one class.
+        true_sums = np.sum(confusion.matrix, axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fpr = confusion.matrix[:, 0, 1] / true_sums[:, 0]
+            tpr = confusion.matrix[:, 1, 1] / true_sums[:, 1]
+
+        roc_auc = fpr * (tpr + 0.0) / 2.0 + (1 - fpr) * (1 + tpr) / 2.0
+        scores['roc_auc'] = np.where(np.all(true_sums > 0, axis=-1), roc_auc, np.nan)
+
+    return scores
+
+
+def bootstrap_scores(y_true,
+                     y_pred,
+                     n_resamples,
+                     confidence=0.95,
+                     random_state=None,
+                     chunk_size=1000):
+    """
+    Estimate percentile bootstrap confidence intervals for every score in
+    score_predictions(). The predictions are resampled with replacement
+    n_resamples times, and every resample in a chunk is scored in a single
+    pass of score_predictions_batch(). Only chunk_size resamples are held in
+    memory at once.
+
+    Args:
+      y_true: Ground truth (correct) target values.
+      y_pred: Estimated targets as returned by a classifier.
+      n_resamples: Number of bootstrap resamples to score.
+      confidence: Confidence level of the intervals. (Default=0.95)
+      random_state: Seed for the random number generator, or None to use
+                    numpy's global random number generator. (Default=None)
+      chunk_size: Number of resamples to score at once. (Default=1000)
+
+    Returns:
+      A 2-tuple of dicts with the same keys as score_predictions(y_true,
+      y_pred), where the first holds the lower bound and the second holds the
+      upper bound of each score's confidence interval. Resamples where a
+      score is undefined are ignored, and a bound is NaN if the score is
+      undefined for every resample.
+
+    """
+
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    if y_true.ndim != 1 or y_true.shape != y_pred.shape:
+        raise ValueError('y_true and y_pred must be 1D arrays of the same length.')
+
+    if not 0 < confidence < 1:
+        raise ValueError('confidence must be between 0 and 1.')
+
+    generator = np.random.RandomState(random_state) if random_state is not None else np.random
+    classes = np.unique(np.concatenate([y_true, y_pred]))
+    metrics = score_predictions(y_true, y_pred).keys()
+    resample_scores = {metric: [] for metric in metrics}
+    for start in range(0, n_resamples, chunk_size):
+        n_rows = min(chunk_size, n_resamples - start)
+        index = generator.randint(0, len(y_true), size=(n_rows, len(y_true)))
+        chunk_scores = score_predictions_batch(y_true[index], y_pred[index], classes=classes)
+        for metric in metrics:
+            resample_scores[metric].append(chunk_scores[metric])
+
+    percentiles = 50 * (1 - confidence), 50 * (1 + confidence)
+    lower_scores = dict()
+    upper_scores = dict()
+    for metric in metrics:
+        scores = np.concatenate(resample_scores[metric])
+        lower_scores[metric], upper_scores[metric] = _percentiles(scores[~np.isnan(scores)],
+                                                                  percentiles)
+
+    return lower_scores, upper_scores
+
+
+def _percentiles(scores, percentiles):
+    """
+    Compute percentiles like np.percentile, but without interpolating
+    between two infinite scores, and with NaN for an empty array.
+
+    """
+
+    if len(scores) == 0:
+        return np.full(len(percentiles), np.nan)
+
+    lower = np.percentile(scores, percentiles, interpolation='lower')
+    higher = np.percentile(scores, percentiles, interpolation='higher')
+    with np.errstate(invalid='ignore'):
+        linear = np.percentile(scores, percentiles)
+
+    return np.where(lower == higher, lower, linear)
+
+
+def confusion_matrices(y_true, y_pred, classes=None):
+    """
+    Compute the confusion matrix of each row of a 2D array of predictions in
+    a single pass.
+
+    Args:
+      y_true: 2D array of ground truth (correct) target values.
+      y_pred: 2D array of estimated targets with the same shape as y_true.
+      classes: Sorted array of every class in y_true and y_pred, or None to
+               use the union of the classes in every row. (Default=None)
+
+    Returns:
+      An instance of ConfusionMatrix, where matrix is an M x K x K array with
+      one confusion matrix for each row.
+
+    """
+
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    values = np.concatenate([y_true.ravel(), y_pred.ravel()])
+    if classes is None:
+        classes, labels = np.unique(values, return_inverse=True)
+
+    else:
+        classes = np.asarray(classes)
+        labels = np.minimum(np.searchsorted(classes, values), len(classes) - 1)
+        if np.any(classes[labels] != values):
+            raise ValueError('y_true and y_pred contain values that are not in classes.')
+
+    n_classes = len(classes)
+    n_rows = y_true.shape[0]
+    true_labels, predicted_labels = np.split(labels, 2)
+    rows = np.repeat(np.arange(n_rows), y_true.shape[1])
+    cells = (rows * n_classes + true_labels) * n_classes + predicted_labels
+    matrix = np.bincount(cells, minlength=n_rows * n_classes ** 2)
+
+    return ConfusionMatrix(classes, matrix.reshape(n_rows, n_classes, n_classes))
+
+
+def _adjusted_mutual_info(confusion):
+    """
+    Compute the adjusted mutual information of each matrix in a stack of
+    confusion matrices with the same formula as
+    sklearn.metrics.adjusted_mutual_info_score.
+
+    """
+
+    counts = confusion.matrix.astype(np.float64)
+    true_sums = np.sum(counts, axis=-1)
+    predicted_sums = np.sum(counts, axis=-2)
+    n_samples = np.sum(true_sums, axis=-1)
+    n_true_classes = np.sum(true_sums > 0, axis=-1)
+    n_predicted_classes = np.sum(predicted_sums > 0, axis=-1)
+
+    # Mutual information, which is 0 if either labelling has a single class.
+    log_n = np.log(n_samples)[:, np.newaxis, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        joint = counts / n_samples[:, np.newaxis, np.newaxis]
+        outer = true_sums[:, :, np.newaxis] * predicted_sums[:, np.newaxis, :]
+        mi = joint * (np.log(counts) - log_n) + joint * (-np.log(outer) + 2 * log_n)
+
+    mi = np.where((counts == 0) | (np.abs(mi) < np.finfo(np.float64).eps), 0.0, mi)
+    mi = np.clip(np.sum(mi, axis=(-2, -1)), 0.0, None)
+    mi[(n_true_classes == 1) | (n_predicted_classes == 1)] = 0.0
+
+    # The expected mutual information only depends on the class counts, which
+    # many rows usually share.
+    marginals, marginal_index = np.unique(np.column_stack([true_sums, predicted_sums]),
+                                          axis=0,
+                                          return_inverse=True)
+
+    n_classes = true_sums.shape[1]
+    emi = np.array([_expected_mutual_info(row[:n_classes], row[n_classes:])
+                    for row in marginals])[marginal_index]
+
+    normalizer = (_entropy(true_sums) + _entropy(predicted_sums)) / 2
+    denominator = normalizer - emi
+    eps = np.finfo(np.float64).eps
+    denominator = np.where(denominator < 0,
+                           np.minimum(denominator, -eps),
+                           np.maximum(denominator, eps))
+
+    ami = (mi - emi) / denominator
+
+    # Special cases of sklearn. When every sample is in a class of its own in
+    # both labellings, the mutual information equals its expected value, so
+    # the score is 0 however the classes are matched up. When both
+    # labellings have a single class, the score is 1.
+    ami[(n_true_classes == n_samples) & (n_predicted_classes == n_samples)] = 0.0
+    ami[(n_true_classes == 1) & (n_predicted_classes == 1)] = 1.0
+
+    return ami
+
+
+def _expected_mutual_info(true_sums, predicted_sums):
+    """
+    Compute the expected mutual information of two labellings with the
+    given class counts under the hypergeometric model of randomness.
+
+    """
+
+    a = true_sums[true_sums > 0][:, np.newaxis, np.newaxis]
+    b = predicted_sums[predicted_sums > 0][np.newaxis, :, np.newaxis]
+    if a.size == 1 or b.size == 1:
+        return 0.0
+
+    n_samples = np.sum(true_sums)
+    nij = np.arange(1, max(np.max(a), np.max(b)) + 1)[np.newaxis, np.newaxis, :]
+    possible = (nij >= a + b - n_samples) & (nij <= np.minimum(a, b))
+    nij = np.where(possible, nij, 1)
+    term2 = np.log(n_samples) + np.log(nij) - np.log(a) - np.log(b)
+    gln = (special.gammaln(a + 1) + special.gammaln(b + 1)
+           + special.gammaln(n_samples - a + 1) + special.gammaln(n_samples - b + 1)
+           - special.gammaln(nij + 1) - special.gammaln(n_samples + 1)
+           - special.gammaln(a - nij + 1) - special.gammaln(b - nij + 1)
+           - special.gammaln(n_samples - a - b + nij + 1))
+
+    with np.errstate(invalid='ignore'):
+        terms = nij / n_samples * term2 * np.exp(gln)
+
+    return np.sum(np.where(possible, terms, 0.0))
+
+
+def _entropy(class_counts):
+    """
+    Compute the entropy of each row of a 2D array of class counts, or 0 for
+    rows with a single class.
+
+    """
+
+    n_samples = np.sum(class_counts, axis=-1)[:, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = (class_counts / n_samples) * (np.log(class_counts) - np.log(n_samples))
+
+    entropy = -np.sum(np.where(class_counts > 0, terms, 0.0), axis=-1)
+    entropy[np.sum(class_counts > 0, axis=-1) == 1] = 0.0
+
+    return entropy
+
+
 def diagnostic_odds_ratio(y_true, y_pred):
     """
     Compute the diagnostic odds ratio given by the formula:
@@ -122,20 +503,29 @@ def diagnostic_odds_ratio(y_true, y_pred):
 
     """
 
+    return _diagnostic_odds_ratio(confusion_matrix(y_true, y_pred))
+
+
+def _diagnostic_odds_ratio(confusion):
+    """
+    Compute diagnostic_odds_ratio() from a ConfusionMatrix.
+
+    """
+
     logger = logging.getLogger(__name__)
-    confusion_matrix = sklearn.metrics.confusion_matrix(y_true, y_pred)
-    if len(confusion_matrix[0]) != 2:
+    if len(confusion.classes) != 2:
         raise ValueError('diagnostic odds ratio is undefined for the multiclass situation.')
 
-    tp = confusion_matrix[0][0]
-    fp = confusion_matrix[0][1]
-    fn = confusion_matrix[1][0]
-    tn = confusion_matrix[1][1]
+    tp = confusion.matrix[0][0]
+    fp = confusion.matrix[0][1]
+    fn = confusion.matrix[1][0]
+    tn = confusion.matrix[1][1]
 
-    assert 0 <= tp <= len(y_true)
-    assert 0 <= fp <= len(y_true)
-    assert 0 <= fn <= len(y_true)
-    assert 0 <= tn <= len(y_true)
+    n_samples = np.sum(confusion.matrix)
+    assert 0 <= tp <= n_samples
+    assert 0 <= fp <= n_samples
+    assert 0 <= fn <= n_samples
+    assert 0 <= tn <= n_samples
 
     if fp == 0 and fn == 0:
         return np.inf
@@ -173,15 +563,23 @@ def positive_likelihood_ratio(y_true, y_pred, warn=True):
 
     """
 
-    logger = logging.getLogger(__name__)
-    try:
-        sensitivity_score = sensitivity(y_true, y_pred)
-        specificity_score = specificity(y_true, y_pred)
+    return _positive_likelihood_ratio(confusion_matrix(y_true, y_pred), warn=warn)
 
-    except ValueError:
+
+def _positive_likelihood_ratio(confusion, warn=True):
+    """
+    Compute positive_likelihood_ratio() from a ConfusionMatrix.
+
+    """
+
+    logger = logging.getLogger(__name__)
+    if len(confusion.classes) != 2:
         msg = 'likelihood ratio is undefined for the multiclass situation.'
         raise ValueError(msg)
 
+    sensitivity_score = _sensitivity(confusion)
+    specificity_score = _specificity(confusion)
+
     if specificity_score == 1:
         msg = 'positive likelihood ratio is undefined when specificity is 1.'
         if warn:
@@ -219,15 +617,23 @@ def negative_likelihood_ratio(y_true, y_pred, warn=True):
 
     """
 
-    logger = logging.getLogger(__name__)
-    try:
-        sensitivity_score = sensitivity(y_true, y_pred)
-        specificity_score = specificity(y_true, y_pred)
+    return _negative_likelihood_ratio(confusion_matrix(y_true, y_pred), warn=warn)
+
+
+def _negative_likelihood_ratio(confusion, warn=True):
+    """
+    Compute negative_likelihood_ratio() from a ConfusionMatrix.
 
-    except ValueError:
+    """
+
+    logger = logging.getLogger(__name__)
+    if len(confusion.classes) != 2:
         msg = 'likelihood ratio is undefined for the multiclass situation.'
         raise ValueError(msg)
 
+    sensitivity_score = _sensitivity(confusion)
+    specificity_score = _specificity(confusion)
+
     if specificity_score == 0:
         msg = 'negative likelihood ratio is undefined when specificity is 0.'
         if warn:
@@ -258,13 +664,21 @@ def sensitivity(y_true, y_pred):
 
     """
 
-    classes = np.unique(np.concatenate([y_true, y_pred]))
-    if len(classes) != 2:
+    return _sensitivity(confusion_matrix(y_true, y_pred))
+
+
+def _sensitivity(confusion):
+    """
+    Compute sensitivity() from a ConfusionMatrix. The positive class is the
+    greater of the two classes.
+
+    """
+
+    if len(confusion.classes) != 2:
         msg = 'sensitivity is not defined for the multiclass situation.'
         raise ValueError(msg)
 
-    positive_class = np.max(classes)
-    return sklearn.metrics.recall_score(y_true, y_pred, pos_label=positive_class)
+    return _class_recalls(confusion)[..., 1]
 
 
 def specificity(y_true, y_pred):
@@ -286,13 +700,21 @@ def specificity(y_true, y_pred):
 
     """
 
-    classes = np.unique(np.concatenate([y_true, y_pred]))
-    if len(classes) != 2:
+    return _specificity(confusion_matrix(y_true, y_pred))
+
+
+def _specificity(confusion):
+    """
+    Compute specificity() from a ConfusionMatrix. The negative class is the
+    lesser of the two classes.
+
+    """
+
+    if len(confusion.classes) != 2:
         msg = 'specificity is not defined for the multiclass situation.'
         raise ValueError(msg)
 
-    negative_class = np.min(classes)
-    return sklearn.metrics.recall_score(y_true, y_pred, pos_label=negative_class)
+    return _class_recalls(confusion)[..., 0]
 
 
 def informedness(y_true, y_pred):
@@ -308,10 +730,33 @@ def informedness(y_true, y_pred):
 
     """
 
-    if len(np.unique(np.concatenate([y_true, y_pred]))) == 2:
-        return sensitivity(y_true, y_pred) + specificity(y_true, y_pred) - 1
+    return _informedness(confusion_matrix(y_true, y_pred))
+
+
+def _informedness(confusion):
+    """
+    Compute informedness() from a ConfusionMatrix. For the multiclass
+    situation, this is the adjusted balanced accuracy of the classes in
+    y_true, the same as sklearn.metrics.balanced_accuracy_score.
+
+    """
 
-    return sklearn.metrics.balanced_accuracy_score(y_true, y_pred, adjusted=True)
+    if len(confusion.classes) == 2:
+        return _sensitivity(confusion) + _specificity(confusion) - 1
+
+    # Classes that are not in y_true are left out of the balanced accuracy.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        class_recalls = _diagonal(confusion) / np.sum(confusion.matrix, axis=-1)
+
+    in_y_true = ~np.isnan(class_recalls)
+    n_classes = np.sum(in_y_true, axis=-1)
+    score = np.sum(np.where(in_y_true, class_recalls, 0), axis=-1) / n_classes
+    chance = 1 / n_classes
+    score -= chance
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score /= 1 - chance
+
+    return score
 
 
 def precision(y_true, y_pred):
@@ -328,13 +773,19 @@ def precision(y_true, y_pred):
 
     """
 
-    classes = np.unique(np.concatenate([y_true, y_pred]))
-    if len(classes) == 2:
-        positive_class = np.max(classes)
-        return sklearn.metrics.precision_score(y_true, y_pred,
-                                               pos_label=positive_class)
+    return _precision(confusion_matrix(y_true, y_pred))
 
-    return sklearn.metrics.precision_score(y_true, y_pred, average='weighted')
+
+def _precision(confusion):
+    """
+    Compute precision() from a ConfusionMatrix.
+
+    """
+
+    if len(confusion.classes) == 2:
+        return _class_precisions(confusion)[..., 1]
+
+    return _weighted_average(confusion, _class_precisions(confusion))
 
 
 def recall(y_true, y_pred):
@@ -351,13 +802,19 @@ def recall(y_true, y_pred):
 
     """
 
-    classes = np.unique(np.concatenate([y_true, y_pred]))
-    if len(classes) == 2:
-        positive_class = np.max(classes)
-        return sklearn.metrics.recall_score(y_true, y_pred,
-                                            pos_label=positive_class)
+    return _recall(confusion_matrix(y_true, y_pred))
+
+
+def _recall(confusion):
+    """
+    Compute recall() from a ConfusionMatrix.
+
+    """
+
+    if len(confusion.classes) == 2:
+        return _class_recalls(confusion)[..., 1]
 
-    return sklearn.metrics.recall_score(y_true, y_pred, average='weighted')
+    return _weighted_average(confusion, _class_recalls(confusion))
 
 
 def f1_score(y_true, y_pred):
@@ -374,8 +831,106 @@ def f1_score(y_true, y_pred):
 
     """
 
-    classes = np.unique(np.concatenate([y_true, y_pred]))
-    if len(classes) == 2:
-        return sklearn.metrics.f1_score(y_true, y_pred)
+    return _f1_score(confusion_matrix(y_true, y_pred))
+
+
+def _f1_score(confusion):
+    """
+    Compute f1_score() from a ConfusionMatrix. For binary classification,
+    the positive class is 1, like sklearn.metrics.f1_score.
+
+    """
+
+    class_precisions = _class_precisions(confusion)
+    class_recalls = _class_recalls(confusion)
+    denominator = class_precisions + class_recalls
+    denominator[denominator == 0] = 1
+    class_f1_scores = 2 * class_precisions * class_recalls / denominator
+    if len(confusion.classes) == 2:
+        positive_class = np.flatnonzero(confusion.classes == 1)
+        if len(positive_class) == 0:
+            msg = f'pos_label=1 is not a valid label. It should be one of {list(confusion.classes)}'
+            raise ValueError(msg)
+
+        return class_f1_scores[..., positive_class[0]]
+
+    return _weighted_average(confusion, class_f1_scores)
+
+
+def _accuracy(confusion):
+    """
+    Compute the accuracy from a ConfusionMatrix.
+
+    """
+
+    return np.sum(_diagonal(confusion), axis=-1) / np.sum(confusion.matrix, axis=(-2, -1))
+
+
+def _mcc(confusion):
+    """
+    Compute the Matthews correlation coefficient from a ConfusionMatrix, the
+    same way as sklearn.metrics.matthews_corrcoef.
+
+    """
+
+    # All of the sums are sums of counts, so they are exact in any order.
+    true_sums = np.sum(confusion.matrix, axis=-1, dtype=np.float64)
+    predicted_sums = np.sum(confusion.matrix, axis=-2, dtype=np.float64)
+    n_correct = np.sum(_diagonal(confusion), axis=-1, dtype=np.float64)
+    n_samples = np.sum(predicted_sums, axis=-1)
+    cov_ytyp = n_correct * n_samples - np.sum(true_sums * predicted_sums, axis=-1)
+    cov_ypyp = n_samples ** 2 - np.sum(predicted_sums ** 2, axis=-1)
+    cov_ytyt = n_samples ** 2 - np.sum(true_sums ** 2, axis=-1)
+    undefined = cov_ypyp * cov_ytyt == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(undefined, 0.0, cov_ytyp / np.sqrt(cov_ytyt * cov_ypyp))[()]
+
+
+def _class_recalls(confusion):
+    """
+    Compute the recall of each class in a ConfusionMatrix, or 0 for classes
+    that are not in y_true.
+
+    """
+
+    return _divide(_diagonal(confusion), np.sum(confusion.matrix, axis=-1))
+
+
+def _class_precisions(confusion):
+    """
+    Compute the precision of each class in a ConfusionMatrix, or 0 for
+    classes that are not in y_pred.
+
+    """
+
+    return _divide(_diagonal(confusion), np.sum(confusion.matrix, axis=-2))
+
+
+def _weighted_average(confusion, class_scores):
+    """
+    Average the scores of each class in a ConfusionMatrix, weighted by the
+    number of samples of each class in y_true.
+
+    """
+
+    return np.average(class_scores, weights=np.sum(confusion.matrix, axis=-1), axis=-1)
+
+
+def _diagonal(confusion):
+    """
+    Get the number of correct predictions of each class in a ConfusionMatrix.
+
+    """
+
+    return np.diagonal(confusion.matrix, axis1=-2, axis2=-1)
+
+
+def _divide(numerator, denominator):
+    """
+    Divide counts of correct predictions by counts of samples elementwise.
+    Where there are no samples, there are no correct predictions, so the
+    result is 0.
+
+    """
 
-    return sklearn.metrics.f1_score(y_true, y_pred, average='weighted')
+    return numerator / np.where(denominator == 0, 1, denominator)
@@ -0,0 +1,335 @@
+"""
+Checkpoint hyperparameter searches to an SQLite database, so that a search
+that is interrupted can be restarted without repeating the candidate
+evaluations that it already completed.
+
+The search is run on a CheckpointedEstimator and scored with a
+CheckpointedScorer. Fitting a CheckpointedEstimator only records a hash of
+its training data. When it is scored, the scorer looks up its parameters,
+training data, testing data, seed and scorer in the database, and only fits
+and scores the estimator if they are not found. Every score that is computed
+is saved, and can be queried afterwards with load_results(). Candidates that
+fail to fit are logged and saved with NaN scores, like a search without a
+checkpoint scores them, so they are not fit again when the search resumes.
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import json
+import sqlite3
+import contextlib
+import hashlib
+import datetime
+import logging
+
+import numpy as np
+import joblib
+import pandas as pd
+import sklearn
+from sklearn.base import BaseEstimator
+from sklearn.dummy import DummyClassifier
+
+# Schema of the table that scores are saved to. key is a hash of the other
+# columns, except scores and created.
+CREATE_RESULTS_TABLE = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    parameters TEXT NOT NULL,
+    training_hash TEXT NOT NULL,
+    testing_hash TEXT NOT NULL,
+    seed INTEGER,
+    scorer TEXT NOT NULL,
+    scores TEXT NOT NULL,
+    created TEXT NOT NULL
+)
+"""
+
+# Seconds to wait for another process to finish writing to the database.
+DATABASE_TIMEOUT = 60
+
+
+class CheckpointedEstimator(BaseEstimator):
+    """
+    Wrap an estimator so that it is only fit when it is used to predict.
+    The parameters of the wrapped estimator can be get and set as if they
+    were parameters of the wrapper, so the wrapper can be searched with the
+    same parameter grid.
+
+    Args:
+      estimator: A scikit-learn estimator.
+      seed: The seed of the random number generators the estimator is fit
+            with. Only used to tell results apart. (Default=None)
+
+    """
+
+    def __init__(self, estimator, seed=None):
+        self.estimator = estimator
+        self.seed = seed
+
+    @property
+    def _estimator_type(self):
+        return getattr(self.estimator, '_estimator_type', None)
+
+    def get_params(self, deep=True):
+        params = super().get_params(deep=False)
+        if deep:
+            params.update(self.estimator.get_params(deep=True))
+
+        return params
+
+    def set_params(self, **params):
+        own_params = {name: params.pop(name) for name in ('estimator', 'seed') if name in params}
+        super().set_params(**own_params)
+        self.estimator.set_params(**params)
+
+        return self
+
+    def fit(self, inputs, targets):
+        """
+        Record the training data without fitting the estimator.
+
+        """
+
+        self.inputs_ = inputs
+        self.targets_ = targets
+        self.training_hash_ = joblib.hash((inputs, targets))
+        self.fitted_estimator_ = None
+
+        return self
+
+    def fitted_estimator(self):
+        """
+        Fit the wrapped estimator to the training data, if it has not been
+        fit already.
+
+        Returns:
+          The fitted estimator.
+
+        """
+
+        if self.fitted_estimator_ is None:
+            self.fitted_estimator_ = sklearn.clone(self.estimator).fit(self.inputs_, self.targets_)
+            self.inputs_ = self.targets_ = None
+
+        return self.fitted_estimator_
+
+    @property
+    def classes_(self):
+        return self.fitted_estimator().classes_
+
+    def predict(self, inputs):
+        return self.fitted_estimator().predict(inputs)
+
+    def result(self, inputs, targets, scorer):
+        """
+        Describe the result of scoring the estimator on a testing dataset.
+
+        Args:
+          inputs: The inputs of the testing dataset.
+          targets: The targets of the testing dataset.
+          scorer: The name of the scorer, as given by
+                  CheckpointedScorer.scorer_name.
+
+        Returns:
+          A dict with the columns of the results table, except scores and
+          created.
+
+        """
+
+        result = dict(parameters=_parameters(self.estimator),
+                      training_hash=self.training_hash_,
+                      testing_hash=joblib.hash((inputs, targets)),
+                      seed=self.seed,
+                      scorer=scorer)
+
+        key = json.dumps(result, sort_keys=True)
+        result['key'] = hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+        return result
+
+
+class CheckpointedScorer:
+    """
+    Score CheckpointedEstimators, reusing the scores saved in a database
+    when possible and saving the scores that are computed.
+
+    Args:
+      scorer: A function that takes three parameters - an estimator, an array
+              of input data, and an array of target data, and returns a
+              score or a dict of scores.
+      path: Path to the SQLite database. It is created if it does not exist.
+
+    """
+
+    def __init__(self, scorer, path):
+        self.scorer = scorer
+        self.scorer_name = _scorer_name(scorer)
+        self.path = str(path)
+        with _connect(self.path):
+            pass
+
+    def __call__(self, estimator, inputs, targets):
+        result = estimator.result(inputs, targets, self.scorer_name)
+        scores = self.lookup(result['key'])
+        if scores is not None:
+            return scores
+
+        try:
+            estimator.fitted_estimator()
+
+        except Exception as error:  # pylint: disable=W0703
+            logger = logging.getLogger(__name__)
+            logger.warning('Candidate %s failed to fit: %r', result['parameters'], error)
+            scores = self.error_scores(estimator, inputs, targets)
+
+        else:
+            scores = self.scorer(estimator, inputs, targets)
+
+        self.save(result, scores)
+
+        return scores
+
+    def error_scores(self, estimator, inputs, targets):
+        """
+        Score a candidate that failed to fit. The scorer is called on a
+        DummyClassifier fit to the candidate's training data, so that the
+        result has the same metrics as the scores of the other candidates.
+
+        Returns:
+          NaN, or a dict of NaN scores.
+
+        """
+
+        dummy = DummyClassifier().fit(estimator.inputs_, estimator.targets_)
+        scores = self.scorer(dummy, inputs, targets)
+        if isinstance(scores, dict):
+            return {metric: np.nan for metric in scores}
+
+        return np.nan
+
+    def lookup(self, key):
+        """
+        Look up the scores saved under a key.
+
+        Returns:
+          The saved score or dict of scores, or None if the key is not in
+          the database.
+
+        """
+
+        with _connect(self.path) as connection:
+            row = connection.execute('SELECT scores FROM results WHERE key = ?', (key,)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def save(self, result, scores):
+        """
+        Save the scores of a result to the database.
+
+        Args:
+          result: A dict returned by CheckpointedEstimator.result().
+          scores: A score or dict of scores.
+
+        """
+
+        result = dict(result)
+        if isinstance(scores, dict):
+            result['scores'] = json.dumps({metric: float(score) for metric, score in scores.items()})
+
+        else:
+            result['scores'] = json.dumps(float(scores))
+
+        result['created'] = datetime.datetime.today().isoformat()
+        with _connect(self.path) as connection:
+            connection.execute('INSERT OR REPLACE INTO results '
+                               '(key, parameters, training_hash, testing_hash, seed, scorer, scores, created) '
+                               'VALUES (:key, :parameters, :training_hash, :testing_hash, :seed, :scorer, '
+                               ':scores, :created)',
+                               result)
+
+
+def load_results(path):
+    """
+    Load the results saved in a checkpoint database.
+
+    Args:
+      path: Path to the SQLite database.
+
+    Returns:
+      A DataFrame with a row for each candidate and fold, and the columns of
+      the results table. parameters and scores are decoded to dicts.
+
+    """
+
+    with _connect(str(path)) as connection:
+        results = pd.read_sql_query('SELECT * FROM results ORDER BY created', connection)
+
+    results['parameters'] = results['parameters'].map(json.loads)
+    results['scores'] = results['scores'].map(json.loads)
+
+    return results
+
+
+@contextlib.contextmanager
+def _connect(path):
+    """
+    Connect to a checkpoint database and create the results table if it
+    does not exist. The transaction is committed and the connection is
+    closed on exit.
+
+    """
+
+    connection = sqlite3.connect(path, timeout=DATABASE_TIMEOUT)
+    try:
+        with connection:
+            connection.execute(CREATE_RESULTS_TABLE)
+            yield connection
+
+    finally:
+        connection.close()
+
+
+def _parameters(estimator):
+    """
+    Encode the parameters of an estimator as JSON. Parameters that are
+    estimators are replaced by the name of their class, and the memory of a
+    Pipeline is left out, because it does not change the results.
+
+    """
+
+    parameters = {name: value for name, value in estimator.get_params(deep=True).items()
+                  if name != 'memory' and not name.endswith('__memory')}
+
+    return json.dumps(parameters, sort_keys=True, default=_encode_parameter)
+
+
+def _scorer_name(scorer):
+    """
+    Name a scorer, so that scores from different scorers are saved under
+    different keys. Functions are named by their module and qualified name,
+    and other scorers, such as those made by sklearn.metrics.make_scorer, by
+    their repr, which names the metric they score.
+
+    """
+
+    if hasattr(scorer, '__qualname__'):
+        return f'{scorer.__module__}.{scorer.__qualname__}'
+
+    return repr(scorer)
+
+
+def _encode_parameter(value):
+    """
+    Encode a parameter that is not JSON serializable.
+
+    """
+
+    if hasattr(value, 'get_params'):
+        return type(value).__qualname__
+
+    return repr(value)
@@ -0,0 +1,392 @@
+"""
+Run a model selection tournament: train and evaluate a model for every
+combination of algorithm and chain of preprocessing methods, and save the
+results as a CSV table with the same columns as data/model_selection.csv.
+
+Each combination is evaluated the same way as gen_model.py evaluates a
+model - it is trained on the training dataset, scored on the validation
+dataset and on the outliers in the validation dataset, and cross-validated.
+'cv informedness' and 'mad informedness' are the mean and standard deviation
+of the informedness over the cross-validation folds, and 'runtime' is the
+time in seconds it took to evaluate the combination. Cached rows keep the
+runtime of the run that evaluated them, not the time it took to load them.
+
+The datasets are loaded and their outliers are located once, and are shared
+with the worker processes, which evaluate one combination at a time. When a
+cache directory is given, the result of each combination is cached by its
+settings, the contents of the datasets and the commit hash, so that only new
+combinations are evaluated when the tournament is rerun. Rows are written in
+the order of the algorithms and preprocessing chains, regardless of the
+order the combinations finish in.
+
+Usage: select_models.py [-h] [--models MODELS [MODELS ...]]
+                        [--preprocessing PREPROCESSING]
+                        [--chain-length CHAIN_LENGTH]
+                        [--parameter-grids PARAMETER_GRIDS]
+                        [--scoring SCORING] [--random-state RANDOM_STATE]
+                        [--cross-validate CROSS_VALIDATE] [--cache CACHE]
+                        [--cpu CPU] [--log-level LEVEL]
+                        target training validation
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import joblib
+from joblib import Parallel, delayed
+
+import util
+import scoring
+import outliers
+import gen_model
+
+# Columns of the model selection table, in order.
+COLUMNS = ('model',
+           'preprocessing',
+           'accuracy',
+           'precision',
+           'sensitivity',
+           'specificity',
+           'informedness',
+           'dor',
+           'ami',
+           'outlier informedness',
+           'cv informedness',
+           'mad informedness',
+           'runtime',
+           'commit hash')
+
+# Metrics in the table that are taken from the validation scores.
+VALIDATION_METRICS = ('accuracy', 'precision', 'sensitivity', 'specificity', 'informedness', 'dor', 'ami')
+
+# Name of an empty preprocessing chain in the table.
+NO_PREPROCESSING = 'none'
+
+# Separator between the methods of a preprocessing chain in the table.
+CHAIN_SEPARATOR = ' + '
+
+
+def main(argv):
+    """
+    Program's main function. Primary execution starts here.
+
+    """
+
+    command_line_arguments = parse_command_line(argv)
+    logfile_path = command_line_arguments.target.with_name(
+        command_line_arguments.target.stem + '.log')
+
+    util.configure_logging(command_line_arguments.log_level, logfile_path)
+    print('Loading datasets...')
+    datasets = util.load_datasets(command_line_arguments.training,
+                                  command_line_arguments.validation)
+
+    if command_line_arguments.preprocessing is None:
+        chains = preprocessing_chains(util.PREPROCESSING_METHODS, command_line_arguments.chain_length)
+
+    else:
+        chains = [tuple(chain) for chain in command_line_arguments.preprocessing]
+
+    combinations = list(itertools.product(command_line_arguments.models, chains))
+    print(f'Evaluating {len(combinations)} combinations...')
+    results = run_tournament(combinations,
+                             datasets,
+                             scoring_method=command_line_arguments.scoring,
+                             parameter_grids=command_line_arguments.parameter_grids,
+                             random_state=command_line_arguments.random_state,
+                             n_splits=command_line_arguments.cross_validate,
+                             cache=command_line_arguments.cache,
+                             cpus=command_line_arguments.cpu)
+
+    results.to_csv(command_line_arguments.target, index=False, float_format='%.4g')
+    print(f'Saved model selection table to {command_line_arguments.target}')
+
+    return 0
+
+
+def preprocessing_chains(methods, max_length=1):
+    """
+    Enumerate the chains of preprocessing methods to evaluate.
+
+    Args:
+      methods: A sequence of preprocessing method names.
+      max_length: The maximum number of methods in a chain. (Default=1)
+
+    Returns:
+      A list of tuples of method names, starting with the empty chain,
+      followed by every ordered chain of distinct methods up to max_length,
+      shortest first.
+
+    """
+
+    chains = []
+    for length in range(max_length + 1):
+        chains.extend(itertools.permutations(methods, length))
+
+    return chains
+
+
+def run_tournament(combinations,
+                   datasets,
+                   scoring_method='informedness',
+                   parameter_grids=None,
+                   random_state=0,
+                   n_splits=20,
+                   cache=None,
+                   cpus=1):
+
+    """
+    Evaluate every combination of algorithm and preprocessing chain.
+
+    Args:
+      combinations: A sequence of 2-tuples of a key of
+                    util.SUPPORTED_ALGORITHMS and a tuple of keys of
+                    util.PREPROCESSING_METHODS.
+      datasets: An instance of util.Datasets.
+      scoring_method: Scoring method to use for hyperparameter tuning.
+                      (Default='informedness')
+      parameter_grids: A dict of parameter grids keyed by algorithm.
+                       Algorithms that are not in the dict are trained with
+                       their default hyperparameters. (Default=None)
+      random_state: State to initialize random number generators with.
+                    (Default=0)
+      n_splits: Number of cross-validation folds. (Default=20)
+      cache: Directory to cache the result of each combination in, or None
+             to disable caching. Cached rows keep the runtime that was
+             measured when they were evaluated. (Default=None)
+      cpus: Number of combinations to evaluate in parallel. (Default=1)
+
+    Returns:
+      A DataFrame with a row for each combination, in the same order as
+      combinations, and the columns in COLUMNS. Scores of combinations that
+      fail are NaN.
+
+    """
+
+    parameter_grids = parameter_grids or {}
+    outlier_rows = outliers.locate_dataset_outliers(datasets, random_state=random_state, n_jobs=cpus)
+    commit_hash = util.get_commit_hash()
+    evaluate = joblib.Memory(cache, verbose=0).cache(evaluate_combination)
+
+    # max_nbytes=0 memory-maps the datasets for every worker process instead
+    # of pickling them once per combination.
+    rows = Parallel(n_jobs=cpus, max_nbytes=0)(
+        delayed(_evaluate_safely)(evaluate,
+                                  algorithm,
+                                  tuple(chain),
+                                  datasets,
+                                  outlier_rows,
+                                  scoring_method,
+                                  parameter_grids.get(algorithm),
+                                  random_state,
+                                  n_splits,
+                                  commit_hash)
+        for algorithm, chain in combinations
+    )
+
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def evaluate_combination(algorithm,
+                         chain,
+                         datasets,
+                         outlier_rows,
+                         scoring_method,
+                         parameter_grid,
+                         random_state,
+                         n_splits,
+                         commit_hash):
+
+    """
+    Train and evaluate a model for one combination of algorithm and
+    preprocessing chain.
+
+    Args:
+      algorithm: A key of util.SUPPORTED_ALGORITHMS.
+      chain: A tuple of keys of util.PREPROCESSING_METHODS.
+      datasets: An instance of util.Datasets.
+      outlier_rows: The output of outliers.locate_dataset_outliers for
+                    datasets.
+      scoring_method: Scoring method to use for hyperparameter tuning.
+      parameter_grid: Parameter grid to tune the hyperparameters with, or None.
+      random_state: State to initialize random number generators with.
+      n_splits: Number of cross-validation folds.
+      commit_hash: Commit hash of the code that evaluates the combination.
+                   Only used to invalidate cached results.
+
+    Returns:
+      A dict with the columns in COLUMNS.
+
+    """
+
+    start_time = time.time()
+    random.seed(random_state)
+    np.random.seed(random_state)
+    model = gen_model.train_model(util.SUPPORTED_ALGORITHMS[algorithm].class_,
+                                  datasets.training.inputs,
+                                  datasets.training.targets,
+                                  scoring.multi_metric_scorer,
+                                  preprocessing_methods=[util.PREPROCESSING_METHODS[method] for method in chain],
+                                  parameter_grid=parameter_grid,
+                                  refit=scoring_method,
+                                  random_state=random_state)
+
+    validation_scores = scoring.score_model(model,
+                                            datasets.validation.inputs,
+                                            datasets.validation.targets)
+
+    outlier_scores = outliers.score(model, datasets, outlier_rows=outlier_rows)
+    mean_scores, std_scores = gen_model.cross_validate(model, datasets, n_splits)
+    row = _empty_row(algorithm, chain, commit_hash)
+    for metric in VALIDATION_METRICS:
+        row[metric] = float(validation_scores.get(metric, np.nan))
+
+    row['outlier informedness'] = float(outlier_scores.get('informedness', np.nan))
+    row['cv informedness'] = float(mean_scores.get('informedness', np.nan))
+    row['mad informedness'] = float(std_scores.get('informedness', np.nan))
+    row['runtime'] = time.time() - start_time
+
+    return row
+
+
+def _evaluate_safely(evaluate, algorithm, chain, *args):  # pylint: disable=C0103
+    """
+    Evaluate a combination, and return a row of NaN scores if it fails
+    instead of stopping the tournament. Failures are not cached.
+
+    """
+
+    try:
+        return evaluate(algorithm, chain, *args)
+
+    except Exception as error:  # pylint: disable=W0703
+        logger = logging.getLogger(__name__)
+        logger.warning('%s with %s failed: %r', algorithm, _chain_name(chain), error)
+
+        return _empty_row(algorithm, chain, args[-1])
+
+
+def _empty_row(algorithm, chain, commit_hash):  # pylint: disable=C0103
+    """
+    Create a row of the model selection table with NaN scores.
+
+    """
+
+    row = {column: np.nan for column in COLUMNS}
+    row['model'] = algorithm
+    row['preprocessing'] = _chain_name(chain)
+    row['commit hash'] = commit_hash
+
+    return row
+
+
+def _chain_name(chain):  # pylint: disable=C0103
+    """
+    Format a preprocessing chain for the model selection table.
+
+    """
+
+    return CHAIN_SEPARATOR.join(chain) or NO_PREPROCESSING
+
+
+def parse_command_line(argv):
+    """
+    Parse the command line using argparse.
+
+    Args
+      argv: A list of command line arguments, excluding the program name.
+
+    Returns
+      The output of parse_args().
+
+    """
+
+    parser = argparse.ArgumentParser(description='Run a model selection tournament.')
+    parser.add_argument('target',
+                        type=Path,
+                        help='Path to write the model selection table to.')
+
+    parser.add_argument('training',
+                        type=Path,
+                        help='Path to the training dataset.')
+
+    parser.add_argument('validation',
+                        type=Path,
+                        help='Path to the validation dataset.')
+
+    parser.add_argument('--models',
+                        choices=util.SUPPORTED_ALGORITHMS,
+                        default=list(util.SUPPORTED_ALGORITHMS),
+                        nargs='+',
+                        help='Algorithms to evaluate. Defaults to every supported algorithm.')
+
+    parser.add_argument('--preprocessing',
+                        type=json.loads,
+                        help='Preprocessing chains to evaluate (as a json list of lists).')
+
+    parser.add_argument('--chain-length',
+                        type=int,
+                        default=1,
+                        help='Maximum number of preprocessing methods in a chain.')
+
+    parser.add_argument('--parameter-grids',
+                        type=json.loads,
+                        help='Parameter grids keyed by algorithm (as a json string).')
+
+    parser.add_argument('--scoring',
+                        choices=scoring.scoring_methods(),
+                        default='informedness',
+                        help='Scoring method to use for model hyperparameter tuning.')
+
+    parser.add_argument('--random-state',
+                        type=int,
+                        default=0,
+                        help='State to initialize random number generators with.')
+
+    parser.add_argument('--cross-validate',
+                        type=int,
+                        default=20,
+                        help='Number of folds to cross-validate each model with.')
+
+    parser.add_argument('--cache',
+                        type=Path,
+                        help='Directory to cache the result of each combination in.')
+
+    parser.add_argument('--cpu',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='Number of combinations to evaluate in parallel.')
+
+    parser.add_argument('--log-level',
+                        choices=('critical', 'error', 'warning', 'info', 'debug'),
+                        default='info',
+                        help='Log level to configure logging with.')
+
+    command_line_arguments = parser.parse_args(argv)
+    if command_line_arguments.preprocessing is not None:
+        for chain in command_line_arguments.preprocessing:
+            for method in chain:
+                if method not in util.PREPROCESSING_METHODS:
+                    parser.error(f'Unknown preprocessing method: {method}')
+
+    return command_line_arguments
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main(sys.argv[1:]))
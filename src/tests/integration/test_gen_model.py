@@ -49,6 +49,9 @@ class GenModelTestCase(unittest.TestCase):
         self.logfile_path = (Path(self.output_path)
                              .with_name(Path(self.output_path).name + '.log'))
 
+        self.outlier_detector_path = (Path(self.output_path)
+                                      .with_name(Path(self.output_path).name + '_outliers'))
+
     def tearDown(self):
         if self.output_path.exists():
             self.output_path.unlink()
@@ -59,6 +62,9 @@ class GenModelTestCase(unittest.TestCase):
         if self.logfile_path.exists():
             self.logfile_path.unlink()
 
+        if self.outlier_detector_path.exists():
+            self.outlier_detector_path.unlink()
+
 
 class ModelConfigTestCase(GenModelTestCase):
     """
@@ -599,3 +605,148 @@ class OutliersTestCase(GenModelTestCase):
         self.assertAlmostEqual(model.validation['outlier_scores']['precision'], 1.0)
         self.assertAlmostEqual(model.validation['outlier_scores']['recall'], 1.0)
         self.assertAlmostEqual(model.validation['outlier_scores']['informedness'], 1.0)
+        self.assertFalse(self.outlier_detector_path.exists())
+
+    def test_main_saves_outlier_detector(self):
+        """
+        Test that gen_model.main() saves a fitted outlier detector alongside
+        the model when --outlier-detector is given.
+
+        """
+
+        exit_code = gen_model.main([str(self.output_path),
+                                    str(IRIS_DATASET),
+                                    str(IRIS_DATASET),
+                                    '--random-state', '3307259',
+                                    '--scoring', 'accuracy',
+                                    '--preprocessing', 'robust scaling',
+                                    '--model', 'dtc',
+                                    '--outlier-detector'])
+
+        self.assertEqual(exit_code, 0)
+        with open(self.outlier_detector_path, 'rb') as detector_fp:
+            outlier_detector = pickle.load(detector_fp)
+
+        iris_dataset = load_iris()
+        predictions = outlier_detector.predict(iris_dataset['data'])
+        self.assertEqual(predictions.shape, (len(iris_dataset['data']),))
+        self.assertTrue(outlier_detector.predict([[50.0, 50.0, 50.0, 50.0]])[0])
+
+
+class BootstrapTestCase(GenModelTestCase):
+    """
+    Test that gen_model.py integrates correctly with scoring.bootstrap_scores()
+
+    """
+
+    def test_main_bootstrap(self):
+        """
+        Test that gen_model.main() saves bootstrap confidence intervals that
+        contain the model scores.
+
+        """
+
+        exit_code = gen_model.main([str(self.output_path),
+                                    str(IRIS_DATASET),
+                                    str(IRIS_DATASET),
+                                    '--random-state', '3307259',
+                                    '--scoring', 'accuracy',
+                                    '--model', 'qda',
+                                    '--bootstrap', '200'])
+
+        self.assertEqual(exit_code, 0)
+        with open(self.output_path, 'rb') as output_fp:
+            model = pickle.load(output_fp)
+
+        scores = model.validation['scores']
+        lower_scores = model.validation['bootstrap_lower']
+        upper_scores = model.validation['bootstrap_upper']
+        self.assertEqual(set(lower_scores), set(scores))
+        self.assertEqual(set(upper_scores), set(scores))
+        for metric in ('accuracy', 'informedness', 'precision', 'recall'):
+            self.assertLessEqual(lower_scores[metric], scores[metric])
+            self.assertLessEqual(scores[metric], upper_scores[metric])
+
+
+class NestedCrossValidationTestCase(GenModelTestCase):
+    """
+    Test that gen_model.py integrates correctly with
+    gen_model.nested_cross_validate()
+
+    """
+
+    def test_main_nested_cv(self):
+        """
+        Test that gen_model.main() saves the nested cross-validation scores
+        and the hyperparameters selected in each outer fold.
+
+        """
+
+        exit_code = gen_model.main([str(self.output_path),
+                                    str(IRIS_DATASET),
+                                    str(IRIS_DATASET),
+                                    '--random-state', '3307259',
+                                    '--scoring', 'accuracy',
+                                    '--model', 'knn',
+                                    '--parameter-grid', '[{"model__n_neighbors": [1, 5, 9]}]',
+                                    '--cv-stratified',
+                                    '--nested-cv', '3:3',
+                                    '--cpu', '2'])
+
+        self.assertEqual(exit_code, 0)
+        with open(self.output_path, 'rb') as output_fp:
+            model = pickle.load(output_fp)
+
+        self.assertGreater(model.validation['nested_cross_validation_mean']['accuracy'], 0.9)
+        self.assertIn('accuracy', model.validation['nested_cross_validation_std'])
+        selected_parameters = model.validation['nested_cross_validation_parameters']
+        self.assertEqual(len(selected_parameters), 3)
+        for parameters in selected_parameters:
+            self.assertIn(parameters['model__n_neighbors'], [1, 5, 9])
+
+
+class MemmapTestCase(GenModelTestCase):
+    """
+    Test that gen_model.py trains and scores models on memory-mapped
+    datasets.
+
+    """
+
+    def test_main_memmap(self):
+        """
+        Test that gen_model.main() writes the datasets to a memory-mapped file
+        next to the model when --memmap is given, and gives the same model as
+        without it.
+
+        """
+
+        memmap_path = self.output_path.with_suffix('.datasets')
+        self.addCleanup(memmap_path.unlink, missing_ok=True)
+        arguments = [str(self.output_path),
+                     str(IRIS_DATASET),
+                     str(IRIS_DATASET),
+                     '--random-state', '3307259',
+                     '--scoring', 'accuracy',
+                     '--model', 'knn',
+                     '--preprocessing', 'standard scaling',
+                     '--parameter-grid', '[{"model__n_neighbors": [1, 5, 9]}]',
+                     '--cross-validate', '3',
+                     '--cpu', '2']
+
+        exit_code = gen_model.main(arguments)
+        self.assertEqual(exit_code, 0)
+        self.assertFalse(memmap_path.exists())
+        with open(self.output_path, 'rb') as output_fp:
+            model = pickle.load(output_fp)
+
+        exit_code = gen_model.main(arguments + ['--memmap'])
+        self.assertEqual(exit_code, 0)
+        self.assertTrue(memmap_path.exists())
+        with open(self.output_path, 'rb') as output_fp:
+            memmap_model = pickle.load(output_fp)
+
+        self.assertEqual(model.get_params()['model__n_neighbors'],
+                         memmap_model.get_params()['model__n_neighbors'])
+
+        self.assertEqual(model.validation['cross_validation_mean'],
+                         memmap_model.validation['cross_validation_mean'])
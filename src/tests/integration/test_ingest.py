@@ -0,0 +1,117 @@
+"""
+Integration testcases for ingest.py.
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import shutil
+import unittest
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+import ingest
+from tests.integration import test_ingest_raw_uci_data
+from tests.integration import test_ingest_cleveland_data
+
+# Source datasets and the output each one is expected to be ingested to.
+EXPECTED_OUTPUTS = {
+    test_ingest_raw_uci_data.TEST_DATASET1: test_ingest_raw_uci_data.EXPECTED_OUTPUT1,
+    test_ingest_raw_uci_data.TEST_DATASET2: test_ingest_raw_uci_data.EXPECTED_OUTPUT2,
+    test_ingest_cleveland_data.TEST_DATASET1: test_ingest_cleveland_data.EXPECTED_OUTPUT1,
+    test_ingest_cleveland_data.TEST_DATASET3: test_ingest_cleveland_data.EXPECTED_OUTPUT3,
+}
+
+
+class IngestTest(unittest.TestCase):
+    """
+    Test cases for ingest.py
+
+    """
+
+    def setUp(self):
+        self.output_path = Path(tempfile.mkdtemp())
+        self.source_path = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.output_path, ignore_errors=True)
+        shutil.rmtree(self.source_path, ignore_errors=True)
+
+    def assert_ingested(self, sources):
+        """
+        Assert that each source was ingested to its expected output.
+
+        """
+
+        for source in sources:
+            actual_dataset = pd.read_csv(self.output_path / (source.stem + '.csv'))
+            expected_dataset = pd.read_csv(EXPECTED_OUTPUTS[source])
+            self.assertTrue(expected_dataset.equals(actual_dataset), source)
+
+    def test_ingest_files(self):
+        """
+        Test ingest.py with raw UCI and Cleveland datasets ingested in
+        parallel.
+
+        """
+
+        exit_code = ingest.main([str(self.output_path)]
+                                + [str(source) for source in EXPECTED_OUTPUTS]
+                                + ['--cpu', '2'])
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(len(list(self.output_path.iterdir())), len(EXPECTED_OUTPUTS))
+        self.assert_ingested(EXPECTED_OUTPUTS)
+
+    def test_ingest_directory_and_glob(self):
+        """
+        Test ingest.py with a directory of datasets and a glob pattern.
+
+        """
+
+        for source in EXPECTED_OUTPUTS:
+            shutil.copy(source, self.source_path)
+
+        (self.source_path / 'README').touch()
+        exit_code = ingest.main([str(self.output_path), str(self.source_path), '--cpu', '1'])
+        self.assertEqual(exit_code, 0)
+        self.assert_ingested(EXPECTED_OUTPUTS)
+
+        shutil.rmtree(self.output_path)
+        self.output_path.mkdir()
+        ingest.main([str(self.output_path), str(self.source_path / '*.data')])
+        self.assertEqual(sorted(path.name for path in self.output_path.iterdir()),
+                         ['dataset1.csv', 'dataset2.csv'])
+
+    def test_find_sources(self):
+        """
+        Test that find_sources() keeps the order of the sources, removes
+        duplicates, and rejects sources that can not be ingested.
+
+        """
+
+        sources = list(EXPECTED_OUTPUTS)
+        self.assertEqual(ingest.find_sources(sources[::-1] + sources[:1]), sources[::-1])
+
+        with self.assertRaises(ValueError):
+            ingest.find_sources([self.source_path / 'missing.data'])
+
+        shutil.copy(test_ingest_raw_uci_data.TEST_DATASET1, self.source_path / 'cleveland1.data')
+        with self.assertRaises(ValueError):
+            ingest.find_sources([self.source_path / 'cleveland1.data',
+                                 test_ingest_cleveland_data.TEST_DATASET1])
+
+        readme = self.source_path / 'README'
+        readme.touch()
+        with self.assertRaises(ValueError):
+            ingest.find_sources([readme])
+
+
+if __name__ == '__main__':
+    unittest.main()
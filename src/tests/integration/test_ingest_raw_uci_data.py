@@ -14,7 +14,9 @@ import unittest
 import tempfile
 import subprocess
 from pathlib import Path
+from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 
 import ingest_raw_uci_data
@@ -78,6 +80,57 @@ class IngestRawUCIDataTest(unittest.TestCase):
         expected_dataset = pd.read_csv(EXPECTED_OUTPUT3)
         self.assertTrue(expected_dataset.equals(actual_dataset))
 
+    def test_load_dataset_types(self):
+        """
+        Test that load_dataset() gives float columns with missing values as
+        NaN, and keeps the name column as strings.
+
+        """
+
+        dataset = ingest_raw_uci_data.load_dataset(TEST_DATASET1)
+        self.assertEqual(dataset.shape, (3, len(TEST_COLUMNS)))
+        self.assertEqual(tuple(dataset.columns), TEST_COLUMNS)
+        self.assertEqual(dataset['name'].dtype, object)
+        self.assertEqual(list(dataset['name']), ['name'] * 3)
+        numeric_dataset = dataset.drop(columns='name')
+        self.assertTrue((numeric_dataset.dtypes == np.float64).all())
+        self.assertEqual(list(dataset['id']), [1254, 1255, 1256])
+        self.assertTrue(dataset['pncaden'].isna().all())
+        self.assertTrue(dataset['junk'].isna().all())
+        self.assertFalse((numeric_dataset == -9).any().any())
+
+    def test_iter_dataset(self):
+        """
+        Test that iter_dataset() gives the same samples as load_dataset() for
+        any chunk size, including when samples and values span chunks.
+
+        """
+
+        dataset_path = Path(self.output_path) / 'dataset.data'
+        raw_data = TEST_DATASET2.read_bytes()
+        for content in (raw_data, raw_data.rstrip(), raw_data + b'1 2 3', b''):
+            dataset_path.write_bytes(content)
+            expected_dataset = ingest_raw_uci_data.load_dataset(dataset_path)
+            for chunk_size in (1, 5, 64, 10 ** 6):
+                datasets = list(ingest_raw_uci_data.iter_dataset(dataset_path, chunk_size))
+                actual_dataset = (pd.concat(datasets, ignore_index=True) if datasets
+                                  else expected_dataset.iloc[:0])
+
+                self.assertTrue(expected_dataset.equals(actual_dataset), chunk_size)
+
+    def test_small_chunks(self):
+        """
+        Test ingest_raw_uci_data.py when a dataset spans many chunks.
+
+        """
+
+        with patch.object(ingest_raw_uci_data, 'CHUNK_SIZE', 100):
+            ingest_raw_uci_data.main([self.output_path, str(TEST_DATASET1)])
+
+        actual_dataset = pd.read_csv((Path(self.output_path) / TEST_DATASET1.name).with_suffix('.csv'))
+        expected_dataset = pd.read_csv(EXPECTED_OUTPUT1)
+        self.assertTrue(expected_dataset.equals(actual_dataset))
+
 
 # Define setUp and tearDown functions outside of the class so that they are
 # callable from other TestCase classes.
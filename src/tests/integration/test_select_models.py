@@ -0,0 +1,71 @@
+"""
+Integration testcases for select_models.py.
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import unittest
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+import select_models
+from tests.integration.test_gen_model import IRIS_DATASET
+
+
+class SelectModelsTestCase(unittest.TestCase):
+    """
+    Test cases for select_models.main()
+
+    """
+
+    def test_model_selection_table(self):
+        """
+        Test that select_models.main() writes a model selection table with a
+        row for each combination.
+
+        """
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target = Path(temp_dir) / 'model_selection.csv'
+            exit_code = select_models.main([str(target),
+                                            str(IRIS_DATASET),
+                                            str(IRIS_DATASET),
+                                            '--models', 'lda', 'knn',
+                                            '--preprocessing', '[[], ["standard scaling"]]',
+                                            '--cross-validate', '3',
+                                            '--scoring', 'accuracy',
+                                            '--cpu', '2'])
+
+            self.assertEqual(exit_code, 0)
+            results = pd.read_csv(target, keep_default_na=False, na_values=[''])
+
+        self.assertEqual(tuple(results.columns), select_models.COLUMNS)
+        self.assertEqual(list(results['model']), ['lda', 'lda', 'knn', 'knn'])
+        self.assertEqual(list(results['preprocessing']),
+                         ['none', 'standard scaling', 'none', 'standard scaling'])
+
+        self.assertTrue((results['accuracy'] > 0.9).all())
+        self.assertTrue((results['cv informedness'] > 0.8).all())
+
+    def test_unknown_preprocessing_method(self):
+        """
+        Test that select_models.main() rejects unknown preprocessing methods.
+
+        """
+
+        with self.assertRaises(SystemExit):
+            select_models.main(['model_selection.csv',
+                                str(IRIS_DATASET),
+                                str(IRIS_DATASET),
+                                '--preprocessing', '[["scaling"]]'])
+
+
+if __name__ == '__main__':
+    unittest.main()
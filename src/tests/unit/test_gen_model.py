@@ -9,8 +9,10 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 """
 
+import os
 import unittest
 import random
+import tempfile
 from unittest.mock import patch, Mock
 
 import sklearn
@@ -127,6 +129,304 @@ class TrainModelTest(unittest.TestCase):
         self.assertTrue(model.predict(inputs).any())
 
 
+class TrainModelMultiMetricTest(unittest.TestCase):
+    """
+    Tests for gen_model.train_model() with scoring.multi_metric_scorer
+
+    """
+
+    def test_multi_metric_scorer(self):
+        """
+        Test train_model() with scoring.multi_metric_scorer and a refit metric.
+
+        """
+
+        grid = [{'model__n_neighbors': [1, 3, 5]}]
+        inputs = np.array([[-4], [-3], [-2], [-1], [1], [2], [3], [4]] * 2)
+        targets = np.array([-1, -1, -1, -1, 1, 1, 1, 1] * 2)
+        model = gen_model.train_model(sklearn.neighbors.KNeighborsClassifier,
+                                      inputs,
+                                      targets,
+                                      scoring.multi_metric_scorer,
+                                      parameter_grid=grid,
+                                      refit='informedness')
+
+        candidates = model.validation['grid_search']
+        self.assertEqual([candidate['parameters'] for candidate in candidates],
+                         [{'model__n_neighbors': 1},
+                          {'model__n_neighbors': 3},
+                          {'model__n_neighbors': 5}])
+
+        for candidate in candidates:
+            self.assertEqual(set(candidate['mean_scores']), set(scoring.scoring_methods()))
+            self.assertEqual(set(candidate['std_scores']), set(scoring.scoring_methods()))
+
+        self.assertEqual(model.get_params()['model__n_neighbors'], 1)
+        self.assertTrue((model.predict(inputs) == targets).all())
+
+    def test_no_parameter_grid(self):
+        """
+        Test that train_model() without a parameter grid gives the model
+        empty validation metadata.
+
+        """
+
+        inputs = np.array([[-4], [-3], [-2], [-1], [1], [2], [3], [4]])
+        targets = np.array([-1, -1, -1, -1, 1, 1, 1, 1])
+        model = gen_model.train_model(sklearn.neighbors.KNeighborsClassifier,
+                                      inputs,
+                                      targets,
+                                      scoring.multi_metric_scorer,
+                                      refit='accuracy')
+
+        self.assertEqual(model.validation, dict())
+
+    def test_halving_search(self):
+        """
+        Test train_model() with a halving search over the number of samples.
+
+        """
+
+        random_state = np.random.RandomState(4)
+        inputs = random_state.normal(size=(300, 2))
+        targets = (inputs[:, 0] > 0).astype(int)
+        grid = [{'model__C': [0.001, 0.01, 0.1, 1, 10, 100], 'model__kernel': ['linear', 'rbf']}]
+        model = gen_model.train_model(sklearn.svm.SVC,
+                                      inputs,
+                                      targets,
+                                      scoring.multi_metric_scorer,
+                                      parameter_grid=grid,
+                                      refit='informedness',
+                                      search='halving',
+                                      random_state=0)
+
+        candidates = model.validation['grid_search']
+        first_round = [candidate for candidate in candidates if candidate['iteration'] == 0]
+        last_round = [candidate for candidate in candidates
+                      if candidate['iteration'] == candidates[-1]['iteration']]
+
+        self.assertEqual(len(first_round), 12)
+        self.assertLess(len(last_round), len(first_round))
+        self.assertLess(first_round[0]['n_resources'], last_round[0]['n_resources'])
+        self.assertEqual(set(candidates[0]['mean_scores']), {'score'})
+        self.assertGreater(np.mean(model.predict(inputs) == targets), 0.95)
+
+    def test_halving_search_n_estimators(self):
+        """
+        Test that a halving search of an ensemble model grows n_estimators.
+
+        """
+
+        random_state = np.random.RandomState(4)
+        inputs = random_state.normal(size=(100, 2))
+        targets = (inputs[:, 0] > 0).astype(int)
+        grid = [{'model__max_depth': [1, 2, 4, None]}]
+        model = gen_model.train_model(sklearn.ensemble.RandomForestClassifier,
+                                      inputs,
+                                      targets,
+                                      scoring.multi_metric_scorer,
+                                      parameter_grid=grid,
+                                      refit='accuracy',
+                                      search='halving',
+                                      random_state=0)
+
+        candidates = model.validation['grid_search']
+        self.assertLessEqual(candidates[-1]['n_resources'], 100)
+        self.assertLess(candidates[0]['n_resources'], candidates[-1]['n_resources'])
+        self.assertEqual(candidates[0]['parameters']['model__n_estimators'],
+                         candidates[0]['n_resources'])
+
+    def test_halving_search_checkpoint(self):
+        """
+        Test that a halving search with a checkpoint gives the same scores
+        as without one.
+
+        """
+
+        random_state = np.random.RandomState(4)
+        inputs = random_state.normal(size=(100, 2))
+        targets = (inputs[:, 0] > 0).astype(int)
+        grid = [{'model__n_neighbors': [1, 3, 5, 7]}]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            models = [gen_model.train_model(sklearn.neighbors.KNeighborsClassifier,
+                                            inputs,
+                                            targets,
+                                            scoring.multi_metric_scorer,
+                                            parameter_grid=grid,
+                                            refit='informedness',
+                                            search='halving',
+                                            random_state=0,
+                                            checkpoint=checkpoint)
+                      for checkpoint in (None, os.path.join(temp_dir, 'checkpoint.db'))]
+
+        for expected, candidate in zip(*(model.validation['grid_search'] for model in models)):
+            self.assertFalse(np.isnan(candidate['mean_scores']['score']))
+            self.assertEqual(candidate['mean_scores'], expected['mean_scores'])
+
+    def test_random_and_bayesian_search(self):
+        """
+        Test train_model() with random and bayesian searches over
+        distributions.
+
+        """
+
+        random_state = np.random.RandomState(4)
+        inputs = random_state.normal(size=(100, 2))
+        targets = (inputs[:, 0] > 0).astype(int)
+        grid = [{'model__C': {'loguniform': [0.001, 1000]}, 'model__kernel': ['linear', 'rbf']}]
+        for search in ('random', 'bayesian'):
+            model = gen_model.train_model(sklearn.svm.SVC,
+                                          inputs,
+                                          targets,
+                                          scoring.multi_metric_scorer,
+                                          parameter_grid=grid,
+                                          refit='informedness',
+                                          search=search,
+                                          n_iter=12,
+                                          random_state=0)
+
+            candidates = model.validation['grid_search']
+            self.assertEqual(len(candidates), 12)
+            self.assertEqual(len({candidate['parameters']['model__C'] for candidate in candidates}), 12)
+            best_informedness = max(candidate['mean_scores']['informedness'] for candidate in candidates)
+            self.assertIn(model.get_params()['model__C'],
+                          [candidate['parameters']['model__C'] for candidate in candidates
+                           if candidate['mean_scores']['informedness'] == best_informedness])
+
+    def test_pipeline_cache(self):
+        """
+        Test that train_model() with a pipeline cache fits each
+        preprocessing step once per fold, evicts cached steps to stay under
+        pipeline_cache_size, and does not save the cache with the model.
+
+        """
+
+        random_state = np.random.RandomState(4)
+        inputs = random_state.normal(size=(100, 4))
+        targets = (inputs[:, 0] > 0).astype(int)
+        grid = [{'model__n_neighbors': [1, 3, 5, 7]}]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            def count_cached_steps():
+                return sum(filenames.count('output.pkl') for _, _, filenames in os.walk(cache_dir))
+
+            model = gen_model.train_model(sklearn.neighbors.KNeighborsClassifier,
+                                          inputs,
+                                          targets,
+                                          scoring.multi_metric_scorer,
+                                          preprocessing_methods=[util.PREPROCESSING_METHODS['standard scaling']],
+                                          parameter_grid=grid,
+                                          refit='accuracy',
+                                          pipeline_cache=cache_dir)
+
+            # One fit for each of the 5 folds and one for the refit.
+            self.assertEqual(count_cached_steps(), 6)
+            self.assertIsNone(model.memory)
+            self.assertEqual(len(model.validation['grid_search']), 4)
+
+            gen_model.train_model(sklearn.neighbors.KNeighborsClassifier,
+                                  inputs,
+                                  targets,
+                                  scoring.multi_metric_scorer,
+                                  preprocessing_methods=[util.PREPROCESSING_METHODS['standard scaling']],
+                                  parameter_grid=grid,
+                                  refit='accuracy',
+                                  pipeline_cache=cache_dir,
+                                  pipeline_cache_size=0)
+
+            self.assertEqual(count_cached_steps(), 0)
+
+    def test_pipeline_cache_is_bounded_during_search(self):
+        """
+        Test that train_model() evicts steps from the pipeline cache after
+        every fold of a search is scored, not only once training is done.
+
+        """
+
+        random_state = np.random.RandomState(4)
+        inputs = random_state.normal(size=(100, 4))
+        targets = (inputs[:, 0] > 0).astype(int)
+        grid = [{'model__n_neighbors': [1, 3, 5, 7]}]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with patch('joblib.Memory.reduce_size') as reduce_size:
+                gen_model.train_model(sklearn.neighbors.KNeighborsClassifier,
+                                      inputs,
+                                      targets,
+                                      scoring.multi_metric_scorer,
+                                      preprocessing_methods=[util.PREPROCESSING_METHODS['standard scaling']],
+                                      parameter_grid=grid,
+                                      refit='accuracy',
+                                      pipeline_cache=cache_dir)
+
+        # Once for each of the 4 candidates in each of the 5 folds, and once
+        # after the refit.
+        self.assertEqual(reduce_size.call_count, 21)
+
+    def test_warm_start(self):
+        """
+        Test that train_model() with warm_start gives the same results as
+        without it when growing a forest with a fixed random_state.
+
+        """
+
+        random_state = np.random.RandomState(5)
+        inputs = random_state.normal(size=(100, 4))
+        targets = (inputs[:, 0] + random_state.normal(size=100) > 0).astype(int)
+        grid = [{'model__n_estimators': [5, 10, 20], 'model__random_state': [0]}]
+        models = [gen_model.train_model(sklearn.ensemble.RandomForestClassifier,
+                                        inputs,
+                                        targets,
+                                        scoring.multi_metric_scorer,
+                                        parameter_grid=grid,
+                                        refit='accuracy',
+                                        warm_start=warm_start)
+                  for warm_start in (False, True)]
+
+        self.assertEqual(models[0].get_params()['model__n_estimators'],
+                         models[1].get_params()['model__n_estimators'])
+
+        self.assertFalse(models[1].get_params()['model__warm_start'])
+        for expected, candidate in zip(*(model.validation['grid_search'] for model in models)):
+            self.assertEqual(candidate['parameters'], expected['parameters'])
+            self.assertEqual(candidate['mean_scores']['accuracy'], expected['mean_scores']['accuracy'])
+
+
+class BestCandidateTest(unittest.TestCase):
+    """
+    Tests for gen_model.best_candidate()
+
+    """
+
+    def test_maximize(self):
+        """
+        Test that best_candidate() maximizes metrics where higher is better
+        and skips undefined scores.
+
+        """
+
+        cv_results = {'mean_test_informedness': np.array([0.2, np.nan, 0.6, 0.6, 0.1])}
+        self.assertEqual(gen_model.best_candidate(cv_results, 'informedness'), 2)
+
+    def test_minimize(self):
+        """
+        Test that best_candidate() minimizes metrics in LOWER_IS_BETTER.
+
+        """
+
+        cv_results = {'mean_test_lr_minus': np.array([0.2, np.nan, 0.6, 0.1])}
+        self.assertEqual(gen_model.best_candidate(cv_results, 'lr_minus'), 3)
+
+    def test_undefined(self):
+        """
+        Test that best_candidate() raises ValueError when the metric is
+        undefined for every candidate.
+
+        """
+
+        cv_results = {'mean_test_sensitivity': np.array([np.nan, np.nan])}
+        with self.assertRaises(ValueError):
+            gen_model.best_candidate(cv_results, 'sensitivity')
+
+
 class CrossValidateTest(unittest.TestCase):
     """
     Tests for gen_model.cross_validate()
@@ -386,6 +686,200 @@ class CrossValidateTest(unittest.TestCase):
 
             self.assertAlmostEqual(score_a, score_b)
 
+    def test_parallel_folds(self):
+        """
+        Test that cross_validate() gives the same scores with multiple
+        processes as with one.
+
+        """
+
+        random_state = np.random.RandomState(2)
+        inputs = random_state.normal(size=(120, 3))
+        targets = (inputs[:, 0] + random_state.normal(size=120) > 0).astype(int)
+        datasets = util.Datasets(util.Dataset(inputs[:80], targets[:80]),
+                                 util.Dataset(inputs[80:], targets[80:]),
+                                 ['x', 'y', 'z'])
+
+        model = sklearn.discriminant_analysis.LinearDiscriminantAnalysis()
+        serial_scores = gen_model.cross_validate(model, datasets, 6)
+        parallel_scores = gen_model.cross_validate(model, datasets, 6, cpus=2)
+        for serial, parallel in zip(serial_scores, parallel_scores):
+            self.assertEqual(list(serial), list(parallel))
+            for metric, score in serial.items():
+                self.assertTrue(np.array_equal(score, parallel[metric], equal_nan=True))
+
+    def test_repeated_stratified(self):
+        """
+        Test that cross_validate() with repeats scores every fold of every
+        repeat, and stops early once the standard error is below tolerance.
+
+        """
+
+        random_state = np.random.RandomState(2)
+        inputs = random_state.normal(size=(120, 3))
+        targets = (inputs[:, 0] + random_state.normal(size=120) > 0).astype(int)
+        datasets = util.Datasets(util.Dataset(inputs[:80], targets[:80]),
+                                 util.Dataset(inputs[80:], targets[80:]),
+                                 ['x', 'y', 'z'])
+
+        model = sklearn.discriminant_analysis.LinearDiscriminantAnalysis()
+        mean_scores, _ = gen_model.cross_validate(model, datasets, 4,
+                                                  n_repeats=3,
+                                                  stratified=True,
+                                                  random_state=1)
+
+        folds = sklearn.model_selection.RepeatedStratifiedKFold(n_splits=4, n_repeats=3, random_state=1)
+        accuracies = [scoring.score_model(sklearn.clone(model).fit(inputs[train], targets[train]),
+                                          inputs[test],
+                                          targets[test])['accuracy']
+                      for train, test in folds.split(inputs, targets)]
+
+        self.assertAlmostEqual(mean_scores['accuracy'], np.mean(accuracies))
+
+        with self.assertLogs('gen_model', level='INFO') as logs:
+            early_scores, _ = gen_model.cross_validate(model, datasets, 4,
+                                                       n_repeats=3,
+                                                       stratified=True,
+                                                       random_state=1,
+                                                       tolerance=1,
+                                                       target_metric='accuracy')
+
+        self.assertIn('stopped after 2 repeats', logs.output[0])
+        self.assertAlmostEqual(early_scores['accuracy'], np.mean(accuracies[:8]))
+
+
+class CrossValidationSplitsTest(unittest.TestCase):
+    """
+    Tests for gen_model.cross_validation_splits()
+
+    """
+
+    def test_kfold(self):
+        """
+        Test that a single unstratified repeat is an unshuffled KFold.
+
+        """
+
+        targets = np.arange(10) % 2
+        repeats = list(gen_model.cross_validation_splits(targets, 5, random_state=3))
+        self.assertEqual(len(repeats), 1)
+        for (_, testing_index), expected in zip(repeats[0], np.split(np.arange(10), 5)):
+            self.assertTrue(np.array_equal(testing_index, expected))
+
+    def test_stratified(self):
+        """
+        Test that stratified splits preserve the class proportions and are
+        reproducible.
+
+        """
+
+        targets = np.array([0] * 20 + [1] * 10)
+        repeats = list(gen_model.cross_validation_splits(targets, 5, 2, stratified=True, random_state=3))
+        self.assertEqual([len(splits) for splits in repeats], [5, 5])
+        for splits in repeats:
+            for _, testing_index in splits:
+                self.assertEqual(np.sum(targets[testing_index] == 1), 2)
+
+        self.assertFalse(np.array_equal(repeats[0][0][1], repeats[1][0][1]))
+        repeats_again = list(gen_model.cross_validation_splits(targets, 5, 2, stratified=True, random_state=3))
+        self.assertTrue(np.array_equal(repeats[1][4][0], repeats_again[1][4][0]))
+
+
+class NestedCrossValidateTest(unittest.TestCase):
+    """
+    Tests for gen_model.nested_cross_validate()
+
+    """
+
+    def setUp(self):
+        random_state = np.random.RandomState(6)
+        inputs = random_state.normal(size=(90, 3))
+        targets = (inputs[:, 0] + random_state.normal(size=90) > 0).astype(int)
+        self.datasets = util.Datasets(training=util.Dataset(inputs=inputs[:60], targets=targets[:60]),
+                                      validation=util.Dataset(inputs=inputs[60:], targets=targets[60:]),
+                                      columns=None)
+
+        self.inputs = inputs
+        self.targets = targets
+        self.grid = [{'model__n_neighbors': [1, 5, 15, 29]}]
+
+    def test_nested_cross_validate(self):
+        """
+        Test that nested_cross_validate() searches on the training part of
+        each outer fold and scores the selected model on the testing part,
+        with the same results in parallel as serially.
+
+        """
+
+        results = [gen_model.nested_cross_validate(sklearn.neighbors.KNeighborsClassifier,
+                                                   self.datasets,
+                                                   4,
+                                                   3,
+                                                   scoring.multi_metric_scorer,
+                                                   cpus=cpus,
+                                                   stratified=True,
+                                                   random_state=2,
+                                                   parameter_grid=self.grid,
+                                                   refit='informedness')
+                   for cpus in (1, 3)]
+
+        mean_scores, std_scores, selected_parameters = results[0]
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(len(selected_parameters), 4)
+
+        splits = next(gen_model.cross_validation_splits(self.targets, 4, stratified=True, random_state=2))
+        fold_scores = []
+        for (training_index, testing_index), parameters in zip(splits, selected_parameters):
+            model = gen_model.train_model(sklearn.neighbors.KNeighborsClassifier,
+                                          self.inputs[training_index],
+                                          self.targets[training_index],
+                                          scoring.multi_metric_scorer,
+                                          parameter_grid=self.grid,
+                                          refit='informedness',
+                                          cv=3)
+
+            self.assertEqual(parameters, {'model__n_neighbors': model.get_params()['model__n_neighbors']})
+            fold_scores.append(scoring.score_model(model,
+                                                   self.inputs[testing_index],
+                                                   self.targets[testing_index]))
+
+        self.assertAlmostEqual(mean_scores['informedness'],
+                               np.mean([scores['informedness'] for scores in fold_scores]))
+
+        self.assertAlmostEqual(std_scores['accuracy'],
+                               np.std([scores['accuracy'] for scores in fold_scores]))
+
+    def test_without_parameter_grid(self):
+        """
+        Test that nested_cross_validate() without a parameter grid selects no
+        hyperparameters.
+
+        """
+
+        mean_scores, _, selected_parameters = gen_model.nested_cross_validate(
+            sklearn.discriminant_analysis.LinearDiscriminantAnalysis,
+            self.datasets,
+            3,
+            2,
+            scoring.multi_metric_scorer,
+        )
+
+        self.assertEqual(selected_parameters, [{}, {}, {}])
+        self.assertIn('accuracy', mean_scores)
+
+    def test_selected_parameter_counts(self):
+        """
+        Test that selected_parameter_counts() counts each selected value,
+        most common first.
+
+        """
+
+        counts = gen_model.selected_parameter_counts([{'a': 1, 'b': [2]},
+                                                      {'a': 3, 'b': [2]},
+                                                      {'a': 3, 'b': [4]}])
+
+        self.assertEqual(counts, {'a': [(3, 2), (1, 1)], 'b': [('[2]', 2), ('[4]', 1)]})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,179 @@
+"""
+Unit tests for hyperparameter_search.py
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import unittest
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+import hyperparameter_search
+
+
+class QuadraticModel(BaseEstimator, ClassifierMixin):
+    """
+    A fake estimator whose score is highest when x is 2 and kind is 'b'.
+
+    """
+
+    def __init__(self, x=0.0, kind='a'):
+        self.x = x
+        self.kind = kind
+
+    def fit(self, inputs, targets):
+        return self
+
+    def score(self, inputs, targets):
+        return -(np.log10(self.x) - np.log10(2)) ** 2 - (self.kind != 'b')
+
+
+class ParseDistributionsTestCase(unittest.TestCase):
+    """
+    Tests for hyperparameter_search.parse_distributions
+
+    """
+
+    def test_distributions(self):
+        """
+        Test that each distribution is converted with inclusive bounds.
+
+        """
+
+        grid = hyperparameter_search.parse_distributions({
+            'a': {'uniform': [2, 5]},
+            'b': {'loguniform': [0.001, 1000]},
+            'c': {'randint': [1, 3]},
+            'd': ['x', 'y'],
+        })
+
+        self.assertEqual(len(grid), 1)
+        self.assertEqual(grid[0]['a'].support(), (2, 5))
+        self.assertEqual(grid[0]['b'].support(), (0.001, 1000))
+        self.assertEqual(set(grid[0]['c'].rvs(size=200, random_state=1)), {1, 2, 3})
+        self.assertEqual(grid[0]['d'], ['x', 'y'])
+
+    def test_invalid_distributions(self):
+        """
+        Test that unknown distributions and invalid bounds raise ValueError.
+
+        """
+
+        with self.assertRaises(ValueError):
+            hyperparameter_search.parse_distributions([{'a': {'normal': [0, 1]}}])
+
+        with self.assertRaises(ValueError):
+            hyperparameter_search.parse_distributions([{'a': {'uniform': [1, 0]}}])
+
+        with self.assertRaises(ValueError):
+            hyperparameter_search.parse_distributions([{'a': {'uniform': [0, 1, 2]}}])
+
+
+class BayesianSearchCVTestCase(unittest.TestCase):
+    """
+    Tests for hyperparameter_search.BayesianSearchCV
+
+    """
+
+    def setUp(self):
+        self.inputs = np.zeros((20, 1))
+        self.targets = np.arange(20) % 2
+        self.distributions = hyperparameter_search.parse_distributions({
+            'x': {'loguniform': [0.001, 1000]},
+            'kind': ['a', 'b'],
+        })
+
+    def test_finds_optimum(self):
+        """
+        Test that the search converges on the optimum, and that it finds a
+        better candidate than random search with the same budget.
+
+        """
+
+        search = hyperparameter_search.BayesianSearchCV(QuadraticModel(),
+                                                        self.distributions,
+                                                        n_iter=25,
+                                                        random_state=0)
+
+        search.fit(self.inputs, self.targets)
+        self.assertEqual(len(search.cv_results_['params']), 25)
+        self.assertEqual(search.best_params_['kind'], 'b')
+        self.assertAlmostEqual(search.best_params_['x'], 2, delta=0.5)
+
+        initial_scores = search.cv_results_['mean_test_score'][:10]
+        self.assertGreater(search.best_score_, np.max(initial_scores))
+
+    def test_parallel_batches(self):
+        """
+        Test that a parallel search evaluates distinct candidates in batches
+        and gives the same candidates every time.
+
+        """
+
+        results = []
+        for _ in range(2):
+            search = hyperparameter_search.BayesianSearchCV(QuadraticModel(),
+                                                            self.distributions,
+                                                            n_iter=16,
+                                                            n_initial_points=4,
+                                                            n_jobs=3,
+                                                            random_state=0)
+
+            search.fit(self.inputs, self.targets)
+            results.append(search.cv_results_['params'])
+
+        self.assertEqual(len(results[0]), 16)
+        self.assertEqual(len({repr(sorted(params.items())) for params in results[0]}), 16)
+        self.assertEqual(results[0], results[1])
+
+    def test_minimize(self):
+        """
+        Test that the search minimizes the metric when greater_is_better is
+        False.
+
+        """
+
+        def scorer(estimator, inputs, targets):
+            return dict(loss=-estimator.score(inputs, targets))
+
+        search = hyperparameter_search.BayesianSearchCV(QuadraticModel(),
+                                                        self.distributions,
+                                                        n_iter=20,
+                                                        scoring=scorer,
+                                                        refit=False,
+                                                        metric='loss',
+                                                        greater_is_better=False,
+                                                        random_state=0)
+
+        search.fit(self.inputs, self.targets)
+        losses = search.cv_results_['mean_test_loss']
+        best_params = search.cv_results_['params'][int(np.argmin(losses))]
+        self.assertEqual(best_params['kind'], 'b')
+        self.assertLess(np.min(losses), np.min(losses[:10]))
+
+    def test_exhausted_grid(self):
+        """
+        Test that the search stops when every candidate in a grid of lists
+        has been evaluated.
+
+        """
+
+        search = hyperparameter_search.BayesianSearchCV(QuadraticModel(),
+                                                        {'x': [1, 2, 3], 'kind': ['a', 'b']},
+                                                        n_iter=20,
+                                                        n_initial_points=2,
+                                                        random_state=0)
+
+        search.fit(self.inputs, self.targets)
+        self.assertEqual(len(search.cv_results_['params']), 6)
+        self.assertEqual(search.best_params_, {'x': 2, 'kind': 'b'})
+
+
+if __name__ == '__main__':
+    unittest.main()
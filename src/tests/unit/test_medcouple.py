@@ -0,0 +1,81 @@
+"""
+Unit tests for medcouple.py
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import unittest
+
+import numpy as np
+from scipy import stats
+from statsmodels.stats import stattools
+
+from medcouple import medcouple
+
+
+class MedcoupleTestCase(unittest.TestCase):
+    """
+    Tests for medcouple.medcouple
+
+    """
+
+    def test_matches_statsmodels(self):
+        """
+        Test that medcouple matches statsmodels on samples of odd and even
+        length from symmetric and skewed distributions.
+
+        """
+
+        for size in (2, 3, 10, 51, 200, 1001):
+            for dist in (stats.norm, stats.expon, stats.chi2(df=2)):
+                y = dist.rvs(size=size, random_state=size)
+                self.assertAlmostEqual(medcouple(y), stattools.medcouple(y), places=12)
+
+    def test_matches_statsmodels_with_ties(self):
+        """
+        Test that medcouple matches statsmodels on samples with many values
+        tied with the median.
+
+        """
+
+        for seed in range(50):
+            y = np.random.RandomState(seed).randint(0, 4, size=seed + 2)
+            self.assertAlmostEqual(medcouple(y), stattools.medcouple(y), places=12)
+
+        self.assertEqual(medcouple(np.ones(10)), 0)
+
+    def test_nan_and_empty(self):
+        """
+        Test that medcouple is NaN for samples that contain NaN and for empty
+        samples, like statsmodels.
+
+        """
+
+        y = np.array([2, np.nan, 3, 4, 7])
+        self.assertTrue(np.isnan(stattools.medcouple(y)))
+        self.assertTrue(np.isnan(medcouple(y)))
+        self.assertTrue(np.isnan(medcouple(np.full(4, np.nan))))
+        self.assertTrue(np.isnan(medcouple(np.array([]))))
+        x = np.column_stack([[1, 2, 3, 10], [1, np.nan, 3, 10]])
+        result = medcouple(x)
+        self.assertAlmostEqual(result[0], stattools.medcouple(x[:, 0]), places=12)
+        self.assertTrue(np.isnan(result[1]))
+
+    def test_axis(self):
+        """
+        Test that medcouple computes the medcouple along the given axis.
+
+        """
+
+        x = np.reshape(stats.chi2.rvs(df=3, size=1500, random_state=1), (300, 5))
+        self.assertEqual(medcouple(x).shape, (5,))
+        self.assertTrue(np.allclose(medcouple(x), stattools.medcouple(x), rtol=0, atol=1e-12))
+        self.assertTrue(np.allclose(medcouple(x.T, axis=1), medcouple(x), rtol=0, atol=1e-12))
+        self.assertAlmostEqual(medcouple(x, axis=None),
+                               stattools.medcouple(x, axis=None),
+                               places=12)
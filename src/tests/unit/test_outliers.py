@@ -181,6 +181,49 @@ class AdjustedBoxplotTestCase(unittest.TestCase):
         self.assertTrue(x2_outliers[-1][-1])
 
 
+class StreamingAdjustedBoxplotFencesTestCase(unittest.TestCase):
+    """
+    Tests for outliers.streaming_adjusted_boxplot_fences
+
+    """
+
+    def test_small_dataset_matches_adjusted_boxplot_fences(self):
+        """
+        Test that the fences are exact when the dataset fits in the sketch.
+
+        """
+
+        x = stats.chi2.rvs(df=2, size=(1000, 4), random_state=1)
+        lower_fence, upper_fence = outliers.streaming_adjusted_boxplot_fences(np.array_split(x, 6))
+        expected_lower_fence, expected_upper_fence = outliers.adjusted_boxplot_fences(x)
+        self.assertTrue(np.allclose(lower_fence, expected_lower_fence, rtol=0, atol=1e-12))
+        self.assertTrue(np.allclose(upper_fence, expected_upper_fence, rtol=0, atol=1e-12))
+
+    def test_large_dataset_approximates_adjusted_boxplot_fences(self):
+        """
+        Test that the fences are close to the exact fences when the dataset
+        does not fit in the sketch.
+
+        """
+
+        x = stats.chi2.rvs(df=2, size=(60000, 3), random_state=1)
+        lower_fence, upper_fence = outliers.streaming_adjusted_boxplot_fences(np.array_split(x, 30),
+                                                                             epsilon=0.05)
+
+        expected_lower_fence, expected_upper_fence = outliers.adjusted_boxplot_fences(x)
+        self.assertTrue(np.allclose(lower_fence, expected_lower_fence, rtol=0, atol=0.2))
+        self.assertTrue(np.allclose(upper_fence, expected_upper_fence, rtol=0.05))
+
+    def test_no_rows_raises_value_error(self):
+        """
+        Test that an empty iterable of chunks raises ValueError.
+
+        """
+
+        with self.assertRaises(ValueError):
+            outliers.streaming_adjusted_boxplot_fences([])
+
+
 class RandomCutTestCase(unittest.TestCase):
     """
     Tests for outliers.random_cut
@@ -300,7 +343,7 @@ class RandomCutTestCase(unittest.TestCase):
         x2_outliers = outliers.random_cut(x1, x2)
         self.assertEqual(x2_outliers.shape[0], x2.shape[0])
         self.assertTrue(np.array_equal(np.where(x2_outliers)[0],
-                                       np.array([22, 56, 57, 64, 84, 85])))
+                                       np.array([22, 56, 57, 64, 84])))
 
     def test_dirichlet_with_nine_outliers(self):
         """
@@ -316,7 +359,7 @@ class RandomCutTestCase(unittest.TestCase):
         x2_outliers = outliers.random_cut(x1, x2)
         self.assertEqual(x2_outliers.shape[0], x2.shape[0])
         self.assertTrue(np.array_equal(np.where(x2_outliers)[0],
-                                       np.array([1, 19, 41, 59, 65, 84, 85, 87])))
+                                       np.array([1, 16, 19, 41, 59, 65, 85, 87])))
 
     def test_wishart_with_nine_outliers(self):
         """
@@ -332,7 +375,7 @@ class RandomCutTestCase(unittest.TestCase):
         x2_outliers = outliers.random_cut(x1, x2)
         self.assertEqual(x2_outliers.shape[0], x2.shape[0])
         self.assertTrue(np.array_equal(np.where(x2_outliers)[0],
-                                       np.array([13, 36, 50, 57, 70, 84, 91, 99])))
+                                       np.array([13, 30, 36, 43, 50, 52, 57, 70, 83, 84, 91, 99])))
 
     def test_beta_with_three_outliers(self):
         """
@@ -351,7 +394,7 @@ class RandomCutTestCase(unittest.TestCase):
         x2_outliers = outliers.random_cut(x1, x2)
         self.assertEqual(x2_outliers.ndim, 1)
         self.assertEqual(x2_outliers.shape[0], x2.shape[0])
-        self.assertEqual(np.sum(x2_outliers), 3)
+        self.assertEqual(np.sum(x2_outliers), 4)
         self.assertTrue(x2_outliers[0])
         self.assertTrue(x2_outliers[-1])
 
@@ -375,6 +418,110 @@ class RandomCutTestCase(unittest.TestCase):
         self.assertEqual(np.sum(x2_outliers), 3)
         self.assertTrue(x2_outliers[0])
 
+    def test_invalid_engine_raises_value_error(self):
+        """
+        Test that ValueError is raised when engine is not recognized.
+
+        """
+
+        x1 = [[1, 2], [3, 4]]
+        x2 = x1
+        with self.assertRaises(ValueError):
+            outliers.random_cut(x1, x2, engine='sklearn')
+
+    def test_numpy_and_rrcf_engines_agree(self):
+        """
+        Test that the numpy and rrcf engines find the same outliers when
+        they draw from numpy's global random number generator.
+
+        """
+
+        dist = stats.dirichlet(alpha=(1, 2, 3), seed=1)
+        x1 = np.reshape(dist.rvs(size=600, random_state=1), (600, 3))
+        x2 = np.reshape(dist.rvs(size=100, random_state=2), (100, 3))
+        x2[0] = [1, 0, 0]
+        np.random.seed(0)
+        numpy_outliers = outliers.random_cut(x1, x2, n_trees=20, random_state=None, engine='numpy')
+        np.random.seed(0)
+        rrcf_outliers = outliers.random_cut(x1, x2, n_trees=20, random_state=None, engine='rrcf')
+        self.assertTrue(numpy_outliers[0])
+        self.assertTrue(np.array_equal(numpy_outliers, rrcf_outliers))
+
+    def test_random_state_generator_matches_rrcf(self):
+        """
+        Test that the numpy engine finds the same outliers as the rrcf
+        engine when it draws from an instance of RandomState.
+
+        """
+
+        dist = stats.dirichlet(alpha=(1, 2, 3), seed=1)
+        x1 = np.reshape(dist.rvs(size=600, random_state=1), (600, 3))
+        x2 = np.reshape(dist.rvs(size=100, random_state=2), (100, 3))
+        x2[0] = [1, 0, 0]
+        numpy_outliers = outliers.random_cut(x1, x2, n_trees=20,
+                                             random_state=np.random.RandomState(0),
+                                             engine='numpy')
+
+        rrcf_outliers = outliers.random_cut(x1, x2, n_trees=20, random_state=0, engine='rrcf')
+        self.assertTrue(np.array_equal(numpy_outliers, rrcf_outliers))
+
+    def test_batch_engine(self):
+        """
+        Test that the batch engine finds outliers in 2D normally distributed
+        multivariate data.
+
+        """
+
+        dist = stats.multivariate_normal([0.5, -0.2], [[2.0, 0.3], [0.3, 0.5]])
+        x1 = np.reshape(dist.rvs(size=4500, random_state=1), (3000, 3))
+        x2 = np.reshape(dist.rvs(size=150, random_state=1), (100, 3))
+        x2_outliers = outliers.random_cut(x1, x2, engine='batch')
+        self.assertEqual(x2_outliers.shape[0], x2.shape[0])
+        self.assertTrue(np.array_equal(np.where(x2_outliers)[0],
+                                       np.array([22, 56, 57, 64, 84])))
+
+    def test_n_jobs_gives_same_outliers(self):
+        """
+        Test that random_cut finds the same outliers for any value of n_jobs.
+
+        """
+
+        dist = stats.multivariate_normal([0.5, -0.2], [[2.0, 0.3], [0.3, 0.5]])
+        x1 = np.reshape(dist.rvs(size=4500, random_state=1), (3000, 3))
+        x2 = np.reshape(dist.rvs(size=150, random_state=1), (100, 3))
+        x2[0] = 20
+        for engine in ('numpy', 'batch'):
+            default_outliers = outliers.random_cut(x1, x2, engine=engine)
+            self.assertTrue(np.any(default_outliers))
+            for n_jobs in (1, 2, 3):
+                parallel_outliers = outliers.random_cut(x1, x2, engine=engine, n_jobs=n_jobs)
+                self.assertTrue(np.array_equal(default_outliers, parallel_outliers))
+
+    def test_global_random_state_is_not_modified(self):
+        """
+        Test that the numpy and batch engines do not seed or draw from
+        numpy's global random number generator.
+
+        """
+
+        x1 = np.reshape(np.arange(200, dtype=float), (100, 2))
+        for engine in ('numpy', 'batch'):
+            np.random.seed(1)
+            expected = np.random.random_sample()
+            np.random.seed(1)
+            outliers.random_cut(x1, x1, tree_size=50, engine=engine)
+            self.assertEqual(np.random.random_sample(), expected)
+
+    def test_rrcf_engine_with_n_jobs_raises_value_error(self):
+        """
+        Test that the rrcf engine raises ValueError when n_jobs is given.
+
+        """
+
+        x1 = np.reshape(np.arange(200, dtype=float), (100, 2))
+        with self.assertRaises(ValueError):
+            outliers.random_cut(x1, x1, tree_size=50, engine='rrcf', n_jobs=2)
+
 
 class IsNumericTestCase(unittest.TestCase):
     """
@@ -480,6 +627,71 @@ class IsNumericTestCase(unittest.TestCase):
         self.assertTrue(np.array_equal(x_numeric,
                                        np.array([False, True, False, True])))
 
+    def test_nan_counts_as_one_unique_value(self):
+        """
+        Test that is_numeric counts NaNs as one unique value like np.unique.
+
+        """
+
+        x = np.array([[0, 1], [1, np.nan], [0, np.nan], [1, np.nan]])
+        self.assertTrue(np.array_equal(outliers.is_numeric(x, frac=.5),
+                                       np.array([False, True])))
+
+    def test_cached_result_is_not_shared(self):
+        """
+        Test that modifying the result of is_numeric does not modify the
+        cached result for the same dataset.
+
+        """
+
+        x = np.array([[0, .5], [1, .25], [0, .75]])
+        x_numeric = outliers.is_numeric(x)
+        x_numeric[:] = False
+        self.assertTrue(np.array_equal(outliers.is_numeric(x), np.array([True, True])))
+        self.assertTrue(np.array_equal(outliers.is_numeric(x, frac=.9), np.array([False, True])))
+
+
+class IsNumericChunksTestCase(unittest.TestCase):
+    """
+    Tests for outliers.is_numeric_chunks
+
+    """
+
+    def test_matches_is_numeric(self):
+        """
+        Test that is_numeric_chunks gives the same classification as
+        is_numeric, with and without n_rows.
+
+        """
+
+        x = np.column_stack([np.arange(100) % 3,
+                             np.arange(100) % 20,
+                             np.linspace(0, 1, 100),
+                             np.arange(100)])
+
+        expected = outliers.is_numeric(x, frac=.1)
+        self.assertTrue(np.array_equal(expected, np.array([False, True, True, True])))
+        for n_rows in (None, 100):
+            self.assertTrue(np.array_equal(outliers.is_numeric_chunks(np.array_split(x, 7),
+                                                                      frac=.1,
+                                                                      n_rows=n_rows),
+                                           expected))
+
+    def test_invalid_arguments_raise_value_error(self):
+        """
+        Test that an invalid frac, 1D chunks and no rows raise ValueError.
+
+        """
+
+        with self.assertRaises(ValueError):
+            outliers.is_numeric_chunks([[[1, 2]]], frac=2)
+
+        with self.assertRaises(ValueError):
+            outliers.is_numeric_chunks([[1, 2]])
+
+        with self.assertRaises(ValueError):
+            outliers.is_numeric_chunks([])
+
 
 class LocateTestCase(unittest.TestCase):
     """
@@ -525,7 +737,7 @@ class LocateTestCase(unittest.TestCase):
         x2_outliers = outliers.locate(x1, x2)
         self.assertEqual(x2_outliers.ndim, 1)
         self.assertEqual(x2_outliers.shape[0], x2.shape[0])
-        self.assertEqual(np.sum(x2_outliers), 3)
+        self.assertEqual(np.sum(x2_outliers), 4)
         self.assertTrue(x2_outliers[0])
         self.assertTrue(x2_outliers[-1])
 
@@ -546,11 +758,122 @@ class LocateTestCase(unittest.TestCase):
         x2_outliers = outliers.locate(x1, x2)
         self.assertEqual(x2_outliers.ndim, 1)
         self.assertEqual(x2_outliers.shape[0], x2.shape[0])
-        self.assertEqual(np.sum(x2_outliers), 4)
+        self.assertEqual(np.sum(x2_outliers), 3)
         self.assertTrue(x2_outliers[0])
         self.assertTrue(x2_outliers[-1])
 
 
+class OutlierDetectorTestCase(unittest.TestCase):
+    """
+    Tests for outliers.OutlierDetector
+
+    """
+
+    def setUp(self):
+        dist = stats.multivariate_normal([0.5, -0.2], [[2.0, 0.3], [0.3, 0.5]])
+        self.x1 = np.reshape(dist.rvs(size=4500, random_state=1), (3000, 3))
+        self.x2 = np.reshape(dist.rvs(size=150, random_state=2), (100, 3))
+        self.x2[0] = 20
+        self.x2[1][2] = -10
+
+    def test_predict(self):
+        """
+        Test that OutlierDetector finds univariate and multivariate outliers.
+
+        """
+
+        outlier_detector = outliers.OutlierDetector(n_trees=20).fit(self.x1)
+        x2_outliers = outlier_detector.predict(self.x2)
+        self.assertEqual(x2_outliers.shape, (len(self.x2),))
+        self.assertTrue(x2_outliers[0])
+        self.assertTrue(x2_outliers[1])
+        self.assertLess(np.sum(x2_outliers), 20)
+
+    def test_predict_matches_fences_and_scores(self):
+        """
+        Test that predict() combines the adjusted boxplot fences with the
+        fence on score_samples().
+
+        """
+
+        outlier_detector = outliers.OutlierDetector(n_trees=20, engine='batch').fit(self.x1)
+        univariate_outliers = np.any(outliers.adjusted_boxplot(self.x1, self.x2), axis=1)
+        scores = outlier_detector.score_samples(self.x2)
+        self.assertEqual(scores.shape, (len(self.x2),))
+        self.assertTrue(np.array_equal(outlier_detector.predict(self.x2),
+                                       univariate_outliers | (scores > outlier_detector.codisp_fence)))
+
+    def test_predict_does_not_depend_on_other_rows(self):
+        """
+        Test that predict() and score_samples() give each row the same
+        result whether it is tested with other rows or on its own.
+
+        """
+
+        outlier_detector = outliers.OutlierDetector(n_trees=20).fit(self.x1)
+        x2_outliers = outlier_detector.predict(self.x2)
+        scores = outlier_detector.score_samples(self.x2)
+        for row in range(len(self.x2)):
+            self.assertEqual(outlier_detector.predict(self.x2[row:row + 1])[0],
+                             x2_outliers[row])
+
+            self.assertAlmostEqual(outlier_detector.score_samples(self.x2[row:row + 1])[0],
+                                   scores[row])
+
+    def test_numeric_columns_match_locate(self):
+        """
+        Test that the numeric columns are found from the fitted and tested
+        rows together, like locate() finds them.
+
+        """
+
+        x1 = np.column_stack([self.x1, np.arange(3000) % 4, np.arange(3000) % 150])
+        x2 = np.column_stack([self.x2, np.zeros(100), np.zeros(100)])
+        x2[:10, 3] = 0.5
+        x2[:10, 4] = np.arange(1000, 1010)
+        outlier_detector = outliers.OutlierDetector(n_trees=20).fit(x1)
+        for rows in (x2, x2[:10], x2[10:]):
+            expected = outliers.is_numeric(np.concatenate([x1, rows]))
+            self.assertTrue(np.array_equal(outlier_detector.numeric_columns(rows), expected))
+
+        self.assertTrue(np.array_equal(outlier_detector.numeric_columns(x2[:10]),
+                                       [True, True, True, True, True]))
+
+        self.assertTrue(np.array_equal(outlier_detector.numeric_columns(x2[10:]),
+                                       [True, True, True, False, False]))
+
+    def test_results_are_reproducible(self):
+        """
+        Test that two detectors with the same random_state give the same
+        scores, independent of n_jobs and numpy's global random state.
+
+        """
+
+        np.random.seed(1)
+        scores1 = outliers.OutlierDetector(n_trees=20, n_jobs=1).fit(self.x1).score_samples(self.x2)
+        np.random.seed(2)
+        scores2 = outliers.OutlierDetector(n_trees=20, n_jobs=2).fit(self.x1).score_samples(self.x2)
+        self.assertTrue(np.array_equal(scores1, scores2))
+
+    def test_invalid_arguments_raise_value_error(self):
+        """
+        Test that an invalid engine, an unfitted detector and a mismatched
+        number of columns raise ValueError.
+
+        """
+
+        with self.assertRaises(ValueError):
+            outliers.OutlierDetector(engine='rrcf')
+
+        outlier_detector = outliers.OutlierDetector(n_trees=20)
+        with self.assertRaises(ValueError):
+            outlier_detector.predict(self.x2)
+
+        outlier_detector.fit(self.x1)
+        with self.assertRaises(ValueError):
+            outlier_detector.predict(self.x2[:, :2])
+
+
 class ScoreTestCase(unittest.TestCase):
     """
     Tests for outliers.score
@@ -685,5 +1008,5 @@ class ScoreTestCase(unittest.TestCase):
                                  columns=['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j'])
 
         model = Mock()
-        scores = outliers.score(model, datasets)
+        scores = outliers.score(model, datasets, random_state=1)
         self.assertDictEqual(scores, dict())
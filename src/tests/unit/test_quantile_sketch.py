@@ -0,0 +1,100 @@
+"""
+Unit tests for quantile_sketch.py
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import unittest
+
+import numpy as np
+from scipy import stats
+
+import quantile_sketch
+
+
+class QuantileSketchTestCase(unittest.TestCase):
+    """
+    Tests for quantile_sketch
+
+    """
+
+    def setUp(self):
+        self.x = stats.chi2.rvs(df=3, size=(50000, 3), random_state=1)
+
+    def build_sketch(self, x, n_chunks, epsilon):
+        sketch = quantile_sketch.create(x.shape[1], epsilon=epsilon)
+        for chunk in np.array_split(x, n_chunks):
+            sketch = quantile_sketch.update(sketch, chunk)
+
+        return sketch
+
+    def test_exact_until_capacity(self):
+        """
+        Test that quantiles are exact while every row fits in the sketch.
+
+        """
+
+        sketch = self.build_sketch(self.x[:1000], 7, 0.01)
+        self.assertEqual(len(sketch.levels), 1)
+        for q in (0, .25, .5, .75, 1):
+            self.assertTrue(np.allclose(quantile_sketch.quantile(sketch, q),
+                                        np.quantile(self.x[:1000], q, axis=0),
+                                        rtol=0, atol=1e-12))
+
+        self.assertTrue(np.array_equal(quantile_sketch.sample(sketch, 1000),
+                                       np.sort(self.x[:1000], axis=0)))
+
+    def test_rank_error_is_bounded(self):
+        """
+        Test that the rank error of quantiles is at most epsilon once the
+        sketch has compacted rows.
+
+        """
+
+        epsilon = 0.05
+        sketch = self.build_sketch(self.x, 23, epsilon)
+        self.assertGreater(len(sketch.levels), 1)
+        self.assertLess(sum(len(level) for level in sketch.levels), len(self.x))
+        for q in (.1, .25, .5, .75, .9):
+            ranks = np.mean(self.x < quantile_sketch.quantile(sketch, q), axis=0)
+            self.assertTrue(np.all(np.abs(ranks - q) <= epsilon))
+
+        self.assertEqual(quantile_sketch.sample(sketch, 100).shape, (100, 3))
+
+    def test_merge(self):
+        """
+        Test that merging sketches of two halves of a dataset gives a sketch
+        of the whole dataset.
+
+        """
+
+        epsilon = 0.05
+        sketch1 = self.build_sketch(self.x[:20000], 5, epsilon)
+        sketch2 = self.build_sketch(self.x[20000:], 9, epsilon)
+        sketch = quantile_sketch.merge(sketch1, sketch2)
+        self.assertEqual(sketch.n_rows, len(self.x))
+        self.assertTrue(all(len(level) <= sketch.capacity for level in sketch.levels))
+        ranks = np.mean(self.x < quantile_sketch.quantile(sketch, .75), axis=0)
+        self.assertTrue(np.all(np.abs(ranks - .75) <= epsilon))
+
+    def test_invalid_arguments_raise_value_error(self):
+        """
+        Test that an invalid epsilon, a chunk with the wrong number of columns
+        and a quantile of an empty sketch raise ValueError.
+
+        """
+
+        with self.assertRaises(ValueError):
+            quantile_sketch.create(3, epsilon=0)
+
+        sketch = quantile_sketch.create(3)
+        with self.assertRaises(ValueError):
+            quantile_sketch.update(sketch, np.zeros((10, 2)))
+
+        with self.assertRaises(ValueError):
+            quantile_sketch.quantile(sketch, .5)
@@ -0,0 +1,287 @@
+"""
+Unit tests for random_cut_forest.py
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import unittest
+
+import numpy as np
+import rrcf
+from scipy import stats
+
+import random_cut_forest
+
+
+class BuildTestCase(unittest.TestCase):
+    """
+    Tests for random_cut_forest.build
+
+    """
+
+    def test_forest_structure(self):
+        """
+        Test that every tree has the expected number of nodes and that
+        the node arrays are consistent with each other.
+
+        """
+
+        np.random.seed(1)
+        x = np.reshape(stats.norm.rvs(size=3000, random_state=1), (1000, 3))
+        forest = random_cut_forest.build(x, 10, 64)
+        self.assertEqual(len(forest.roots), 15)
+        self.assertEqual(forest.samples.shape, (15, 64))
+        self.assertEqual(forest.leaves.shape, (15, 64))
+        self.assertEqual(len(forest.count), 15 * (2 * 64 - 1))
+        self.assertTrue(np.all(forest.count[forest.roots] == 64))
+        self.assertTrue(np.all(forest.parent[forest.roots] == -1))
+        self.assertTrue(np.all(forest.dimension[forest.leaves] == -1))
+        self.assertTrue(np.allclose(forest.lower[forest.leaves], x[forest.samples]))
+        branches = np.flatnonzero(forest.dimension >= 0)
+        self.assertTrue(np.array_equal(forest.count[branches],
+                                       forest.count[forest.left[branches]]
+                                       + forest.count[forest.right[branches]]))
+
+        self.assertTrue(np.all(forest.parent[forest.left[branches]] == branches))
+        self.assertTrue(np.all(forest.parent[forest.right[branches]] == branches))
+
+    def test_duplicate_points_share_a_leaf(self):
+        """
+        Test that duplicate points in a tree are stored in the same leaf.
+
+        """
+
+        np.random.seed(1)
+        x = np.repeat([[0.0, 1.0], [2.0, 3.0], [4.0, 5.0]], 4, axis=0)
+        forest = random_cut_forest.build(x, 1, 12)
+        self.assertEqual(len(forest.count), 5)
+        self.assertEqual(len(np.unique(forest.leaves)), 3)
+        self.assertTrue(np.all(forest.count[forest.leaves] == 4))
+
+    def test_single_point_tree(self):
+        """
+        Test that a tree built from one unique point consists of a root leaf.
+
+        """
+
+        np.random.seed(1)
+        x = np.ones((4, 2))
+        forest = random_cut_forest.build(x, 1, 4)
+        self.assertEqual(len(forest.count), 1)
+        self.assertEqual(forest.count[0], 4)
+        self.assertTrue(np.array_equal(random_cut_forest.leaf_codisp(forest),
+                                       np.zeros((1, 4))))
+
+        self.assertTrue(np.array_equal(random_cut_forest.insert_codisp(forest, [[1, 1], [2, 2]]),
+                                       [[0.0], [4.0]]))
+
+
+class CodispTestCase(unittest.TestCase):
+    """
+    Tests for random_cut_forest.leaf_codisp and random_cut_forest.insert_codisp
+
+    """
+
+    def setUp(self):
+        dist = stats.chi2(df=2)
+        self.x1 = np.reshape(dist.rvs(size=2000, random_state=1), (400, 5))
+        self.x2 = np.reshape(dist.rvs(size=100, random_state=2), (20, 5))
+        self.x2[0] = self.x1[7]
+        self.x2[1][1] = 30
+
+    def build_rrcf_forest(self):
+        forest = []
+        while len(forest) < 4:
+            ixs = np.random.choice(self.x1.shape[0], size=(4, 100), replace=False)
+            forest.extend(rrcf.RCTree(self.x1[ix], index_labels=ix) for ix in ixs)
+
+        return forest
+
+    def test_leaf_codisp_matches_rrcf(self):
+        """
+        Test that leaf_codisp gives the same values as rrcf for the same seed.
+
+        """
+
+        np.random.seed(5)
+        trees = self.build_rrcf_forest()
+        np.random.seed(5)
+        forest = random_cut_forest.build(self.x1, 4, 100)
+        codisp = random_cut_forest.leaf_codisp(forest)
+        for tree, samples, tree_codisp in zip(trees, forest.samples, codisp):
+            expected = [tree.codisp(sample) for sample in samples]
+            self.assertTrue(np.array_equal(tree_codisp, expected))
+
+    def test_insert_codisp_matches_rrcf(self):
+        """
+        Test that insert_codisp gives the same values as inserting and
+        forgetting each point with rrcf.
+
+        """
+
+        np.random.seed(5)
+        trees = self.build_rrcf_forest()
+        expected = np.zeros((len(self.x2), len(trees)))
+        for row, sample in enumerate(self.x2):
+            for column, tree in enumerate(trees):
+                tree.insert_point(sample, index='sample')
+                expected[row, column] = tree.codisp('sample')
+                tree.forget_point('sample')
+
+        expected_state = np.random.get_state()
+        np.random.seed(5)
+        forest = random_cut_forest.build(self.x1, 4, 100)
+        codisp = random_cut_forest.insert_codisp(forest, self.x2)
+        self.assertTrue(np.array_equal(codisp, expected))
+        self.assertTrue(np.array_equal(np.random.get_state()[1], expected_state[1]))
+        self.assertEqual(np.random.get_state()[2], expected_state[2])
+
+    def test_mean_leaf_codisp(self):
+        """
+        Test that mean_leaf_codisp averages over the trees that each point
+        appears in and gives NaN for points that do not appear in any tree.
+
+        """
+
+        np.random.seed(5)
+        forest = random_cut_forest.build(self.x1, 4, 100)
+        mean_codisp = random_cut_forest.mean_leaf_codisp(forest, len(self.x1))
+        codisp = random_cut_forest.leaf_codisp(forest)
+        self.assertEqual(mean_codisp.shape, (len(self.x1),))
+        for row in range(len(self.x1)):
+            appearances = forest.samples == row
+            if np.any(appearances):
+                self.assertAlmostEqual(mean_codisp[row], np.mean(codisp[appearances]))
+
+            else:
+                self.assertTrue(np.isnan(mean_codisp[row]))
+
+    def test_batch_codisp_is_expected_insert_codisp(self):
+        """
+        Test that batch_codisp is the mean of insert_codisp over many
+        random insertions.
+
+        """
+
+        np.random.seed(5)
+        forest = random_cut_forest.build(self.x1, 2, 100)
+        x2 = self.x2[:5]
+        expected_codisp = random_cut_forest.batch_codisp(forest, x2)
+        mean_codisp = np.zeros(expected_codisp.shape)
+        for _ in range(1000):
+            mean_codisp += random_cut_forest.insert_codisp(forest, x2)
+
+        mean_codisp /= 1000
+        self.assertEqual(expected_codisp.shape, (5, 4))
+        self.assertTrue(np.allclose(expected_codisp, mean_codisp, rtol=0.1))
+
+    def test_batch_codisp_of_duplicate(self):
+        """
+        Test that batch_codisp of a point already in the tree equals its
+        CoDisp after inserting it again.
+
+        """
+
+        np.random.seed(5)
+        x1 = np.around(self.x1, decimals=3)
+        forest = random_cut_forest.build(x1, 2, 100)
+        x2 = x1[forest.samples[0][:3]]
+        self.assertTrue(np.array_equal(random_cut_forest.batch_codisp(forest, x2)[:, 0],
+                                       random_cut_forest.insert_codisp(forest, x2)[:, 0]))
+
+    def test_batch_codisp_does_not_use_random_numbers(self):
+        """
+        Test that batch_codisp does not modify the forest or draw
+        random numbers.
+
+        """
+
+        np.random.seed(5)
+        forest = random_cut_forest.build(self.x1, 2, 100)
+        copy = random_cut_forest.RandomCutForest(*[np.copy(field) for field in forest])
+        state = np.random.get_state()
+        random_cut_forest.batch_codisp(forest, self.x2)
+        self.assertTrue(np.array_equal(np.random.get_state()[1], state[1]))
+        for field, copied_field in zip(forest, copy):
+            self.assertTrue(np.array_equal(field, copied_field))
+
+
+class ParallelTestCase(unittest.TestCase):
+    """
+    Tests for building and scoring forests with random_state and n_jobs.
+
+    """
+
+    def setUp(self):
+        dist = stats.chi2(df=2)
+        self.x1 = np.reshape(dist.rvs(size=2000, random_state=1), (400, 5))
+        self.x2 = np.reshape(dist.rvs(size=100, random_state=2), (20, 5))
+
+    def test_results_do_not_depend_on_n_jobs(self):
+        """
+        Test that seeded forests and scores are the same for any n_jobs and
+        do not use numpy's global random number generator.
+
+        """
+
+        np.random.seed(5)
+        state = np.random.get_state()
+        results = []
+        for n_jobs in (1, 2):
+            forest = random_cut_forest.build(self.x1, 10, 100, random_state=3, n_jobs=n_jobs)
+            insert_codisp = random_cut_forest.insert_codisp(forest, self.x2,
+                                                            random_state=3,
+                                                            n_jobs=n_jobs)
+
+            batch_codisp = random_cut_forest.batch_codisp(forest, self.x2, n_jobs=n_jobs)
+            results.append((forest, insert_codisp, batch_codisp))
+
+        self.assertTrue(np.array_equal(np.random.get_state()[1], state[1]))
+        (forest1, insert1, batch1), (forest2, insert2, batch2) = results
+        self.assertEqual(len(forest1.roots), 12)
+        for field1, field2 in zip(forest1, forest2):
+            self.assertTrue(np.array_equal(field1, field2))
+
+        self.assertTrue(np.array_equal(insert1, insert2))
+        self.assertTrue(np.array_equal(batch1, batch2))
+        self.assertTrue(np.array_equal(batch1,
+                                       random_cut_forest.batch_codisp(forest1, self.x2)))
+
+    def test_n_jobs_requires_random_state(self):
+        """
+        Test that n_jobs without random_state raises ValueError.
+
+        """
+
+        with self.assertRaises(ValueError):
+            random_cut_forest.build(self.x1, 4, 100, n_jobs=2)
+
+        forest = random_cut_forest.build(self.x1, 4, 100, random_state=3)
+        with self.assertRaises(ValueError):
+            random_cut_forest.insert_codisp(forest, self.x2, n_jobs=2)
+
+        with self.assertRaises(ValueError):
+            random_cut_forest.build(self.x1, 4, 100,
+                                    random_state=np.random.RandomState(3),
+                                    n_jobs=2)
+
+    def test_generator_matches_global_random_state(self):
+        """
+        Test that building and scoring with an instance of RandomState gives
+        the same results as seeding numpy's global random number generator.
+
+        """
+
+        np.random.seed(3)
+        forest1 = random_cut_forest.build(self.x1, 4, 100)
+        insert1 = random_cut_forest.insert_codisp(forest1, self.x2)
+        generator = np.random.RandomState(3)
+        forest2 = random_cut_forest.build(self.x1, 4, 100, random_state=generator)
+        insert2 = random_cut_forest.insert_codisp(forest2, self.x2, random_state=generator)
+        self.assertTrue(np.array_equal(forest1.value, forest2.value))
+        self.assertTrue(np.array_equal(insert1, insert2))
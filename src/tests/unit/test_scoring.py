@@ -13,6 +13,7 @@ import unittest
 from unittest.mock import Mock
 
 import numpy as np
+import sklearn.metrics
 
 import scoring
 
@@ -824,5 +825,310 @@ class SpecificityTest(unittest.TestCase):
             scoring.specificity(y_true, y_pred)
 
 
+
+class ConfusionMatrixTest(unittest.TestCase):
+    """
+    Tests for scoring.confusion_matrix
+
+    """
+
+    def test_matches_sklearn(self):
+        """
+        Test that confusion_matrix matches sklearn, including classes that
+        only appear in y_pred.
+
+        """
+
+        y_true = np.array([2, 0, 2, 2, 0, 1, 1, 2])
+        y_pred = np.array([0, 0, 2, 2, 0, 2, 1, 3])
+        confusion = scoring.confusion_matrix(y_true, y_pred)
+        self.assertTrue(np.array_equal(confusion.classes, [0, 1, 2, 3]))
+        self.assertTrue(np.array_equal(confusion.matrix,
+                                       sklearn.metrics.confusion_matrix(y_true, y_pred)))
+
+
+class ScorePredictionsTest(unittest.TestCase):
+    """
+    Tests for scoring.score_predictions
+
+    """
+
+    def test_matches_sklearn_metrics(self):
+        """
+        Test that score_predictions gives the same scores as the sklearn
+        metrics it replaces.
+
+        """
+
+        random_state = np.random.RandomState(1)
+        for n_classes in (2, 3, 5):
+            y_true = random_state.randint(0, n_classes, 50)
+            y_pred = np.where(random_state.rand(50) < .7, y_true, random_state.randint(0, n_classes, 50))
+            scores = scoring.score_predictions(y_true, y_pred)
+            self.assertEqual(scores['accuracy'], sklearn.metrics.accuracy_score(y_true, y_pred))
+            self.assertEqual(scores['mcc'], sklearn.metrics.matthews_corrcoef(y_true, y_pred))
+            average = 'binary' if n_classes == 2 else 'weighted'
+            self.assertEqual(scores['precision'],
+                             sklearn.metrics.precision_score(y_true, y_pred, average=average))
+
+            self.assertEqual(scores['recall'],
+                             sklearn.metrics.recall_score(y_true, y_pred, average=average))
+
+            self.assertEqual(scores['f1_score'],
+                             sklearn.metrics.f1_score(y_true, y_pred, average=average))
+
+            if n_classes > 2:
+                self.assertEqual(scores['informedness'],
+                                 sklearn.metrics.balanced_accuracy_score(y_true, y_pred,
+                                                                         adjusted=True))
+
+    def test_same_as_score_model(self):
+        """
+        Test that score_predictions gives the same scores as score_model.
+
+        """
+
+        y_true = np.array([0, 1, 1, 0, 1, 0, 0, 1])
+        y_pred = np.array([0, 1, 0, 0, 1, 1, 0, 1])
+        model = Mock()
+        model.predict = Mock(return_value=y_pred)
+        self.assertEqual(scoring.score_predictions(y_true, y_pred),
+                         scoring.score_model(model, np.zeros(8), y_true))
+
+
+class MultiMetricScorerTest(unittest.TestCase):
+    """
+    Tests for scoring.multi_metric_scorer
+
+    """
+
+    def test_binary(self):
+        """
+        Test multi_metric_scorer with binary targets.
+
+        """
+
+        y_true = np.array([0, 1, 1, 0, 1, 0, 0, 1])
+        y_pred = np.array([0, 1, 0, 0, 1, 1, 0, 1])
+        model = Mock()
+        model.predict = Mock(return_value=y_pred)
+        scores = scoring.multi_metric_scorer(model, np.zeros(8), y_true)
+        self.assertEqual(model.predict.call_count, 1)
+        self.assertEqual(list(scores), list(scoring.scoring_methods()))
+        self.assertEqual(scores, scoring.score_predictions(y_true, y_pred))
+
+    def test_multiclass(self):
+        """
+        Test that metrics that are only defined for binary targets are NaN
+        with multiclass targets.
+
+        """
+
+        y_true = np.array([0, 1, 2, 0, 1, 2, 0, 1])
+        y_pred = np.array([0, 1, 2, 0, 2, 2, 0, 0])
+        model = Mock()
+        model.predict = Mock(return_value=y_pred)
+        scores = scoring.multi_metric_scorer(model, np.zeros(8), y_true)
+        self.assertEqual(list(scores), list(scoring.scoring_methods()))
+        for metric in ('sensitivity', 'specificity', 'dor', 'lr_plus', 'lr_minus', 'roc_auc'):
+            self.assertTrue(np.isnan(scores[metric]))
+
+        self.assertEqual(scores['accuracy'], 0.75)
+
+
+class BootstrapScoresTest(unittest.TestCase):
+    """
+    Tests for scoring.bootstrap_scores
+
+    """
+
+    def setUp(self):
+        random_state = np.random.RandomState(1)
+        self.y_true = random_state.randint(0, 2, 100)
+        self.y_pred = np.where(random_state.rand(100) < .8, self.y_true, 1 - self.y_true)
+
+    def test_matches_score_predictions(self):
+        """
+        Test that bootstrap_scores gives the percentiles of score_predictions
+        over the same resamples, regardless of chunk_size.
+
+        """
+
+        index = np.random.RandomState(2).randint(0, 100, size=(50, 100))
+        resample_scores = [scoring.score_predictions(self.y_true[row], self.y_pred[row])
+                           for row in index]
+
+        for chunk_size in (7, 1000):
+            lower_scores, upper_scores = scoring.bootstrap_scores(self.y_true,
+                                                                  self.y_pred,
+                                                                  50,
+                                                                  confidence=0.9,
+                                                                  random_state=2,
+                                                                  chunk_size=chunk_size)
+
+            self.assertEqual(set(lower_scores), set(resample_scores[0]))
+            for metric in lower_scores:
+                scores = np.array([score[metric] for score in resample_scores])
+                expected = np.percentile(scores[~np.isnan(scores)], [5, 95])
+                self.assertTrue(np.allclose([lower_scores[metric], upper_scores[metric]],
+                                            expected))
+
+    def test_infinite_scores(self):
+        """
+        Test that bootstrap_scores does not interpolate between infinite
+        scores.
+
+        """
+
+        lower_scores, upper_scores = scoring.bootstrap_scores(self.y_true,
+                                                              self.y_true,
+                                                              20,
+                                                              random_state=2)
+
+        self.assertEqual(lower_scores['accuracy'], 1.0)
+        self.assertEqual(upper_scores['dor'], np.inf)
+        self.assertEqual(lower_scores['dor'], np.inf)
+
+    def test_invalid_arguments(self):
+        """
+        Test that bootstrap_scores raises ValueError for invalid arguments.
+
+        """
+
+        with self.assertRaises(ValueError):
+            scoring.bootstrap_scores(self.y_true, self.y_pred[:50], 10)
+
+        with self.assertRaises(ValueError):
+            scoring.bootstrap_scores(self.y_true, self.y_pred, 10, confidence=1.5)
+
+
+class ScorePredictionsBatchTest(unittest.TestCase):
+    """
+    Tests for scoring.score_predictions_batch
+
+    """
+
+    def assert_scores_match(self, batch_scores, row, scores):
+        self.assertEqual(set(batch_scores), set(scores))
+        for metric, score in scores.items():
+            if metric == 'ami':
+                self.assertAlmostEqual(batch_scores[metric][row], score, places=12)
+
+            elif np.isnan(score):
+                self.assertTrue(np.isnan(batch_scores[metric][row]))
+
+            else:
+                self.assertEqual(batch_scores[metric][row], score)
+
+    def test_matches_score_predictions(self):
+        """
+        Test that each row is scored the same as by score_predictions for
+        binary and multiclass predictions.
+
+        """
+
+        random_state = np.random.RandomState(1)
+        for n_classes in (2, 3, 4):
+            y_true = np.concatenate([np.arange(n_classes), random_state.randint(0, n_classes, 40)])
+            y_pred = np.where(random_state.rand(20, len(y_true)) < .6,
+                              y_true,
+                              random_state.randint(0, n_classes, (20, len(y_true))))
+
+            y_pred[:, :n_classes] = np.arange(n_classes)
+            y_pred[0] = y_true
+            batch_scores = scoring.score_predictions_batch(y_true, y_pred)
+            for row, row_pred in enumerate(y_pred):
+                self.assert_scores_match(batch_scores, row,
+                                         scoring.score_predictions(y_true, row_pred))
+
+    def test_every_sample_in_its_own_class(self):
+        """
+        Test that ami is scored like score_predictions when every sample is
+        in a class of its own.
+
+        """
+
+        y_true = np.array([0, 2, 3, 1])
+        y_pred = np.array([[0, 2, 3, 1],
+                           [1, 0, 3, 2]])
+
+        batch_scores = scoring.score_predictions_batch(y_true, y_pred)
+        self.assertTrue(np.array_equal(batch_scores['ami'], [0.0, 0.0]))
+        for row, row_pred in enumerate(y_pred):
+            self.assert_scores_match(batch_scores, row,
+                                     scoring.score_predictions(y_true, row_pred))
+
+    def test_2d_y_true(self):
+        """
+        Test that each row of predictions is scored against the matching row
+        of a 2D y_true.
+
+        """
+
+        y_true = np.array([[0, 1, 1, 0, 1, 0],
+                           [1, 1, 0, 0, 0, 1]])
+
+        y_pred = np.array([[0, 1, 0, 0, 1, 1],
+                           [1, 0, 0, 1, 0, 1]])
+
+        batch_scores = scoring.score_predictions_batch(y_true, y_pred)
+        for row in range(2):
+            self.assert_scores_match(batch_scores, row,
+                                     scoring.score_predictions(y_true[row], y_pred[row]))
+
+    def test_undefined_metrics(self):
+        """
+        Test that undefined metrics are inf or NaN instead of raising
+        exceptions or being left out.
+
+        """
+
+        y_true = np.array([0, 0, 1, 1])
+        y_pred = np.array([[0, 0, 1, 1],
+                           [0, 1, 1, 1],
+                           [0, 0, 0, 0]])
+
+        batch_scores = scoring.score_predictions_batch(y_true, y_pred)
+        self.assertTrue(np.array_equal(batch_scores['dor'], [np.inf, np.nan, np.nan], equal_nan=True))
+        self.assertTrue(np.array_equal(batch_scores['lr_plus'], [np.inf, 2.0, np.inf]))
+        self.assertTrue(np.array_equal(batch_scores['roc_auc'], [1.0, .75, .5]))
+        batch_scores = scoring.score_predictions_batch(np.zeros(4), y_pred)
+        self.assertTrue(np.all(np.isnan(batch_scores['roc_auc'])))
+
+    def test_classes(self):
+        """
+        Test that score_predictions_batch uses the given classes even when
+        some are missing from y_true and y_pred.
+
+        """
+
+        y_true = np.array([[1, 1, 0, 1]])
+        y_pred = np.array([[1, 1, 1, 1]])
+        scores = scoring.score_predictions_batch(y_true, y_pred, classes=[0, 1, 2])
+        expected = scoring.score_predictions_batch(np.array([[1, 1, 0, 1], [2, 2, 2, 2]]),
+                                                   np.array([[1, 1, 1, 1], [2, 2, 2, 2]]))
+
+        self.assertEqual(set(scores), set(expected))
+        for metric, score in scores.items():
+            self.assertTrue(np.array_equal(score, expected[metric][:1], equal_nan=True))
+
+        self.assertIn('sensitivity', scoring.score_predictions_batch(y_true, y_pred))
+        with self.assertRaises(ValueError):
+            scoring.score_predictions_batch(y_true, y_pred, classes=[0, 2])
+
+    def test_wrong_dimensions_raise_value_error(self):
+        """
+        Test that a 1D y_pred or a y_true with the wrong shape raises
+        ValueError.
+
+        """
+
+        with self.assertRaises(ValueError):
+            scoring.score_predictions_batch(np.array([0, 1]), np.array([0, 1]))
+
+        with self.assertRaises(ValueError):
+            scoring.score_predictions_batch(np.array([0, 1, 1]), np.array([[0, 1], [1, 0]]))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,244 @@
+"""
+Unit tests for search_checkpoint.py
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import os
+import unittest
+import tempfile
+
+import numpy as np
+import sklearn
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.model_selection import GridSearchCV
+
+import scoring
+import search_checkpoint
+
+
+class CountingClassifier(KNeighborsClassifier):
+    """
+    A k-nearest neighbors classifier that counts how many times it is fit.
+
+    """
+
+    fit_count = 0
+
+    def fit(self, X, y):
+        CountingClassifier.fit_count += 1
+        return super().fit(X, y)
+
+
+class CheckpointTestCase(unittest.TestCase):
+    """
+    Base class for search_checkpoint tests.
+
+    """
+
+    def setUp(self):
+        random_state = np.random.RandomState(3)
+        self.inputs = random_state.normal(size=(60, 3))
+        self.targets = (self.inputs[:, 0] > 0).astype(int)
+        self.pipeline = Pipeline([('preprocessing1', StandardScaler()),
+                                  ('model', CountingClassifier())])
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'checkpoint.db')
+        CountingClassifier.fit_count = 0
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+class CheckpointedEstimatorTestCase(CheckpointTestCase):
+    """
+    Tests for search_checkpoint.CheckpointedEstimator
+
+    """
+
+    def test_parameters(self):
+        """
+        Test that the parameters of the wrapped estimator can be get and set
+        through the wrapper, and that the wrapper can be cloned.
+
+        """
+
+        estimator = search_checkpoint.CheckpointedEstimator(self.pipeline, seed=4)
+        estimator.set_params(model__n_neighbors=2, seed=5)
+        self.assertEqual(estimator.get_params()['model__n_neighbors'], 2)
+        self.assertEqual(self.pipeline.get_params()['model__n_neighbors'], 2)
+        self.assertEqual(estimator.seed, 5)
+        self.assertEqual(estimator._estimator_type, 'classifier')
+        clone = sklearn.clone(estimator)
+        self.assertEqual(clone.get_params()['model__n_neighbors'], 2)
+        self.assertIsNot(clone.estimator, self.pipeline)
+
+    def test_lazy_fit(self):
+        """
+        Test that the wrapped estimator is only fit when it is used to
+        predict.
+
+        """
+
+        estimator = search_checkpoint.CheckpointedEstimator(self.pipeline)
+        estimator.fit(self.inputs, self.targets)
+        self.assertEqual(CountingClassifier.fit_count, 0)
+        predictions = estimator.predict(self.inputs)
+        estimator.predict(self.inputs)
+        self.assertEqual(CountingClassifier.fit_count, 1)
+        expected = sklearn.clone(self.pipeline).fit(self.inputs, self.targets).predict(self.inputs)
+        self.assertTrue(np.array_equal(predictions, expected))
+
+    def test_classes(self):
+        """
+        Test that classes_ is taken from the fitted estimator.
+
+        """
+
+        estimator = search_checkpoint.CheckpointedEstimator(self.pipeline)
+        self.assertFalse(hasattr(estimator, 'classes_'))
+        estimator.fit(self.inputs, self.targets)
+        self.assertTrue(np.array_equal(estimator.classes_, [0, 1]))
+
+    def test_result_keys(self):
+        """
+        Test that results are keyed by the parameters, data, seed and scorer.
+
+        """
+
+        estimator = search_checkpoint.CheckpointedEstimator(self.pipeline, seed=1)
+        estimator.fit(self.inputs, self.targets)
+        key = estimator.result(self.inputs, self.targets, 'accuracy')['key']
+        self.assertEqual(key, estimator.result(self.inputs.copy(), self.targets, 'accuracy')['key'])
+        self.assertNotEqual(key, estimator.result(self.inputs[1:], self.targets[1:], 'accuracy')['key'])
+        self.assertNotEqual(key, estimator.result(self.inputs, self.targets, 'precision')['key'])
+        self.assertNotEqual(key, sklearn.clone(estimator).set_params(seed=2)
+                            .fit(self.inputs, self.targets)
+                            .result(self.inputs, self.targets, 'accuracy')['key'])
+
+        self.assertNotEqual(key, sklearn.clone(estimator).set_params(model__n_neighbors=3)
+                            .fit(self.inputs, self.targets)
+                            .result(self.inputs, self.targets, 'accuracy')['key'])
+
+
+class CheckpointedScorerTestCase(CheckpointTestCase):
+    """
+    Tests for search_checkpoint.CheckpointedScorer and
+    search_checkpoint.load_results
+
+    """
+
+    def search(self, n_neighbors=(1, 3, 5)):
+        search = GridSearchCV(search_checkpoint.CheckpointedEstimator(self.pipeline, seed=0),
+                              {'model__n_neighbors': list(n_neighbors)},
+                              scoring=search_checkpoint.CheckpointedScorer(scoring.multi_metric_scorer,
+                                                                           self.path),
+                              refit=False,
+                              cv=3)
+
+        return search.fit(self.inputs, self.targets)
+
+    def test_resume(self):
+        """
+        Test that a search with a checkpoint gives the same results as
+        without one, and does not fit candidates that are already in the
+        checkpoint.
+
+        """
+
+        expected = GridSearchCV(self.pipeline,
+                                {'model__n_neighbors': [1, 3, 5]},
+                                scoring=scoring.multi_metric_scorer,
+                                refit=False,
+                                cv=3).fit(self.inputs, self.targets)
+
+        CountingClassifier.fit_count = 0
+        first = self.search()
+        self.assertEqual(CountingClassifier.fit_count, 9)
+        second = self.search()
+        self.assertEqual(CountingClassifier.fit_count, 9)
+        for search in (first, second):
+            for metric in ('accuracy', 'informedness', 'dor'):
+                self.assertTrue(np.array_equal(search.cv_results_[f'mean_test_{metric}'],
+                                               expected.cv_results_[f'mean_test_{metric}'],
+                                               equal_nan=True))
+
+        results = search_checkpoint.load_results(self.path)
+        self.assertEqual(len(results), 9)
+        self.assertEqual(set(results['seed']), {0})
+        self.assertEqual(results['scores'][0].keys(), set(scoring.scoring_methods()))
+        self.assertEqual(set(results['parameters'].map(lambda x: x['model__n_neighbors'])), {1, 3, 5})
+        self.assertEqual(results['parameters'][0]['model'], 'CountingClassifier')
+
+    def test_failed_candidates(self):
+        """
+        Test that candidates that fail to fit are given NaN scores instead of
+        stopping the search, and are not fit again when it is resumed.
+
+        """
+
+        expected = GridSearchCV(self.pipeline,
+                                {'model__n_neighbors': [1, 3, 0]},
+                                scoring=scoring.multi_metric_scorer,
+                                refit=False,
+                                cv=3).fit(self.inputs, self.targets)
+
+        CountingClassifier.fit_count = 0
+        first = self.search(n_neighbors=(1, 3, 0))
+        self.assertEqual(CountingClassifier.fit_count, 9)
+        second = self.search(n_neighbors=(1, 3, 0))
+        self.assertEqual(CountingClassifier.fit_count, 9)
+        for search in (first, second):
+            accuracy = search.cv_results_['mean_test_accuracy']
+            self.assertTrue(np.isnan(accuracy[2]))
+            self.assertTrue(np.array_equal(accuracy, expected.cv_results_['mean_test_accuracy'],
+                                           equal_nan=True))
+
+        results = search_checkpoint.load_results(self.path)
+        self.assertEqual(len(results), 9)
+        failed = results[results['parameters'].map(lambda x: x['model__n_neighbors']) == 0]
+        self.assertEqual(len(failed), 3)
+        for scores in failed['scores']:
+            self.assertEqual(scores.keys(), set(scoring.scoring_methods()))
+            self.assertTrue(np.all(np.isnan(list(scores.values()))))
+
+    def test_single_score(self):
+        """
+        Test that a scorer that returns a single score is checkpointed.
+
+        """
+
+        scorer = search_checkpoint.CheckpointedScorer(scoring.scoring_methods()['accuracy'], self.path)
+        estimator = search_checkpoint.CheckpointedEstimator(self.pipeline).fit(self.inputs, self.targets)
+        score = scorer(estimator, self.inputs, self.targets)
+        self.assertEqual(scorer(estimator, self.inputs, self.targets), score)
+        self.assertEqual(search_checkpoint.load_results(self.path)['scores'][0], score)
+
+    def test_different_scorers(self):
+        """
+        Test that the scores of one scorer are not reused by another.
+
+        """
+
+        estimator = search_checkpoint.CheckpointedEstimator(self.pipeline).fit(self.inputs[::2], self.targets[::2])
+        scores = [search_checkpoint.CheckpointedScorer(scoring.scoring_methods()[metric], self.path)
+                  (estimator, self.inputs, self.targets)
+                  for metric in ('accuracy', 'specificity')]
+
+        expected = scoring.score_model(estimator, self.inputs, self.targets)
+        self.assertEqual(scores, [expected['accuracy'], expected['specificity']])
+        results = search_checkpoint.load_results(self.path)
+        self.assertEqual(list(results['scorer']),
+                         [repr(scoring.scoring_methods()[metric]) for metric in ('accuracy', 'specificity')])
+
+
+if __name__ == '__main__':
+    unittest.main()
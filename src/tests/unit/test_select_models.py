@@ -0,0 +1,119 @@
+"""
+Unit tests for select_models.py
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import unittest
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import util
+import select_models
+
+
+def create_datasets(random_state):
+    """
+    Create training and validation datasets with a binary target.
+
+    """
+
+    random_state = np.random.RandomState(random_state)
+
+    def create_dataset(n_samples):
+        inputs = random_state.normal(size=(n_samples, 3))
+        targets = (inputs[:, 0] + random_state.normal(size=n_samples) > 0).astype(int)
+        return util.Dataset(inputs=inputs, targets=targets)
+
+    return util.Datasets(training=create_dataset(120),
+                         validation=create_dataset(60),
+                         columns=pd.Index(['a', 'b', 'c', 'target']))
+
+
+class PreprocessingChainsTest(unittest.TestCase):
+    """
+    Tests for select_models.preprocessing_chains()
+
+    """
+
+    def test_preprocessing_chains(self):
+        """
+        Test that preprocessing_chains() enumerates ordered chains of
+        distinct methods, shortest first.
+
+        """
+
+        self.assertEqual(select_models.preprocessing_chains(['a', 'b']),
+                         [(), ('a',), ('b',)])
+
+        self.assertEqual(select_models.preprocessing_chains(['a', 'b', 'c'], 2),
+                         [(), ('a',), ('b',), ('c',),
+                          ('a', 'b'), ('a', 'c'), ('b', 'a'), ('b', 'c'), ('c', 'a'), ('c', 'b')])
+
+
+class RunTournamentTest(unittest.TestCase):
+    """
+    Tests for select_models.run_tournament()
+
+    """
+
+    def setUp(self):
+        self.datasets = create_datasets(0)
+        self.combinations = [('lda', ()),
+                             ('knn', ('robust scaling',)),
+                             ('rnc', ()),
+                             ('lda', ('pca', 'standard scaling'))]
+
+    def test_run_tournament(self):
+        """
+        Test that run_tournament() gives a row for each combination in order,
+        the same scores in parallel as serially, and NaN scores for
+        combinations that fail.
+
+        """
+
+        results = select_models.run_tournament(self.combinations, self.datasets, n_splits=3)
+        self.assertEqual(tuple(results.columns), select_models.COLUMNS)
+        self.assertEqual(list(results['model']), ['lda', 'knn', 'rnc', 'lda'])
+        self.assertEqual(list(results['preprocessing']),
+                         ['none', 'robust scaling', 'none', 'pca + standard scaling'])
+
+        # The radius neighbors classifier finds no neighbors for some samples.
+        self.assertTrue(results.iloc[2, 2:-1].isna().all())
+        for metric in ('accuracy', 'informedness', 'outlier informedness', 'cv informedness',
+                       'mad informedness', 'runtime'):
+            self.assertFalse(results[metric].drop(index=2).isna().any(), metric)
+            self.assertEqual(results[metric].dtype, np.float64)
+
+        parallel_results = select_models.run_tournament(self.combinations, self.datasets, n_splits=3, cpus=2)
+        pd.testing.assert_frame_equal(results.drop(columns='runtime'),
+                                      parallel_results.drop(columns='runtime'))
+
+    def test_cache(self):
+        """
+        Test that run_tournament() reuses the results of combinations that
+        are in the cache, and evaluates combinations that are not.
+
+        """
+
+        with tempfile.TemporaryDirectory() as cache:
+            results = select_models.run_tournament(self.combinations[:2], self.datasets, n_splits=3, cache=cache)
+            cached_results = select_models.run_tournament(self.combinations, self.datasets, n_splits=3, cache=cache)
+            pd.testing.assert_frame_equal(results, cached_results.iloc[:2])
+            self.assertFalse(np.isnan(cached_results['runtime'][3]))
+
+            other_results = select_models.run_tournament(self.combinations[:2], create_datasets(1),
+                                                         n_splits=3, cache=cache)
+
+            self.assertFalse(np.array_equal(results['runtime'], other_results['runtime']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,9 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 """
 
 import os
+import argparse
 import unittest
+import tempfile
 from pathlib import Path
 from unittest.mock import patch
 
@@ -132,6 +134,7 @@ class SplitInputsTests(unittest.TestCase):
         data = pd.DataFrame([[0, 0, 0], [0, 1, 1], [1, 0, 1], [1, 1, 0]])
         inputs = util.split_inputs(data)
         self.assertTrue((inputs == np.array([[0, 0], [0, 1], [1, 0], [1, 1]])).all())
+        self.assertTrue(inputs.flags['C_CONTIGUOUS'])
 
 
 class SplitTargetTests(unittest.TestCase):
@@ -149,6 +152,168 @@ class SplitTargetTests(unittest.TestCase):
         data = pd.DataFrame([[0, 0, 0], [0, 1, 1], [1, 0, 1], [1, 1, 0]])
         inputs = util.split_target(data)
         self.assertTrue((inputs == np.array([0, 1, 1, 0])).all())
+        self.assertTrue(inputs.flags['C_CONTIGUOUS'])
+
+
+class MemmapArraysTests(unittest.TestCase):
+    """
+    Tests for util.memmap_arrays
+
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / 'datasets'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_memmap_arrays(self):
+        """
+        Test that memmap_arrays() gives read-only, C-contiguous memory maps of
+        one file with the same contents as the arrays.
+
+        """
+
+        data = pd.DataFrame({'a': [1.5, 2.5, 3.5], 'b': [1, 2, 3], 'target': [0, 1, 1]})
+        arrays = [util.split_inputs(data), util.split_target(data), np.arange(5, dtype=np.int8)]
+        memmaps = util.memmap_arrays(arrays, self.path)
+        self.assertEqual(list(self.path.parent.iterdir()), [self.path])
+        for array, memmap in zip(arrays, memmaps):
+            self.assertIsInstance(memmap, np.memmap)
+            self.assertEqual(Path(memmap.filename), self.path)
+            self.assertEqual(memmap.offset % util.MEMMAP_ALIGNMENT, 0)
+            self.assertTrue(memmap.flags['C_CONTIGUOUS'])
+            self.assertFalse(memmap.flags['WRITEABLE'])
+            self.assertEqual(memmap.dtype, array.dtype)
+            np.testing.assert_array_equal(memmap, array)
+
+    def test_object_arrays(self):
+        """
+        Test that memmap_arrays() rejects arrays with object dtypes without
+        writing the file.
+
+        """
+
+        with self.assertRaises(ValueError):
+            util.memmap_arrays([np.arange(3), np.array(['a', 1], dtype=object)], self.path)
+
+        self.assertEqual(list(self.path.parent.iterdir()), [])
+
+    def test_load_datasets(self):
+        """
+        Test that load_datasets() returns memory maps of memmap_path when it
+        is given.
+
+        """
+
+        dataset_path = Path(self.temp_dir.name) / 'dataset.csv'
+        dataset_path.write_text('a,b,target\n1.5,2,0\n3,4,1\n')
+        datasets = util.load_datasets(dataset_path, dataset_path, memmap_path=self.path)
+        for array in (datasets.training.inputs, datasets.training.targets,
+                      datasets.validation.inputs, datasets.validation.targets):
+            self.assertIsInstance(array, np.memmap)
+            self.assertEqual(Path(array.filename), self.path)
+
+        np.testing.assert_array_equal(datasets.training.inputs, [[1.5, 2], [3, 4]])
+        np.testing.assert_array_equal(datasets.validation.targets, [0, 1])
+
+
+class LoadDatasetTests(unittest.TestCase):
+    """
+    Tests for util.load_dataset
+
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / 'dataset.csv'
+        self.cache_path = util.dataset_cache_path(self.path)
+        self.path.write_text('a,b,target\n1.5,2,0\n,3,1\n4.25,5,1\n')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_cache(self):
+        """
+        Test that load_dataset() writes a binary cache, and loads the same
+        dataset from it without parsing the CSV file.
+
+        """
+
+        expected_dataset = pd.read_csv(self.path)
+        dataset = util.load_dataset(self.path)
+        pd.testing.assert_frame_equal(dataset, expected_dataset)
+        self.assertEqual(sorted(self.path.parent.iterdir()), [self.path, self.cache_path])
+
+        with patch.object(pd, 'read_csv') as read_csv:
+            cached_dataset = util.load_dataset(self.path)
+
+        read_csv.assert_not_called()
+        pd.testing.assert_frame_equal(cached_dataset, expected_dataset)
+
+    def test_stale_cache(self):
+        """
+        Test that load_dataset() parses the CSV file and rewrites the cache
+        when the CSV file has changed or the cache is corrupt.
+
+        """
+
+        util.load_dataset(self.path)
+        self.path.write_text('a,b,target\n7,8,1\n')
+        pd.testing.assert_frame_equal(util.load_dataset(self.path), pd.read_csv(self.path))
+
+        self.cache_path.write_bytes(b'corrupt')
+        pd.testing.assert_frame_equal(util.load_dataset(self.path), pd.read_csv(self.path))
+        with patch.object(pd, 'read_csv') as read_csv:
+            util.load_dataset(self.path)
+
+        read_csv.assert_not_called()
+
+    def test_no_cache(self):
+        """
+        Test that load_dataset() does not cache datasets when caching is
+        disabled, or when they have non-numeric columns.
+
+        """
+
+        pd.testing.assert_frame_equal(util.load_dataset(self.path, cache=False), pd.read_csv(self.path))
+        self.assertFalse(self.cache_path.exists())
+
+        self.path.write_text('a,b,target\n1,x,0\n')
+        pd.testing.assert_frame_equal(util.load_dataset(self.path), pd.read_csv(self.path))
+        self.assertFalse(self.cache_path.exists())
+
+
+class ParseNestedCvTests(unittest.TestCase):
+    """
+    Tests for util.parse_nested_cv
+
+    """
+
+    def test_parse_nested_cv(self):
+        """
+        Test parse_nested_cv() on valid and invalid values.
+
+        """
+
+        self.assertEqual(util.parse_nested_cv('5:3'), (5, 3))
+        for value in ('5', '5:3:2', 'a:3', '1:3', '5:0'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                util.parse_nested_cv(value)
+
+    def test_command_line(self):
+        """
+        Test that --nested-cv is parsed from the command line.
+
+        """
+
+        arguments = util.parse_command_line(['model.dat', 'training.csv', 'validation.csv',
+                                             '--nested-cv', '10:4'])
+
+        self.assertEqual(arguments.nested_cv, (10, 4))
+        arguments = util.parse_command_line(['model.dat', 'training.csv', 'validation.csv'])
+        self.assertIsNone(arguments.nested_cv)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,185 @@
+"""
+Unit tests for warm_start_search.py
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import os
+import unittest
+import tempfile
+
+import numpy as np
+from sklearn import ensemble
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import GridSearchCV
+
+import scoring
+import search_checkpoint
+import warm_start_search
+
+
+class CountingForest(ensemble.RandomForestClassifier):
+    """
+    A random forest that counts how many trees it has fit.
+
+    """
+
+    trees_fit = 0
+
+    def fit(self, X, y, sample_weight=None):
+        previous_trees = len(getattr(self, 'estimators_', [])) if self.warm_start else 0
+        super().fit(X, y, sample_weight=sample_weight)
+        CountingForest.trees_fit += len(self.estimators_) - previous_trees
+
+        return self
+
+
+def pipeline(model):
+    """
+    Create a pipeline with a scaler and a model.
+
+    """
+
+    return Pipeline([('preprocessing1', StandardScaler()), ('model', model)])
+
+
+class PathParameterTestCase(unittest.TestCase):
+    """
+    Tests for warm_start_search.path_parameter
+
+    """
+
+    def test_path_parameter(self):
+        """
+        Test that path_parameter finds a parameter with more than one value in
+        the grid.
+
+        """
+
+        forest = pipeline(ensemble.ExtraTreesClassifier())
+        self.assertEqual(warm_start_search.path_parameter(forest, {'model__n_estimators': [10, 20]}),
+                         warm_start_search.N_ESTIMATORS)
+
+        self.assertEqual(warm_start_search.path_parameter(forest, [{'model__max_depth': [1, 2]},
+                                                                   {'model__n_estimators': [20, 10]}]),
+                         warm_start_search.N_ESTIMATORS)
+
+        logistic_regression = pipeline(LogisticRegression())
+        parameter = warm_start_search.path_parameter(logistic_regression,
+                                                     {'model__max_iter': [10, 20], 'model__C': [1, 2]})
+
+        self.assertEqual(parameter.name, 'C')
+        self.assertEqual(warm_start_search.path_parameter(pipeline(SGDClassifier()), {'model__alpha': [1, 2]}).name,
+                         'alpha')
+
+    def test_no_path_parameter(self):
+        """
+        Test that path_parameter returns None when no parameter can be warm
+        started.
+
+        """
+
+        self.assertIsNone(warm_start_search.path_parameter(pipeline(ensemble.RandomForestClassifier()),
+                                                           {'model__n_estimators': [10],
+                                                            'model__max_depth': [1, 2]}))
+
+        self.assertIsNone(warm_start_search.path_parameter(pipeline(KNeighborsClassifier()),
+                                                           {'model__n_neighbors': [1, 2]}))
+
+
+class FitPathsTestCase(unittest.TestCase):
+    """
+    Tests for warm_start_search.fit_paths
+
+    """
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.inputs = random_state.normal(size=(100, 4))
+        self.targets = (self.inputs[:, 0] + random_state.normal(size=100) > 0).astype(int)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'checkpoint.db')
+        CountingForest.trees_fit = 0
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def search(self, model, parameter_grid):
+        """
+        Fit warm started paths and then run a checkpointed grid search.
+
+        """
+
+        estimator = search_checkpoint.CheckpointedEstimator(pipeline(model))
+        score_function = search_checkpoint.CheckpointedScorer(scoring.multi_metric_scorer, self.path)
+        parameter = warm_start_search.path_parameter(estimator, parameter_grid)
+        warm_start_search.fit_paths(estimator,
+                                    parameter_grid,
+                                    parameter,
+                                    score_function,
+                                    self.inputs,
+                                    self.targets,
+                                    cv=3)
+
+        trees_fit = CountingForest.trees_fit
+        search = GridSearchCV(estimator, parameter_grid, scoring=score_function, refit=False, cv=3)
+        search.fit(self.inputs, self.targets)
+        self.assertEqual(CountingForest.trees_fit, trees_fit)
+
+        return search
+
+    def test_n_estimators(self):
+        """
+        Test that growing a forest gives the same scores as fitting each
+        candidate from scratch, and only fits the largest forest once per
+        fold and path.
+
+        """
+
+        parameter_grid = {'model__n_estimators': [5, 20, 10, 40],
+                          'model__max_depth': [2, 4],
+                          'model__random_state': [0]}
+
+        search = self.search(CountingForest(), parameter_grid)
+        self.assertEqual(CountingForest.trees_fit, 40 * 2 * 3)
+        expected = GridSearchCV(pipeline(ensemble.RandomForestClassifier()),
+                                parameter_grid,
+                                scoring=scoring.multi_metric_scorer,
+                                refit=False,
+                                cv=3).fit(self.inputs, self.targets)
+
+        self.assertEqual(search.cv_results_['params'], expected.cv_results_['params'])
+        for metric in ('accuracy', 'recall', 'dor'):
+            self.assertTrue(np.array_equal(search.cv_results_[f'mean_test_{metric}'],
+                                           expected.cv_results_[f'mean_test_{metric}'],
+                                           equal_nan=True))
+
+    def test_regularization_path(self):
+        """
+        Test that continuing along a regularization path gives about the same
+        scores as fitting each candidate from scratch.
+
+        """
+
+        parameter_grid = {'model__C': [0.01, 0.1, 1, 10]}
+        search = self.search(LogisticRegression(tol=1e-8), parameter_grid)
+        expected = GridSearchCV(pipeline(LogisticRegression(tol=1e-8)),
+                                parameter_grid,
+                                scoring=scoring.multi_metric_scorer,
+                                refit=False,
+                                cv=3).fit(self.inputs, self.targets)
+
+        self.assertTrue(np.allclose(search.cv_results_['mean_test_accuracy'],
+                                    expected.cv_results_['mean_test_accuracy']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,11 +13,15 @@ file, You can obtain one at https://mozilla.org/MPL/2.0/.
 """
 
 
+import io
 import re
 import os
 import json
 import pickle
+import hashlib
 import logging
+import zipfile
+import tempfile
 import argparse
 import subprocess
 from pathlib import Path
@@ -92,6 +96,14 @@ PREPROCESSING_METHODS = {
     'factor analysis': sklearn.decomposition.FactorAnalysis,
 }
 
+# Possible methods of searching the parameter grid for the best
+# hyperparameters. 'grid' is an exhaustive grid search, 'halving' is a
+# successive halving search that races candidates on growing budgets,
+# 'random' samples candidates at random, and 'bayesian' samples candidates
+# with a Gaussian process model of the scores (see
+# hyperparameter_search.py).
+SEARCH_METHODS = ('grid', 'halving', 'random', 'bayesian')
+
 # Stores values from the configuration file.
 Config = namedtuple('Config',
                     ('training_dataset',
@@ -107,6 +119,9 @@ Dataset = namedtuple('Dataset', 'inputs targets')
 # Stores training and validation datasets together in a single object.
 Datasets = namedtuple('Datasets', 'training validation columns')
 
+# Byte alignment of each array in a memory-mapped datasets file.
+MEMMAP_ALIGNMENT = 64
+
 
 def run_command(command):
     """
@@ -123,7 +138,7 @@ def run_command(command):
     return subprocess.check_output(re.split(r'\s+', command)).decode('utf-8').strip()
 
 
-def load_datasets(training_dataset, validation_dataset):
+def load_datasets(training_dataset, validation_dataset, cache=True, memmap_path=None):
     """
     Load training and validation datasets from the filesystem and return
     them as a Datasets object.
@@ -131,24 +146,194 @@ def load_datasets(training_dataset, validation_dataset):
     Args
       training_dataset: Path to the training dataset.
       validation_dataset: Path to the validation dataset.
+      cache: Load the datasets from their binary caches when they are fresh
+             (see load_dataset). (Default=True)
+      memmap_path: Path to write the inputs and targets of both datasets to,
+                   or None to keep them in memory. When given, the arrays are
+                   returned as read-only memory maps of this file (see
+                   memmap_arrays). (Default=None)
 
     Returns
       An instance of Datasets.
 
     """
 
-    training_dataset = pd.read_csv(str(training_dataset))
-    validation_dataset = pd.read_csv(str(validation_dataset))
+    training_dataset = load_dataset(training_dataset, cache=cache)
+    validation_dataset = load_dataset(validation_dataset, cache=cache)
 
     assert set(training_dataset.columns) == set(validation_dataset.columns)
 
-    return Datasets(training=Dataset(inputs=split_inputs(training_dataset),
-                                     targets=split_target(training_dataset)),
-                    validation=Dataset(inputs=split_inputs(validation_dataset),
-                                       targets=split_target(validation_dataset)),
+    arrays = [split_inputs(training_dataset),
+              split_target(training_dataset),
+              split_inputs(validation_dataset),
+              split_target(validation_dataset)]
+
+    if memmap_path is not None:
+        arrays = memmap_arrays(arrays, memmap_path)
+
+    return Datasets(training=Dataset(inputs=arrays[0], targets=arrays[1]),
+                    validation=Dataset(inputs=arrays[2], targets=arrays[3]),
                     columns=training_dataset.columns)
 
 
+def memmap_arrays(arrays, path):
+    """
+    Write arrays to one file and return them as read-only memory maps.
+
+    joblib passes memory maps to worker processes by path and offset instead
+    of pickling their contents, so every worker shares the same pages of the
+    file, and per-worker memory does not grow with the size of the arrays.
+    The file is written to a temporary file first and then renamed, so
+    processes that already map an older version of the file are unaffected.
+
+    Args
+      arrays: A sequence of numpy arrays with non-object dtypes.
+      path: Path to write the arrays to.
+
+    Returns
+      A list of C-contiguous, read-only np.memmap arrays with the same
+      dtypes, shapes and contents as arrays.
+
+    Raises
+      ValueError if an array has an object dtype.
+
+    """
+
+    path = Path(path)
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    for array in arrays:
+        if array.dtype.hasobject:
+            raise ValueError(f'Can not memory-map an array with dtype {array.dtype}')
+
+    layout = []
+    offset = 0
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=path.parent,
+                                         prefix=path.name,
+                                         suffix='.tmp',
+                                         delete=False) as memmap_fp:
+            temp_path = Path(memmap_fp.name)
+            for array in arrays:
+                offset += -offset % MEMMAP_ALIGNMENT
+                memmap_fp.seek(offset)
+                memmap_fp.write(array.tobytes())
+                layout.append((array.dtype, array.shape, offset))
+                offset += array.nbytes
+
+        os.replace(temp_path, path)
+
+    except BaseException:
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+
+        raise
+
+    return [np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+            for dtype, shape, offset in layout]
+
+
+def load_dataset(path, cache=True):
+    """
+    Load a CSV dataset from the filesystem and return it as a dataframe.
+
+    Parsing a CSV file is much slower than loading the same data in binary
+    form, so each dataset is cached as an uncompressed .npz file next to the
+    CSV file (see dataset_cache_path), keyed by the SHA-256 hash of the CSV
+    file's contents. The cache is used when its hash matches the CSV file,
+    and is rewritten after parsing the CSV file when it does not. Datasets
+    with non-numeric columns are not cached.
+
+    Args
+      path: Path to the CSV dataset.
+      cache: Use and update the binary cache. (Default=True)
+
+    Returns
+      A pandas dataframe.
+
+    """
+
+    path = Path(path)
+    if not cache:
+        return pd.read_csv(str(path))
+
+    contents = path.read_bytes()
+    content_hash = hashlib.sha256(contents).hexdigest()
+    cache_path = dataset_cache_path(path)
+    dataset = _read_dataset_cache(cache_path, content_hash)
+    if dataset is None:
+        dataset = pd.read_csv(io.BytesIO(contents))
+        _write_dataset_cache(dataset, cache_path, content_hash)
+
+    return dataset
+
+
+def dataset_cache_path(path):
+    """
+    Get the path to the binary cache of a CSV dataset.
+
+    """
+
+    path = Path(path)
+
+    return path.with_name(path.name + '.npz')
+
+
+def _read_dataset_cache(cache_path, content_hash):  # pylint: disable=C0103
+    """
+    Read a dataset from its binary cache, or return None if the cache does
+    not exist, is unreadable, or was written for different CSV contents.
+
+    """
+
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if str(cache['hash']) != content_hash:
+                return None
+
+            columns = [str(column) for column in cache['columns']]
+            return pd.DataFrame({column: cache[f'column{index}']
+                                 for index, column in enumerate(columns)},
+                                columns=columns)
+
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def _write_dataset_cache(dataset, cache_path, content_hash):  # pylint: disable=C0103
+    """
+    Write the binary cache of a dataset. The cache is written to a temporary
+    file first, so concurrent readers never see a partially written cache.
+
+    """
+
+    if (dataset.dtypes == object).any():
+        return
+
+    arrays = {f'column{index}': dataset[column].to_numpy()
+              for index, column in enumerate(dataset.columns)}
+
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=cache_path.parent,
+                                         prefix=cache_path.name,
+                                         suffix='.tmp',
+                                         delete=False) as cache_fp:
+            temp_path = Path(cache_fp.name)
+            np.savez(cache_fp,
+                     hash=np.array(content_hash),
+                     columns=np.array(dataset.columns, dtype=str),
+                     **arrays)
+
+        os.replace(temp_path, cache_path)
+
+    except OSError as error:
+        logger = logging.getLogger(__name__)
+        logger.warning('Could not write dataset cache %s: %s', cache_path, error)
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+
+
 def split_inputs(dataframe):
     """
     Split the input columns out of the given dataframe and return them
@@ -157,7 +342,7 @@ def split_inputs(dataframe):
 
     """
 
-    inputs = dataframe.to_numpy()[:, 0:-1]
+    inputs = np.ascontiguousarray(dataframe.to_numpy()[:, 0:-1])
     assert len(inputs) == len(dataframe)
     assert len(inputs[0]) == len(dataframe.columns) - 1
 
@@ -172,7 +357,7 @@ def split_target(dataframe):
 
     """
 
-    targets = dataframe.to_numpy()[:, -1]
+    targets = np.ascontiguousarray(dataframe.to_numpy()[:, -1])
     assert len(targets) == len(dataframe)
     assert np.ndim(targets) == 1
 
@@ -196,6 +381,24 @@ def save_validation(dataset, output_path):
     dataset.to_csv(dataset_path, index=None)
 
 
+def save_outlier_detector(outlier_detector, output_path):
+    """
+    Save a fitted outlier detector alongside a model.
+
+    Args
+      outlier_detector: A fitted instance of outliers.OutlierDetector.
+      output_path: Path that the model was saved to.
+
+    Returns
+      None
+
+    """
+
+    detector_path = output_path.with_name(output_path.stem + '_outliers' + output_path.suffix)
+    with detector_path.open('wb') as output_file:
+        pickle.dump(outlier_detector, output_file)
+
+
 def get_commit_hash():
     """
     Get the git commit hash of the current commit.
@@ -248,7 +451,7 @@ def parse_command_line(argv):
     parser.add_argument('--cpu',
                         type=int,
                         default=os.cpu_count(),
-                        help='Number of processes to use for training models.')
+                        help='Number of processes to use for training and scoring models.')
 
     parser.add_argument('--log-level',
                         choices=('critical', 'error', 'warning', 'info', 'debug'),
@@ -260,10 +463,37 @@ def parse_command_line(argv):
                         default=0,
                         help='Cross-validate the model using the specified number of folds.')
 
+    parser.add_argument('--cv-repeats',
+                        type=int,
+                        default=1,
+                        help='Number of times to repeat cross-validation.')
+
+    parser.add_argument('--cv-stratified',
+                        action='store_true',
+                        help='Use stratified cross-validation folds.')
+
+    parser.add_argument('--cv-tolerance',
+                        type=float,
+                        help='Standard error to stop repeating cross-validation at.')
+
+    parser.add_argument('--nested-cv',
+                        type=parse_nested_cv,
+                        metavar='OUTER:INNER',
+                        help='Number of outer and inner folds to use for nested cross-validation.')
+
+    parser.add_argument('--bootstrap',
+                        type=int,
+                        default=0,
+                        help='Number of bootstrap resamples for score confidence intervals.')
+
     parser.add_argument('--outlier-scores',
                         action='store_true',
                         help='Score model on outliers in the testing data.')
 
+    parser.add_argument('--outlier-detector',
+                        action='store_true',
+                        help='Save an outlier detector alongside the model.')
+
     parser.add_argument('--model',
                         choices=SUPPORTED_ALGORITHMS,
                         default='qda',
@@ -289,6 +519,41 @@ def parse_command_line(argv):
                         type=json.loads,
                         help='Parameter grid to use with grid search (as a json string).')
 
+    parser.add_argument('--search',
+                        choices=SEARCH_METHODS,
+                        default='grid',
+                        help='Method to use to search the parameter grid.')
+
+    parser.add_argument('--halving-factor',
+                        type=int,
+                        default=3,
+                        help='Factor to scale candidates and budget by in a halving search.')
+
+    parser.add_argument('--n-iter',
+                        type=int,
+                        default=10,
+                        help='Number of candidates to evaluate in a random or bayesian search.')
+
+    parser.add_argument('--pipeline-cache',
+                        type=Path,
+                        help='Directory to cache fitted preprocessing steps in.')
+
+    parser.add_argument('--pipeline-cache-size',
+                        default='1G',
+                        help='Maximum size of the pipeline cache, e.g. 500M or 2G.')
+
+    parser.add_argument('--checkpoint',
+                        type=Path,
+                        help='SQLite database to checkpoint hyperparameter search results to.')
+
+    parser.add_argument('--memmap',
+                        action='store_true',
+                        help='Share the datasets with worker processes as a memory-mapped file.')
+
+    parser.add_argument('--warm-start',
+                        action='store_true',
+                        help='Fit grid search candidates with warm starts.')
+
     parser.add_argument('--print-hyperparameters',
                         action='store_true',
                         help='Print hyperparameter values of the final model.')
@@ -296,6 +561,30 @@ def parse_command_line(argv):
     return parser.parse_args(argv)
 
 
+def parse_nested_cv(value):
+    """
+    Parse the value of the --nested-cv command line argument.
+
+    Args
+      value: A string of the form 'OUTER:INNER'.
+
+    Returns
+      A 2-tuple of the number of outer folds and inner folds.
+
+    """
+
+    try:
+        outer_splits, inner_splits = (int(splits) for splits in value.split(':'))
+
+    except ValueError as value_error:
+        raise argparse.ArgumentTypeError(f'expected OUTER:INNER, got {value!r}') from value_error
+
+    if outer_splits < 2 or inner_splits < 2:
+        raise argparse.ArgumentTypeError('the number of folds must be at least 2')
+
+    return outer_splits, inner_splits
+
+
 def configure_logging(log_level, logfile_path):
     """
     Configure the logger for the current module.
@@ -0,0 +1,228 @@
+"""
+Evaluate a grid search over a monotone hyperparameter, such as the number
+of trees in a forest or the regularization strength of a linear model, with
+warm starts instead of fitting every value from scratch.
+
+The candidates of the grid are grouped into paths that differ only in the
+path parameter. The model is fit to the first value of each path, and then
+refit to each following value with warm_start=True, so a forest grows by the
+difference in the number of trees, and a linear model continues optimizing
+from the previous solution. The score at every step is saved to a
+search_checkpoint database, so the grid search that follows only looks the
+scores up. A sweep of n_estimators over [50, 100, 200, 400] then costs about
+as much as fitting 400 trees once.
+
+Growing an ensemble with a fixed random_state gives the same model as
+fitting it from scratch. Continuing along a max_iter or regularization path
+only approximates a model fit from scratch, within the tolerance of the
+solver.
+
+Copyright 2021 Jerrad M. Genson
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+
+import logging
+from collections import namedtuple
+from collections.abc import Mapping
+
+import sklearn
+from sklearn import ensemble
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import ParameterGrid, check_cv
+from joblib import Parallel, delayed
+
+# A hyperparameter that can be warm started. Its values are fit in
+# descending order if descending is true, and ascending order otherwise. If
+# incremental is true, each step is fit with the difference from the previous
+# value, e.g. the number of additional iterations.
+PathParameter = namedtuple('PathParameter', ('name', 'descending', 'incremental'))
+
+N_ESTIMATORS = PathParameter('n_estimators', descending=False, incremental=False)
+MAX_ITER = PathParameter('max_iter', descending=False, incremental=True)
+
+# Hyperparameters that can be warm started for each model class, in order of
+# preference when a grid searches more than one of them.
+WARM_START_PATHS = {
+    ensemble.RandomForestClassifier: (N_ESTIMATORS,),
+    ensemble.ExtraTreesClassifier: (N_ESTIMATORS,),
+    ensemble.GradientBoostingClassifier: (N_ESTIMATORS,),
+    SGDClassifier: (MAX_ITER, PathParameter('alpha', descending=True, incremental=False)),
+    LogisticRegression: (PathParameter('C', descending=False, incremental=False), MAX_ITER),
+}
+
+
+def path_parameter(estimator, parameter_grid):  # pylint: disable=C0103
+    """
+    Find a hyperparameter of a model that a grid search can warm start.
+
+    Args:
+      estimator: An instance of sklearn.pipeline.Pipeline with a final step
+                 named 'model', or a wrapper of one that exposes its
+                 parameters.
+      parameter_grid: A dict or a sequence of dicts of hyperparameter values.
+
+    Returns:
+      The PathParameter of the model with more than one value in the grid, or
+      None if there is no such parameter.
+
+    """
+
+    model = estimator.get_params()['model']
+    for model_class, parameters in WARM_START_PATHS.items():
+        if not isinstance(model, model_class):
+            continue
+
+        for parameter in parameters:
+            for grid in _grids(parameter_grid):
+                if len(set(grid.get(f'model__{parameter.name}', ()))) > 1:
+                    return parameter
+
+    return None
+
+
+def fit_paths(estimator,  # pylint: disable=C0103
+              parameter_grid,
+              parameter,
+              score_function,
+              input_data,
+              target_data,
+              cv=None,
+              cpus=1):
+
+    """
+    Score every candidate of a grid search that has a value of a path
+    parameter, fitting each path with warm starts, and save the scores to a
+    checkpoint database.
+
+    Args:
+      estimator: A search_checkpoint.CheckpointedEstimator.
+      parameter_grid: A dict or a sequence of dicts of hyperparameter values.
+      parameter: A PathParameter returned by path_parameter().
+      score_function: A search_checkpoint.CheckpointedScorer.
+      input_data: A 2D numpy array of inputs to the model.
+      target_data: A 1D numpy array of model targets.
+      cv: The cv parameter of the grid search, which must split the data the
+          same way. (Default=None)
+      cpus: Number of processes to fit paths with. (Default=1)
+
+    """
+
+    splits = list(check_cv(cv, target_data, classifier=sklearn.base.is_classifier(estimator))
+                  .split(input_data, target_data))
+
+    Parallel(n_jobs=cpus)(
+        delayed(_fit_path)(estimator,
+                           parameters,
+                           parameter,
+                           values,
+                           score_function,
+                           input_data,
+                           target_data,
+                           training_index,
+                           testing_index)
+        for parameters, values in _paths(parameter_grid, parameter)
+        for training_index, testing_index in splits
+    )
+
+
+def _grids(parameter_grid):  # pylint: disable=C0103
+    """
+    Convert a parameter grid to a list of dicts.
+
+    """
+
+    return [parameter_grid] if isinstance(parameter_grid, Mapping) else list(parameter_grid)
+
+
+def _paths(parameter_grid, parameter):  # pylint: disable=C0103
+    """
+    Split a parameter grid into paths along a path parameter.
+
+    Returns:
+      A list of tuples of the parameters that are fixed along each path, and
+      the values of the path parameter in the order they are fit.
+
+    """
+
+    name = f'model__{parameter.name}'
+    paths = []
+    for grid in _grids(parameter_grid):
+        if name not in grid:
+            continue
+
+        values = sorted(set(grid[name]), reverse=parameter.descending)
+        fixed_grid = {key: value for key, value in grid.items() if key != name}
+        for parameters in ParameterGrid(fixed_grid):
+            if (parameters, values) not in paths:
+                paths.append((parameters, values))
+
+    return paths
+
+
+def _fit_path(estimator,  # pylint: disable=C0103
+              parameters,
+              parameter,
+              values,
+              score_function,
+              input_data,
+              target_data,
+              training_index,
+              testing_index):
+
+    """
+    Fit a path on one fold with warm starts and save the score of each step.
+    Paths that are already in the checkpoint database are skipped. If a step
+    fails to fit, the rest of the path is left to the grid search, which
+    saves the steps that fail with NaN scores.
+
+    """
+
+    name = f'model__{parameter.name}'
+    training_data = input_data[training_index], target_data[training_index]
+    testing_data = input_data[testing_index], target_data[testing_index]
+    results = [sklearn.clone(estimator).set_params(**parameters, **{name: value})
+               .fit(*training_data).result(*testing_data, score_function.scorer_name)
+               for value in values]
+
+    if all(score_function.lookup(result['key']) is not None for result in results):
+        return
+
+    try:
+        _fit_path_steps(estimator, parameters, parameter, values, results,
+                        score_function, training_data, testing_data)
+
+    except Exception as error:  # pylint: disable=W0703
+        logger = logging.getLogger(__name__)
+        logger.warning('Warm start path %s failed to fit: %r', parameters, error)
+
+
+def _fit_path_steps(estimator,  # pylint: disable=C0103
+                    parameters,
+                    parameter,
+                    values,
+                    results,
+                    score_function,
+                    training_data,
+                    testing_data):
+
+    """
+    Fit each step of a path with warm starts and save its score.
+
+    """
+
+    pipeline = sklearn.clone(estimator.estimator).set_params(**parameters, model__warm_start=True)
+    transformed_inputs = training_data[0]
+    for _, step in pipeline.steps[:-1]:
+        transformed_inputs = step.fit_transform(transformed_inputs, training_data[1])
+
+    model = pipeline.steps[-1][1]
+    previous_value = 0
+    for value, result in zip(values, results):
+        model.set_params(**{parameter.name: value - previous_value if parameter.incremental else value})
+        model.fit(transformed_inputs, training_data[1])
+        score_function.save(result, score_function.scorer(pipeline, *testing_data))
+        previous_value = value